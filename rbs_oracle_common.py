@@ -13,11 +13,21 @@ import subprocess
 from subprocess import PIPE, Popen
 import re
 import glob
+import fnmatch
+import fcntl
+import collections
+import threading
+import concurrent.futures
+import math
+import mmap
+import shlex
 import inspect
+import abc
 from yaspin import yaspin
 from yaspin.spinners import Spinners
 import urllib3
 import rubrik_cdm
+import paramiko
 from dataclasses import dataclass, field
 from typing import Callable, ClassVar, Dict, Optional
 import requests
@@ -52,6 +62,8 @@ class RubrikConnection:
     """
     def __init__(self, keyfile=None, insecure=False):
         self.logger = logging.getLogger(__name__ + '.RubrikConnection')
+        self.session_holds = 0
+        self.session_lock = threading.Lock()
         if keyfile:
             self.logger.debug(
                 "Using keyfile {} for auth.".format(keyfile))
@@ -159,6 +171,9 @@ class RubrikConnection:
         self.config['rubrik_cdm_token'] = response_json['token']
 
     def delete_session(self):
+        if self.session_holds:
+            self.logger.debug("The session is in use by other requests and will be deleted when they are done.")
+            return
         if self.service_account:
             self.logger.debug("Deleting Session")
             response = None
@@ -170,6 +185,28 @@ class RubrikConnection:
             self.logger.debug("Session delete response: {}".format(response))
             self.logger.warning("Service account session deleted.")
 
+    def run_guarded(self, call, *args, **kwargs):
+        """
+        Runs one call of a bulk run so that its failure does not stop the other calls. The common errors exit on
+        creation, so SystemExit is caught, and they delete the session before they raise, so the session is kept open
+        while the call runs. The script deletes the session once the bulk run is done.
+
+        Args:
+            self (object): Connection Object
+            call (callable): The call to run with the remaining arguments.
+        Returns:
+            result (tuple): The result of the call and None, or None and the error message if the call failed.
+        """
+        with self.session_lock:
+            self.session_holds += 1
+        try:
+            return call(*args, **kwargs), None
+        except (Exception, SystemExit) as err:
+            return None, str(err)
+        finally:
+            with self.session_lock:
+                self.session_holds -= 1
+
 
 
 class RubrikRbsOracleDatabase:
@@ -515,6 +552,21 @@ class RubrikRbsOracleDatabase:
         Returns:
             live_mount_info (dict): The information about the requested live mount returned from the Rubrik CDM.
         """
+        payload = self.live_mount_payload(host_id, time_ms, files_only, mount_path, pfile, aco_config_map, oracle_home)
+        try:
+            live_mount_info = self.rubrik.connection.post('internal', '/oracle/db/{}/mount'.format(self.oracle_id), payload, timeout=self.cdm_timeout)
+        except Exception as err:
+            self.rubrik.delete_session()
+            raise RbsOracleCommonError("Method live_mount_info failed for id: {} with Unexpected {}".format(self.oracle_id, err))
+        return live_mount_info
+
+    def live_mount_payload(self, host_id, time_ms, files_only=False, mount_path=None, pfile=None, aco_config_map=None, oracle_home=None):
+        """
+        Builds the mount request for a live mount. The arguments are the same as live_mount.
+
+        Returns:
+            payload (dict): The payload for the Rubrik CDM mount request.
+        """
         payload = {
                 "recoveryPoint": {"timestampMs": time_ms},
                 "targetOracleHostOrRacId": host_id,
@@ -530,12 +582,7 @@ class RubrikRbsOracleDatabase:
         if aco_config_map:
             payload["advancedRecoveryConfigMap"] = aco_config_map
         self.logger.debug("RBS oracle common payload: {}".format(payload))
-        try:
-            live_mount_info = self.rubrik.connection.post('internal', '/oracle/db/{}/mount'.format(self.oracle_id), payload, timeout=self.cdm_timeout)
-        except Exception as err:
-            self.rubrik.delete_session()
-            raise RbsOracleCommonError("Method live_mount_info failed for id: {} with Unexpected {}".format(self.oracle_id, err))
-        return live_mount_info
+        return payload
 
     def db_clone(self, host_id, time_ms, files_only=False, mount_path=None, new_name=None, pfile=None, aco_parameters=None, oracle_home=None):
         """
@@ -556,6 +603,21 @@ class RubrikRbsOracleDatabase:
         Returns:
             db_clone_info (dict): The information about the requested clone returned from the Rubrik CDM.
         """
+        payload = self.db_clone_payload(host_id, time_ms, files_only, mount_path, new_name, pfile, aco_parameters, oracle_home)
+        try:
+            db_clone_info = self.rubrik.connection.post('internal', '/oracle/db/{}/export'.format(self.oracle_id), payload, timeout=self.cdm_timeout)
+        except Exception as err:
+            self.rubrik.delete_session()
+            raise RbsOracleCommonError("Method db_clone_info failed for id: {} with Unexpected {}".format(self.oracle_id, err))
+        return db_clone_info
+
+    def db_clone_payload(self, host_id, time_ms, files_only=False, mount_path=None, new_name=None, pfile=None, aco_parameters=None, oracle_home=None):
+        """
+        Builds the export request for a clone. The arguments are the same as db_clone.
+
+        Returns:
+            payload (dict): The payload for the Rubrik CDM export request.
+        """
         payload = {
                 "recoveryPoint": {"timestampMs": time_ms},
                 "targetOracleHostOrRacId": host_id,
@@ -576,12 +638,7 @@ class RubrikRbsOracleDatabase:
             else:
                 payload["advancedRecoveryConfigMap"]["ORACLE_HOME"] = oracle_home.replace("'", "")
         self.logger.debug("RBS oracle common payload: {}".format(payload))
-        try:
-            db_clone_info = self.rubrik.connection.post('internal', '/oracle/db/{}/export'.format(self.oracle_id), payload, timeout=self.cdm_timeout)
-        except Exception as err:
-            self.rubrik.delete_session()
-            raise RbsOracleCommonError("Method db_clone_info failed for id: {} with Unexpected {}".format(self.oracle_id, err))
-        return db_clone_info
+        return payload
 
     def oracle_validate(self, host_id, time_ms):
         """
@@ -773,6 +830,59 @@ class RubrikRbsOracleDatabase:
         else:
             return oracle_request
 
+    def get_files_only_mount(self, live_mount_request, mount_path, timeout=60):
+        """
+        Finds the live mount id and the directory of a completed files only mount. The live mount id is taken from the
+        result link of the async request. The mount record must be a files only mount of this database. The directory is the one in the mount
+        path named for that live mount, so other mounts made on the same path at the same time are ignored.
+
+        Args:
+            self (object): Database Object
+            live_mount_request (dict): The completed async request of the files only mount.
+            mount_path (str): The path the backup files were mounted on.
+            timeout (int): Seconds to wait for the mount directory to appear.
+        Returns:
+            live_mount_id (str): The id of the live mount.
+            backup_path (str): The directory holding the mounted backup files.
+        """
+        live_mount_id = self.live_mount_id_from_request(live_mount_request)
+        if not live_mount_id:
+            self.rubrik.delete_session()
+            raise RbsOracleCommonError("The mount request {} did not return the live mount it created.".format(live_mount_request.get('id')))
+        live_mount_info = self.rubrik.connection.get('internal', '/oracle/db/mount/{}'.format(live_mount_id), timeout=self.cdm_timeout)
+        self.logger.debug("Live mount record: {}".format(live_mount_info))
+        if not live_mount_info.get('isFilesOnlyMount') or live_mount_info.get('sourceDatabaseId', self.oracle_id) != self.oracle_id:
+            self.rubrik.delete_session()
+            raise RbsOracleCommonError("The live mount {} returned by the mount request {} is not a files only mount of {}.".format(
+                live_mount_id, live_mount_request.get('id'), self.database_name))
+        mount_key = live_mount_id.split(':::')[-1]
+        timeout_start = time.time()
+        while True:
+            directories = [directory for directory in os.listdir(mount_path) if mount_key in directory.split('_')]
+            if directories or time.time() > timeout_start + timeout:
+                break
+            time.sleep(2)
+        if len(directories) != 1:
+            self.rubrik.delete_session()
+            raise RbsOracleCommonError("Found {} directories in {} for live mount {}, expected one.".format(len(directories), mount_path, live_mount_id))
+        return live_mount_id, os.path.join(mount_path, directories[0])
+
+    @staticmethod
+    def live_mount_id_from_request(live_mount_request):
+        """
+        Gets the id of the live mount created by a completed live mount request from its result link.
+
+        Args:
+            live_mount_request (dict): The async request of the live mount.
+        Returns:
+            live_mount_id (str): The id of the live mount or None if the request has no live mount result.
+        """
+        live_mount_id = None
+        for link in live_mount_request.get('links', []):
+            if link.get('rel') == 'result' and '/oracle/db/mount/' in link.get('href', ''):
+                live_mount_id = link['href'].rstrip('/').split('/')[-1]
+        return live_mount_id
+
     def async_sla_change_wait(self, pending_sla, timeout):
         timeout_start = time.time()
         oracle_request = None
@@ -809,8 +919,11 @@ class RubrikRbsOracleDatabase:
     def oracle_db_rename(self, oracle_sid, oracle_home, new_oracle_name):
         os.environ["ORACLE_HOME"] = oracle_home
         os.environ["ORACLE_SID"] = oracle_sid
-        self.logger.info(self.sqlplus_sysdba(oracle_home, 'shutdown immediate'))
-        self.logger.info(self.sqlplus_sysdba(oracle_home, 'startup mount'))
+        sqlplus = RbsOracleSqlplusSession(oracle_home, oracle_sid)
+        sqlplus.run('shutdown immediate')
+        sqlplus.run('startup mount')
+        # NID needs the only connection to the mounted database
+        sqlplus.restart()
         # Change the database name
         logfile = oracle_home + '/dbs/nid_' + new_oracle_name + '.log'
         self.logger.info("NID Logfile: {}".format(logfile))
@@ -819,7 +932,7 @@ class RubrikRbsOracleDatabase:
         stdout, stderr = session.communicate()
         self.logger.info(stdout.decode())
         # Create an init file from the spfile
-        self.logger.info(self.sqlplus_sysdba(oracle_home, 'create pfile from spfile;'))
+        sqlplus.run('create pfile from spfile;')
         # Rename the init file
         os.rename("{}/dbs/init{}.ora".format(oracle_home, oracle_sid),
                 "{}/dbs/init{}.ora".format(oracle_home, new_oracle_name))
@@ -828,59 +941,62 @@ class RubrikRbsOracleDatabase:
             os.rename("{}/dbs/orapw{}".format(oracle_home, oracle_sid),
                     "{}/dbs/orapw{}".format(oracle_home, new_oracle_name))
         # Rename the control files
-        os.rename("{}/dbs/{}_control1".format(oracle_home, oracle_sid),
-                "{}/dbs/{}_control1".format(oracle_home, new_oracle_name))
-        os.rename("{}/dbs/{}_control2".format(oracle_home, oracle_sid),
-                "{}/dbs/{}_control2".format(oracle_home, new_oracle_name))
-        # Change the database name in all the parameters in the init file
-        status = subprocess.check_output(
-            "sed -i 's/{0}/{1}/g' {2}/dbs/init{1}.ora".format(oracle_sid, new_oracle_name, oracle_home), shell=True)
-        self.logger.info(status.decode())
+        renamed_files = {}
+        for control_file in ['control1', 'control2']:
+            old_path = "{}/dbs/{}_{}".format(oracle_home, oracle_sid, control_file)
+            new_path = "{}/dbs/{}_{}".format(oracle_home, new_oracle_name, control_file)
+            os.rename(old_path, new_path)
+            renamed_files[old_path] = new_path
+        # Change the database name in the parameters that hold it, other uses of the SID such as paths are kept
+        parameter_file = RbsOracleParameterFile.read("{}/dbs/init{}.ora".format(oracle_home, new_oracle_name))
+        parameter_file.rename_database(oracle_sid, new_oracle_name, renamed_files)
+        parameter_file.write()
         # Switch the environment to the new database name
         os.environ["ORACLE_SID"] = new_oracle_name
+        sqlplus.restart(new_oracle_name)
         # Open the database
-        self.logger.info(self.sqlplus_sysdba(oracle_home, 'create spfile from pfile;'))
-        self.logger.info(self.sqlplus_sysdba(oracle_home, 'startup mount;'))
-        self.logger.info(self.sqlplus_sysdba(oracle_home, 'alter database open resetlogs;'))
+        sqlplus.run('create spfile from pfile;')
+        sqlplus.run('startup mount;')
+        sqlplus.run('alter database open resetlogs;')
+        sqlplus.close()
         return
 
     def oracle_db_clone_cleanup(self, oracle_sid, oracle_home):
-        os.environ["ORACLE_HOME"] = oracle_home
-        os.environ["ORACLE_SID"] = oracle_sid
-        self.logger.info(self.sqlplus_sysdba(oracle_home, 'shutdown abort;'))
-        self.logger.info(self.sqlplus_sysdba(oracle_home, 'startup force mount exclusive restrict;'))
-        self.logger.info(self.sqlplus_sysdba(oracle_home, 'drop database;'))
-        self.delete_dbs_files(oracle_home, 'arch*')
-        self.delete_dbs_files(oracle_home, 'c-*')
-        self.delete_dbs_files(oracle_home, 'hc_{}.dat'.format(oracle_sid))
-        self.delete_dbs_files(oracle_home, 'init{}.ora'.format(oracle_sid))
-        self.delete_dbs_files(oracle_home, 'init{}.ora'.format(oracle_sid))
-        self.delete_dbs_files(oracle_home, 'lkO{}'.format(oracle_sid))
-        return
+        # The session sets ORACLE_HOME and ORACLE_SID in its own environment so clones can be dropped in parallel
+        with RbsOracleSqlplusSession(oracle_home, oracle_sid) as sqlplus:
+            sqlplus.run('shutdown abort;')
+            sqlplus.run('startup force mount exclusive restrict;')
+            drop_result = sqlplus.run('drop database;')
+        self.delete_dbs_files(oracle_home, ['arch*', 'c-*', 'hc_{}.dat'.format(oracle_sid), 'init{}.ora'.format(oracle_sid),
+                                            'lkO{}'.format(oracle_sid)])
+        return drop_result
 
     def sqlplus_sysdba(self, oracle_home, sql_command):
-        self.logger.info("SQL: {}".format(sql_command))
-        sql_args = [os.path.join(oracle_home, 'bin', 'sqlplus'), '-S', '/', 'as', 'sysdba']
-        session = Popen(sql_args, stdin=PIPE, stdout=PIPE, stderr=PIPE)
-        session.stdin.write(sql_command.encode())
-        stdout, stderr = session.communicate()
-        return stdout.decode()
+        # The output is streamed to the log as it is read, only the tail is returned
+        with RbsOracleSqlplusSession(oracle_home, os.environ.get("ORACLE_SID")) as sqlplus:
+            return sqlplus.run(sql_command).output
 
     def rman(self, oracle_home, rman_command, target="target"):
-        self.logger.info("RMAN: {}".format(rman_command))
-        rman_args = [os.path.join(oracle_home, 'bin', 'rman'), target, '/']
-        session = Popen(rman_args, stdin=PIPE, stdout=PIPE, stderr=PIPE)
-        session.stdin.write(rman_command.encode())
-        stdout, stderr = session.communicate()
-        return stdout.decode()
-
-    def delete_dbs_files(self, oracle_home, pattern):
-        file_name = glob.glob(oracle_home + '/dbs/' + pattern)
-        for file_path in file_name:
+        # The output is streamed to the log as it is read, only the tail is returned
+        with RbsOracleRmanSession(oracle_home, os.environ.get("ORACLE_SID"), target) as rman:
+            return rman.run(rman_command).output
+
+    def delete_dbs_files(self, oracle_home, patterns):
+        # One pass over the dbs directory for all the patterns
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        try:
+            dbs_files = list(os.scandir(oracle_home + '/dbs'))
+        except OSError as error:
+            self.logger.warning("Unable to list the dbs directory: {}".format(error))
+            return
+        for dbs_file in dbs_files:
+            if not any(fnmatch.fnmatchcase(dbs_file.name, pattern) for pattern in patterns):
+                continue
             try:
-                os.remove(file_path)
-            except:
-                self.logger.warning("Error while deleting file: {}".format(file_path))
+                os.remove(dbs_file.path)
+            except OSError:
+                self.logger.warning("Error while deleting file: {}".format(dbs_file.path))
 
     def refresh(self):
         """
@@ -962,26 +1078,101 @@ class RubrikRbsOracleDatabase:
 
 
     @staticmethod
-    def get_latest_autobackup(path):
+    def get_latest_autobackup(path, workers=16):
         """
-        Finds the latest control file backup recursively in a path.
+        Finds the latest control file autobackup in a path. The tree is walked one level at a time with the
+        directories of a level listed in parallel. Directories with a date in their name are searched newest date
+        first and the older dates are skipped once an autobackup has been found, so only the newest day of a large
+        mount is walked. The autobackups are compared on the full c-DBID-YYYYMMDD-SS name.
 
         Args:
             path (str): The path in which to search for a control file.
+            workers (int): The number of directories listed at one time.
         Returns:
             control file backup (str): The path of the latest control file backup
 
         """
-        file_name = glob.glob(path + '/**/controlfile_c-*', recursive=True)
-        if file_name:
-            latest = file_name[0]
-            for file_path in file_name:
-                if int(file_path[-2:], base=16) > int(latest[-2:], base=16):
-                    latest = file_path
+        logger = logging.getLogger(__name__ + '.RubrikRbsOracleDatabase')
+
+        def list_directory(directory):
+            files = []
+            directories = []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            directories.append(entry.path)
+                        else:
+                            files.append(entry.path)
+            except OSError as err:
+                logger.debug("Unable to list {}: {}".format(directory, err))
+            return files, directories
+
+        def walk(directories):
+            latest = None
+            while directories:
+                dated = {}
+                undated = []
+                for files, subdirectories in executor.map(list_directory, directories):
+                    for file_path in files:
+                        key = RubrikRbsOracleDatabase.autobackup_key(file_path)
+                        if key and (latest is None or key > latest[0]):
+                            latest = (key, file_path)
+                    for subdirectory in subdirectories:
+                        day = RubrikRbsOracleDatabase.directory_date(subdirectory)
+                        if day:
+                            dated.setdefault(day, []).append(subdirectory)
+                        else:
+                            undated.append(subdirectory)
+                for day in sorted(dated, reverse=True):
+                    found = walk(dated[day])
+                    if found:
+                        if latest is None or found[0] > latest[0]:
+                            latest = found
+                        logger.debug("Found an autobackup in the {} directories, skipping {} older dates.".format(day, len([d for d in dated if d < day])))
+                        break
+                directories = undated
             return latest
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            latest = walk([path])
+        if latest:
+            logger.debug("Latest autobackup: {}, DBID: {}, date: {}, sequence: {}.".format(latest[1], latest[0][2], latest[0][0], latest[0][1]))
+            return latest[1]
         else:
             raise RbsOracleCommonError("No control file backups were found in {}.".format(path))
 
+    @staticmethod
+    def autobackup_key(file_path):
+        """
+        Parses a control file autobackup name, controlfile_c-DBID-YYYYMMDD-SS or c-DBID-YYYYMMDD-SS.
+
+        Args:
+            file_path (str): The path of the file.
+        Returns:
+            key (tuple): (YYYYMMDD, sequence, DBID) which sorts oldest to newest, or None if the file is not an
+            autobackup.
+        """
+        match = re.search(r'(?:^|_)c-(\d+)-(\d{8})-([0-9a-fA-F]{2})$', os.path.basename(file_path))
+        if not match:
+            return None
+        return match.group(2), int(match.group(3), base=16), match.group(1)
+
+    @staticmethod
+    def directory_date(directory):
+        """
+        Finds a date (YYYYMMDD or YYYY-MM-DD) in a directory name.
+
+        Returns:
+            date (str): The date as YYYYMMDD or None if the name does not contain a valid date.
+        """
+        for match in re.finditer(r'(?<!\d)(\d{4})-?(\d{2})-?(\d{2})(?!\d)', os.path.basename(directory)):
+            try:
+                return datetime.datetime(int(match.group(1)), int(match.group(2)), int(match.group(3))).strftime('%Y%m%d')
+            except ValueError:
+                continue
+        return None
+
     @staticmethod
     def is_ip(hostname):
         """
@@ -1203,12 +1394,15 @@ class RubrikRbsOracleHost:
     """
     Rubrik RBS (snappable) Oracle Host object.
     """
-    def __init__(self, rubrik, oracle_host, timeout=180):
+    def __init__(self, rubrik, oracle_host, timeout=180, id=None):
         self.logger = logging.getLogger(__name__ + '.RubrikRbsOracleHost')
         self.cdm_timeout = timeout
         self.oracle_host = oracle_host
         self.rubrik = rubrik
-        self.id = self.get_host_id()
+        if id:
+            self.id = id
+        else:
+            self.id = self.get_host_id()
 
     def get_host_id(self):
         """
@@ -1261,6 +1455,2024 @@ class RubrikRbsOracleHost:
         return oracle_host_refresh_info
 
 
+class RubrikRbsOracleFleet:
+    """
+    Resolves many Rubrik RBS Oracle database objects from a single listing of the Oracle databases on the cluster.
+    """
+    def __init__(self, rubrik, timeout=180):
+        self.logger = logging.getLogger(__name__ + '.RubrikRbsOracleFleet')
+        self.cdm_timeout = timeout
+        self.rubrik = rubrik
+        if int(self.rubrik.version.split("-")[0].split(".")[0]) >= 6:
+            self.v6_deprecated = 'v1'
+        else:
+            self.v6_deprecated = 'internal'
+        self.oracle_dbs = self.get_oracle_dbs()
+        self.records = {}
+        self.dg_groups = {}
+
+    def get_all_pages(self, api_version, endpoint, page_size=500):
+        """
+        Gets every object from a paginated Rubrik CDM list endpoint, one page at a time.
+
+        Args:
+            self (object): Fleet Object
+            api_version (str): The Rubrik CDM API version.
+            endpoint (str): The list endpoint. May include query parameters.
+            page_size (int): The number of objects to request per call.
+        Returns:
+            objects (list): The objects from all the pages.
+        """
+        objects = []
+        separator = '&' if '?' in endpoint else '?'
+        while True:
+            page = self.rubrik.connection.get(api_version, '{}{}limit={}&offset={}'.format(endpoint, separator, page_size, len(objects)), timeout=self.cdm_timeout)
+            objects.extend(page['data'])
+            if not page.get('hasMore') or not page['data']:
+                break
+        return objects
+
+    def get_oracle_dbs(self):
+        """
+        Gets all the non-relic Oracle database objects on the Rubrik CDM.
+
+        Args:
+            self (object): Fleet Object
+        Returns:
+            oracle_dbs (list): The Rubrik CDM Oracle database objects.
+        """
+        oracle_dbs = [db for db in self.get_all_pages(self.v6_deprecated, '/oracle/db') if not db.get('isRelic')]
+        self.logger.debug("Oracle databases returned: {}".format(len(oracle_dbs)))
+        return oracle_dbs
+
+    def match_database(self, database_name, database_host):
+        """
+        Finds the database object for a database name (or DB unique name) on a host or RAC cluster.
+
+        Args:
+            self (object): Fleet Object
+            database_name (str): The database name or database unique name.
+            database_host (str): The host or RAC cluster name.
+        Returns:
+            oracle_db (dict): The Rubrik CDM database object or None if there is no match.
+        """
+        for db in self.oracle_dbs:
+            if db['name'].lower() != database_name.lower() and db.get('dbUniqueName', '').lower() != database_name.lower():
+                continue
+            if 'standaloneHostName' in db.keys():
+                if RubrikRbsOracleDatabase.match_hostname(database_host, db['standaloneHostName']):
+                    return db
+            elif 'racName' in db.keys():
+                if database_host == db['racName']:
+                    return db
+                for instance in db.get('instances', []):
+                    if RubrikRbsOracleDatabase.match_hostname(database_host, instance['hostName']):
+                        return db
+        return None
+
+    def resolve(self, host_db_list):
+        """
+        Resolves a list of host:db pairs to database objects without a lookup per database.
+
+        Args:
+            self (object): Fleet Object
+            host_db_list (list): The source <host or RAC cluster>:<database> pairs.
+        Returns:
+            databases (dict): host:db to RubrikRbsOracleDatabase for every pair that was found.
+            failures (dict): host:db to the reason the pair could not be resolved.
+        """
+        databases = {}
+        failures = {}
+        resolved_ids = {}
+        for host_db in host_db_list:
+            source_host_db = host_db.split(":")
+            if len(source_host_db) != 2 or not source_host_db[0] or not source_host_db[1]:
+                failures[host_db] = "Not in <host or RAC cluster>:<database> format"
+                continue
+            if RubrikRbsOracleDatabase.is_ip(source_host_db[0]):
+                failures[host_db] = "A hostname is required for the Oracle host, do not use an IP address"
+                continue
+            db = self.match_database(source_host_db[1], source_host_db[0])
+            if not db:
+                failures[host_db] = "No database with name {} found on host or cluster {}".format(source_host_db[1], source_host_db[0])
+                continue
+            oracle_id = self.oracle_id(db)
+            if oracle_id in resolved_ids:
+                self.logger.warning("{} is the same database object as {}, skipping.".format(host_db, resolved_ids[oracle_id]))
+                continue
+            resolved_ids[oracle_id] = host_db
+            self.records[oracle_id] = db
+            databases[host_db] = RubrikRbsOracleDatabase(self.rubrik, source_host_db[1], source_host_db[0], self.cdm_timeout, oracle_id)
+        self.logger.debug("Resolved: {}, Failed: {}".format(list(databases.keys()), failures))
+        return databases, failures
+
+    def resolve_hosts(self, host_names):
+        """
+        Resolves many host names to host objects from a single listing of the hosts.
+
+        Args:
+            self (object): Fleet Object
+            host_names (list): The host names.
+        Returns:
+            hosts (dict): Host name to RubrikRbsOracleHost for every host that was found.
+            failures (dict): Host name to the reason the host could not be resolved.
+        """
+        all_hosts = self.get_all_pages('v1', '/host')
+        hosts = {}
+        failures = {}
+        for host_name in host_names:
+            matched_hosts = [host for host in all_hosts if RubrikRbsOracleDatabase.match_hostname(host_name, host['name'])]
+            if len(matched_hosts) > 1:
+                matched_hosts = [host for host in matched_hosts if host['name'] == host_name]
+            if len(matched_hosts) == 1:
+                hosts[host_name] = RubrikRbsOracleHost(self.rubrik, host_name, self.cdm_timeout, matched_hosts[0]['id'])
+            elif not matched_hosts:
+                failures[host_name] = "The host object was not found on the Rubrik cluster"
+            else:
+                failures[host_name] = "Multiple host IDs found on the Rubrik cluster"
+        self.logger.debug("Resolved hosts: {}, Failed: {}".format(list(hosts.keys()), failures))
+        return hosts, failures
+
+    def resolve_targets(self, target_names, rac=False):
+        """
+        Resolves many Oracle host or RAC cluster names to their ids from a single listing, for use as mount and
+        clone targets.
+
+        Args:
+            self (object): Fleet Object
+            target_names (list): The Oracle host or RAC cluster names.
+            rac (bool): The targets are RAC clusters.
+        Returns:
+            target_ids (dict): Target name to Oracle host or RAC cluster id for every target that was found.
+            failures (dict): Target name to the reason the target could not be resolved.
+        """
+        if not target_names:
+            return {}, {}
+        endpoint = '/oracle/rac' if rac else '/oracle/host'
+        all_targets = [target for target in self.get_all_pages('internal', endpoint)
+                       if target['primaryClusterId'] == self.rubrik.cluster_id and target['status'] == 'Connected']
+        target_ids = {}
+        failures = {}
+        for target_name in target_names:
+            if rac:
+                matched_targets = [target for target in all_targets if target['name'] == target_name]
+            else:
+                matched_targets = [target for target in all_targets if RubrikRbsOracleDatabase.match_hostname(target_name, target['name'])]
+                if len(matched_targets) > 1:
+                    matched_targets = [target for target in matched_targets if target['name'] == target_name]
+            if len(matched_targets) == 1:
+                target_ids[target_name] = matched_targets[0]['id']
+            elif not matched_targets:
+                failures[target_name] = "The {} was not found or is not connected on the Rubrik CDM".format('RAC cluster' if rac else 'host')
+            else:
+                failures[target_name] = "Multiple hosts with this name were found on the Rubrik CDM. Try using full FQDN"
+        self.logger.debug("Resolved targets: {}, Failed: {}".format(target_ids, failures))
+        return target_ids, failures
+
+    def select(self, sla_name=None, host=None, rac=None):
+        """
+        Selects the databases protected by an SLA Domain, running on a host or running on a RAC cluster.
+        All supplied selectors must match.
+
+        Args:
+            self (object): Fleet Object
+            sla_name (str): The effective SLA Domain name.
+            host (str): The host name.
+            rac (str): The RAC cluster name.
+        Returns:
+            host_db_list (list): The <host or RAC cluster>:<database> pairs that matched.
+        """
+        host_db_list = []
+        for db in self.oracle_dbs:
+            if host:
+                if 'standaloneHostName' not in db.keys() or not RubrikRbsOracleDatabase.match_hostname(host, db['standaloneHostName']):
+                    continue
+            if rac:
+                if 'racName' not in db.keys() or not RubrikRbsOracleDatabase.match_hostname(rac, db['racName']):
+                    continue
+            if sla_name and self.effective_sla(db)[1] != sla_name:
+                continue
+            if 'standaloneHostName' in db.keys():
+                host_db = "{}:{}".format(db['standaloneHostName'], db['name'])
+            else:
+                host_db = "{}:{}".format(db.get('racName', ''), db['name'])
+            host_db_list.append(host_db)
+        self.logger.debug("Selected databases: {}".format(host_db_list))
+        return host_db_list
+
+    def effective_sla(self, db):
+        """
+        Gets the effective SLA Domain of a database object. Data Guard members use the SLA Domain of the group.
+
+        Args:
+            self (object): Fleet Object
+            db (dict): The Rubrik CDM database object.
+        Returns:
+            sla (tuple): The effective SLA Domain id and name.
+        """
+        if db.get('dataGuardType') == 'DataGuardMember':
+            if db['dataGuardGroupId'] not in self.dg_groups:
+                self.dg_groups[db['dataGuardGroupId']] = self.rubrik.connection.get('v1', '/oracle/db/{}'.format(db['dataGuardGroupId']), timeout=self.cdm_timeout)
+            db = self.dg_groups[db['dataGuardGroupId']]
+        return db.get('effectiveSlaDomainId'), db.get('effectiveSlaDomainName')
+
+    def assign_sla(self, sla_id, databases):
+        """
+        Assigns an SLA Domain to many databases with one request. Use UNPROTECTED to set the databases to
+        unprotected and INHERIT to have the databases inherit the SLA Domain from the host/cluster.
+
+        Args:
+            self (object): Fleet Object
+            sla_id (str): The Rubrik SLA ID, UNPROTECTED or INHERIT.
+            databases (list): The RubrikRbsOracleDatabase objects.
+        Returns:
+            Return json from the post to assign SLA
+        """
+        payload = {
+            "managedIds": [database.oracle_id for database in databases],
+            "existingSnapshotRetention": "RetainSnapshots"
+        }
+        if sla_id != 'UNPROTECTED':
+            payload["shouldApplyToExistingSnapshots"] = False
+            payload["shouldApplyToNonPolicySnapshots"] = False
+        self.logger.debug("Assign SLA {} payload: {}".format(sla_id, payload))
+        sla_assign_info = self.rubrik.connection.post('v2', '/sla_domain/{0}/assign'.format(sla_id), payload, timeout=self.cdm_timeout)
+        return sla_assign_info
+
+    def async_sla_changes_wait(self, pending_slas, timeout, poll_interval=10):
+        """
+        Waits for the effective SLA Domain of many databases to change using one polling loop.
+
+        Args:
+            self (object): Fleet Object
+            pending_slas (dict): Name to a tuple of the RubrikRbsOracleDatabase and the pending SLA Domain name
+                                 or 'inherit'.
+            timeout (int): Minutes to wait before giving up.
+        Returns:
+            changed (dict): Name to database information for the databases now at their pending SLA Domain.
+            not_changed (dict): Name to database information for the databases that did not change before the timeout.
+        """
+        timeout_start = time.time()
+        waiting = dict(pending_slas)
+        changed = {}
+        db_infos = {}
+        while waiting:
+            for name in list(waiting.keys()):
+                database, pending_sla = waiting[name]
+                try:
+                    db_info = database.get_oracle_db_info()
+                except Exception as err:
+                    self.logger.debug("Getting the SLA Domain of {} failed, will retry: {}".format(name, err))
+                    continue
+                db_infos[name] = db_info
+                if (pending_sla == 'inherit' and db_info['slaAssignment'] == 'Derived') or \
+                        (pending_sla != 'inherit' and db_info['effectiveSlaDomainName'] == pending_sla):
+                    changed[name] = db_info
+                    del waiting[name]
+                    self.logger.info("{} is now set to {}".format(name, db_info['effectiveSlaDomainName']))
+            if not waiting or time.time() > timeout_start + (timeout * 60):
+                break
+            with yaspin(Spinners.line, text='SLA Domain changes pending: {}, complete: {}'.format(len(waiting), len(changed))):
+                time.sleep(poll_interval)
+        not_changed = {name: db_infos.get(name) for name in waiting}
+        return changed, not_changed
+
+    @staticmethod
+    def oracle_id(db):
+        """
+        Gets the id used for a database object. Data Guard members are managed using the Data Guard group id.
+
+        Args:
+            db (dict): The Rubrik CDM database object.
+        Returns:
+            oracle_id (str): The id of the database object to use.
+        """
+        if db.get('dataGuardType') == 'DataGuardMember':
+            return db['dataGuardGroupId']
+        return db['id']
+
+    @staticmethod
+    def read_host_db_list(source_host_db=None, source_file=None):
+        """
+        Builds a list of host:db pairs from command line values and a file with one pair per line.
+
+        Args:
+            source_host_db (list): Command line values, each may be a comma separated list of pairs.
+            source_file (str): Path to a file of pairs. Blank lines and lines starting with # are ignored.
+        Returns:
+            host_db_list (list): The <host or RAC cluster>:<database> pairs in the order given.
+        """
+        host_db_list = []
+        for value in source_host_db or []:
+            host_db_list.extend([host_db.strip() for host_db in value.split(",") if host_db.strip()])
+        if source_file:
+            if not os.path.exists(source_file):
+                raise RbsOracleCommonError("No host:db file found at {}".format(source_file))
+            with open(source_file) as host_db_file:
+                for line in host_db_file:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        host_db_list.append(line)
+        return list(dict.fromkeys(host_db_list))
+
+
+class RubrikRbsOracleAsyncQueue:
+    """
+    Submits Rubrik async requests with a cap on the number in flight and waits on all of them in one polling loop.
+    """
+    terminal_states = ['FAILED', 'CANCELED', 'SUCCEEDED']
+
+    def __init__(self, rubrik, max_in_flight=10, poll_interval=10, timeout=180, max_per_group=None):
+        self.logger = logging.getLogger(__name__ + '.RubrikRbsOracleAsyncQueue')
+        self.cdm_timeout = timeout
+        self.rubrik = rubrik
+        self.max_in_flight = max_in_flight
+        self.max_per_group = max_per_group
+        self.poll_interval = poll_interval
+        self.pending = []
+        self.in_flight = {}
+        self.results = {}
+        self.groups = {}
+
+    def add(self, name, submit, group=None):
+        """
+        Queues a request for submission.
+
+        Args:
+            self (object): Queue Object
+            name (str): The name used to report on this request.
+            submit (callable): Called with no arguments to submit the request. Returns the async request json. It is run
+                with RubrikConnection.run_guarded, so an error fails only this request and keeps the session open.
+            group (str): The group, such as the target host, counted against max_per_group.
+        """
+        self.pending.append((name, submit))
+        if group is not None:
+            self.groups[name] = group
+
+    def group_in_flight(self, group):
+        """
+        Returns the number of requests in flight for a group.
+        """
+        return len([name for name in self.in_flight if self.groups.get(name) == group])
+
+    def add_request(self, name, request_info):
+        """
+        Tracks a request that has already been submitted.
+
+        Args:
+            self (object): Queue Object
+            name (str): The name used to report on this request.
+            request_info (dict): The async request json returned from the Rubrik CDM.
+        """
+        self.in_flight[name] = {'id': request_info['id'], 'status': request_info['status'], 'submitted': time.time()}
+
+    def submit_ready(self):
+        """
+        Submits queued requests in order until the in flight cap is reached. Requests for a group that is at the
+        max_per_group cap are passed over until a request in that group completes.
+        """
+        index = 0
+        while index < len(self.pending) and len(self.in_flight) < self.max_in_flight:
+            name, submit = self.pending[index]
+            if self.max_per_group and name in self.groups and self.group_in_flight(self.groups[name]) >= self.max_per_group:
+                index += 1
+                continue
+            self.pending.pop(index)
+            submitted = time.time()
+            request_info, error = self.rubrik.run_guarded(submit)
+            if error is not None:
+                self.logger.warning("Submission of {} failed: {}".format(name, error))
+                self.results[name] = {'id': None, 'status': 'NOT_SUBMITTED', 'submitted': submitted,
+                                      'completed': time.time(), 'error': error}
+                continue
+            self.logger.debug("Submitted {}: {}".format(name, request_info))
+            self.in_flight[name] = {'id': request_info['id'], 'status': request_info['status'], 'submitted': submitted}
+
+    def poll(self):
+        """
+        Gets the status of every request in flight and moves completed requests to the results.
+        """
+        for name in list(self.in_flight.keys()):
+            request = self.in_flight[name]
+            try:
+                oracle_request = self.rubrik.connection.get('internal', '/oracle/request/{}'.format(request['id']), timeout=self.cdm_timeout)
+            except Exception as err:
+                self.logger.debug("Status check of {} failed, will retry: {}".format(name, err))
+                continue
+            request['status'] = oracle_request['status']
+            if oracle_request['status'] in self.terminal_states:
+                request['completed'] = time.time()
+                request['error'] = oracle_request.get('error', {}).get('message', '') if oracle_request['status'] != 'SUCCEEDED' else ''
+                request['request'] = oracle_request
+                self.results[name] = self.in_flight.pop(name)
+                self.logger.info("{} completed with status: {}".format(name, oracle_request['status']))
+
+    def submit_all(self, timeout):
+        """
+        Submits all the queued requests without waiting for them to complete. The in flight cap is kept, so requests
+        beyond it are submitted as earlier requests complete.
+
+        Args:
+            self (object): Queue Object
+            timeout (int): Minutes to wait for room to submit the requests still queued.
+        Returns:
+            in_flight (dict): Name to request of each request submitted and not yet complete.
+        """
+        timeout_start = time.time()
+        self.submit_ready()
+        while self.pending and time.time() < timeout_start + (timeout * 60):
+            with yaspin(Spinners.line, text='Requests queued: {}, in flight: {}, completed: {}'.format(len(self.pending), len(self.in_flight), len(self.results))):
+                time.sleep(self.poll_interval)
+            self.poll()
+            self.submit_ready()
+        for name, submit in self.pending:
+            self.results[name] = {'id': None, 'status': 'NOT_SUBMITTED', 'submitted': None, 'completed': None, 'error': 'Timeout before submission'}
+        self.pending = []
+        return self.in_flight
+
+    def wait(self, timeout):
+        """
+        Submits and waits on all the queued requests.
+
+        Args:
+            self (object): Queue Object
+            timeout (int): Minutes to wait before giving up on the requests still queued or in flight.
+        Returns:
+            results (dict): Name to result of each request.
+        """
+        timeout_start = time.time()
+        self.submit_ready()
+        while (self.pending or self.in_flight) and time.time() < timeout_start + (timeout * 60):
+            with yaspin(Spinners.line, text='Requests queued: {}, in flight: {}, completed: {}'.format(len(self.pending), len(self.in_flight), len(self.results))):
+                time.sleep(self.poll_interval)
+            self.poll()
+            self.submit_ready()
+        for name, request in self.in_flight.items():
+            self.logger.warning("Timeout: {} has been {} for longer than {} minutes. The request will remain active.".format(name, request['status'], timeout))
+            request['error'] = "Timeout with status {}".format(request['status'])
+            request['status'] = 'TIMEOUT'
+            request['completed'] = time.time()
+            self.results[name] = request
+        self.in_flight = {}
+        for name, submit in self.pending:
+            self.results[name] = {'id': None, 'status': 'NOT_SUBMITTED', 'submitted': None, 'completed': None, 'error': 'Timeout before submission'}
+        self.pending = []
+        return self.results
+
+    def summary(self):
+        """
+        Builds a summary row for each request with the duration from submission to completion.
+
+        Returns:
+            rows (list): [name, status, duration seconds, request id, error] for each request.
+        """
+        rows = []
+        for name, result in self.results.items():
+            if result.get('submitted') and result.get('completed'):
+                duration = "{:0.0f}".format(result['completed'] - result['submitted'])
+            else:
+                duration = ''
+            rows.append([name, result['status'], duration, result.get('id') or '', result.get('error') or ''])
+        rows.sort(key=lambda x: (x[1] == 'SUCCEEDED', x[0]))
+        return rows
+
+    def failures(self):
+        """
+        Returns the names of the requests that did not succeed.
+        """
+        return [name for name, result in self.results.items() if result['status'] != 'SUCCEEDED']
+
+
+class RbsOracleStateStore:
+    """
+    A JSON file that keeps state between runs. Stored in ~/.rubrik_oracle_tools unless a path is supplied.
+    """
+    default_dir = os.path.join(os.path.expanduser('~'), '.rubrik_oracle_tools')
+
+    def __init__(self, name, path=None):
+        self.logger = logging.getLogger(__name__ + '.RbsOracleStateStore')
+        self.path = path or os.path.join(self.default_dir, name)
+        self.data = self.load()
+
+    def load(self):
+        """
+        Reads the store. A missing or unreadable store is treated as empty.
+
+        Returns:
+            data (dict): The stored state.
+        """
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as state_file:
+                return json.load(state_file)
+        except (OSError, ValueError) as err:
+            self.logger.warning("Unable to read the state file {}, starting with empty state: {}".format(self.path, err))
+            return {}
+
+    def save(self):
+        """
+        Writes the store. The file is replaced in one step so an interrupted write does not corrupt it.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as state_file:
+            json.dump(self.data, state_file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+        self.logger.debug("State saved to {}".format(self.path))
+
+
+class RbsOracleStepGraph:
+    """
+    Runs the steps of a workflow in threads as soon as the steps they depend on have completed, so independent steps,
+    such as the backup files mount and the local instance preparation, overlap. A dependency on a step that was not
+    added, for example one completed by an earlier run, is treated as met.
+    """
+    def __init__(self, max_workers=4):
+        self.logger = logging.getLogger(__name__ + '.RbsOracleStepGraph')
+        self.max_workers = max_workers
+        self.steps = collections.OrderedDict()
+        self.results = {}
+        self.seconds = {}
+
+    def add(self, name, function, depends_on=None):
+        """
+        Adds a step.
+
+        Args:
+            name (str): The step name.
+            function (callable): Called with no arguments to run the step.
+            depends_on (list): The names of the steps that must complete first.
+        """
+        self.steps[name] = (function, list(depends_on or []))
+
+    def run_step(self, name, function):
+        start = time.time()
+        self.logger.info("Starting step {}.".format(name))
+        result = function()
+        self.seconds[name] = time.time() - start
+        self.logger.info("Step {} completed in {:0.0f} seconds.".format(name, self.seconds[name]))
+        return result
+
+    def run(self):
+        """
+        Runs all the steps. When a step fails no new steps are started, the running steps are allowed to finish and the
+        first failure is raised.
+
+        Returns:
+            results (dict): The return value of each step that ran.
+        """
+        pending = collections.OrderedDict(self.steps)
+        running = {}
+        failure = None
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if failure is None:
+                    for name, (function, depends_on) in list(pending.items()):
+                        if not any(step in pending or step in running.values() for step in depends_on):
+                            del pending[name]
+                            running[executor.submit(self.run_step, name, function)] = name
+                if not running:
+                    break
+                done, not_done = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        self.logger.debug("Step {} failed: {}".format(name, future.exception()))
+                        if failure is None:
+                            failure = future.exception()
+                    else:
+                        self.results[name] = future.result()
+        if failure is not None:
+            raise failure
+        return self.results
+
+
+class RbsOracleMountPathLock:
+    """
+    An advisory lock on a mount path, held while a files only mount is made on it. Clones that share a mount path on
+    one host mount their backup files one at a time and run the rest of the clone concurrently.
+    """
+    lock_file_name = '.rubrik_oracle_tools.lock'
+    waiting_message = "Waiting for another mount on {} to complete."
+
+    def __init__(self, mount_path, timeout=3600, poll_interval=5):
+        self.logger = logging.getLogger(__name__ + '.RbsOracleMountPathLock')
+        self.path = os.path.join(mount_path, self.lock_file_name)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.lock_file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def acquire(self):
+        """
+        Waits for the lock. Another process holding it past the timeout is an error.
+        """
+        self.lock_file = open(self.path, 'a')
+        timeout_start = time.time()
+        waiting = False
+        while True:
+            try:
+                fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.time() > timeout_start + self.timeout:
+                    self.lock_file.close()
+                    raise RbsOracleCommonError("Timed out after {} seconds waiting for the lock on {}.".format(self.timeout, self.path))
+                if not waiting:
+                    self.logger.warning(self.waiting_message.format(os.path.dirname(self.path)))
+                    waiting = True
+                time.sleep(self.poll_interval)
+        self.logger.debug("Acquired the mount path lock {}".format(self.path))
+
+    def release(self):
+        if self.lock_file:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+            self.lock_file.close()
+            self.lock_file = None
+            self.logger.debug("Released the mount path lock {}".format(self.path))
+
+
+class RbsOracleStateLock(RbsOracleMountPathLock):
+    """
+    An advisory lock on the directory of a state store, held while the state is read, changed and saved so runs that
+    share the store do not overwrite each other.
+    """
+    waiting_message = "Waiting for another run using the state in {} to complete."
+
+    def __init__(self, store, timeout=600, poll_interval=1):
+        state_dir = os.path.dirname(os.path.abspath(store.path))
+        os.makedirs(state_dir, exist_ok=True)
+        super().__init__(state_dir, timeout, poll_interval)
+        self.store = store
+
+    def acquire(self):
+        """
+        Waits for the lock and reloads the store so changes saved by the previous holder are seen.
+        """
+        super().acquire()
+        self.store.data = self.store.load()
+
+
+class RbsOracleCloneCheckpoint(RbsOracleStateStore):
+    """
+    The completed steps of a clone workflow and the values the later steps need, such as the live mount ID, the backup
+    path and the restore time. Saved after every step so a failed clone can be resumed from the step that failed.
+    """
+    def __init__(self, workflow, new_oracle_name, resume=False, path=None):
+        super().__init__("{}_{}.json".format(workflow, new_oracle_name), path)
+        self.logger = logging.getLogger(__name__ + '.RbsOracleCloneCheckpoint')
+        self.previous = {}
+        self.resumed = bool(resume and self.data.get('completed_steps'))
+        if not self.resumed:
+            self.previous = self.data
+            self.data = {'workflow': workflow, 'new_oracle_name': new_oracle_name, 'completed_steps': [],
+                         'started': datetime.datetime.now().isoformat(timespec='seconds')}
+
+    def done(self, step):
+        """
+        Checks if a step was completed by this run or the run being resumed.
+
+        Args:
+            step (str): The step name.
+        Returns:
+            done (bool): True if the step is complete.
+        """
+        return step in self.data['completed_steps']
+
+    def complete(self, step, **values):
+        """
+        Marks a step complete and saves it along with the values the later steps need.
+
+        Args:
+            step (str): The step name.
+            values: Values to keep in the state, such as the live mount id.
+        """
+        self.data.update(values)
+        if step not in self.data['completed_steps']:
+            self.data['completed_steps'].append(step)
+        self.save()
+        self.logger.info("Clone step {} complete.".format(step))
+
+    def redo(self, step):
+        """
+        Marks a step as not complete so it is run again.
+
+        Args:
+            step (str): The step name.
+        """
+        if step in self.data['completed_steps']:
+            self.data['completed_steps'].remove(step)
+            self.save()
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def finish(self):
+        """
+        Removes the state once the clone has completed.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+@dataclass
+class RbsOracleCommandResult:
+    """The output tail and the Oracle error codes of one statement run in a sqlplus or RMAN session"""
+    command: str
+    output: str
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+    line_count: int = 0
+    progress: Optional["RmanProgressParser"] = None
+
+    def __str__(self) -> str:
+        return self.output
+
+    def rman_failed(self) -> bool:
+        """RMAN ends a failed command with the error message stack (RMAN-00571) and RMAN-03002, warnings alone do not fail"""
+        return 'RMAN-00571' in self.errors or 'RMAN-03002' in self.errors
+
+
+@dataclass
+class RmanProgressEvent:
+    """A channel or backup piece line from the RMAN output with the running totals of the command"""
+    kind: str
+    channel: str
+    name: str = ''
+    files_done: int = 0
+    pieces_done: int = 0
+    bytes_done: int = 0
+    rate_mb: float = 0.0
+
+    def __str__(self) -> str:
+        return "RMAN progress: {} {} {} ({} files, {} pieces, {:0.2f} GB, {:0.1f} MB/s)".format(
+            self.channel, self.kind, self.name, self.files_done, self.pieces_done, self.bytes_done / 1024 ** 3, self.rate_mb)
+
+
+class RmanProgressParser:
+    """
+    Turns RMAN channel and backup piece lines into progress events. Piece sizes are read from the local file system
+    when the piece is on a local path such as a files only mount. Archived logs applied by media recovery are
+    counted once per thread and sequence.
+    """
+    patterns = [
+        ('piece_read', re.compile(r'channel (\S+): reading from backup piece (\S+)')),
+        ('piece_done', re.compile(r'channel (\S+): piece handle=(\S+)')),
+        ('datafile', re.compile(r'channel (\S+): (?:restoring|copying|cataloged) datafile (?:copy )?(\S+)')),
+        ('archivelog', re.compile(r'channel (\S+): restoring archived log\s*(.*)')),
+        ('complete', re.compile(r'channel (\S+): (?:restore|backup set|datafile copy) complete, elapsed time: (\S+)')),
+    ]
+    applied_log_pattern = re.compile(r'archived log (?:for thread (\d+) with sequence (\d+)|file name=\S+ thread=(\d+) sequence=(\d+))')
+
+    def __init__(self):
+        self.start = time.time()
+        self.files_done = 0
+        self.pieces_done = 0
+        self.bytes_done = 0
+        self.channels = set()
+        self.applied_logs = set()
+
+    def feed(self, line):
+        """
+        Parses one line of RMAN output.
+
+        Args:
+            self (object): Parser Object
+            line (str): The output line.
+        Returns:
+            event (RmanProgressEvent): The progress event or None if the line is not a progress line.
+        """
+        match = self.applied_log_pattern.search(line)
+        if match:
+            thread, sequence = match.group(1) or match.group(3), match.group(2) or match.group(4)
+            if (thread, sequence) in self.applied_logs:
+                return None
+            self.applied_logs.add((thread, sequence))
+            return RmanProgressEvent('log_applied', 'recovery', 'thread {} sequence {}'.format(thread, sequence),
+                                     self.files_done, self.pieces_done, self.bytes_done, self.rate_mb())
+        for kind, pattern in self.patterns:
+            match = pattern.search(line)
+            if not match:
+                continue
+            channel, name = match.group(1), match.group(2).strip()
+            self.channels.add(channel)
+            if kind == 'piece_done':
+                self.pieces_done += 1
+                try:
+                    self.bytes_done += os.path.getsize(name)
+                except OSError:
+                    pass
+            elif kind in ('datafile', 'archivelog'):
+                self.files_done += 1
+            return RmanProgressEvent(kind, channel, name, self.files_done, self.pieces_done, self.bytes_done, self.rate_mb())
+        return None
+
+    def logs_per_second(self):
+        """
+        Returns the average number of archived logs applied per second.
+        """
+        elapsed = time.time() - self.start
+        return len(self.applied_logs) / elapsed if elapsed > 0 else 0.0
+
+    def rate_mb(self):
+        """
+        Returns the average rate in MB/s of the pieces completed so far.
+        """
+        elapsed = time.time() - self.start
+        return self.bytes_done / 1024 ** 2 / elapsed if elapsed > 0 else 0.0
+
+
+class RbsOracleSession(abc.ABC):
+    """
+    A sqlplus or RMAN coprocess that is kept alive for a whole workflow. Each statement is followed by a command that
+    prints a sentinel line so the output of every statement can be read back on its own. The process is started on
+    the first statement with ORACLE_HOME and ORACLE_SID set explicitly in its environment. Output is streamed to the
+    log line by line as it is read and only a bounded tail is kept for error checks.
+    """
+    error_pattern = re.compile(r'\b((?:ORA|RMAN)-\d{5})')
+    lost_connection_errors = ['ORA-03113', 'ORA-03114', 'ORA-03135', 'ORA-01012']
+    label = 'SESSION'
+    tail_lines = 500
+
+    def __init__(self, oracle_home, oracle_sid):
+        self.logger = logging.getLogger(__name__ + '.' + type(self).__name__)
+        self.oracle_home = oracle_home
+        self.oracle_sid = oracle_sid
+        self.process = None
+        self.statement_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @abc.abstractmethod
+    def args(self):
+        """
+        Returns the command line that starts the coprocess.
+        """
+
+    @abc.abstractmethod
+    def sentinel_command(self, sentinel):
+        """
+        Returns the command that prints the sentinel line after a statement.
+        """
+
+    def clean_line(self, line):
+        return line
+
+    def progress_parser(self):
+        return None
+
+    def start(self):
+        """
+        Starts the coprocess.
+        """
+        env = os.environ.copy()
+        env['ORACLE_HOME'] = self.oracle_home
+        if self.oracle_sid:
+            env['ORACLE_SID'] = self.oracle_sid
+        self.logger.debug("Starting {} session with ORACLE_HOME={}, ORACLE_SID={}.".format(self.label, self.oracle_home, self.oracle_sid))
+        self.process = Popen(self.args(), stdin=PIPE, stdout=PIPE, stderr=subprocess.STDOUT, env=env,
+                             universal_newlines=True, bufsize=1)
+
+    def restart(self, oracle_sid=None):
+        """
+        Ends the coprocess, optionally switches the ORACLE_SID, and starts a new coprocess on the next statement.
+        Used after the instance has been restarted or renamed outside of this session.
+        """
+        self.close()
+        if oracle_sid:
+            self.oracle_sid = oracle_sid
+
+    def close(self):
+        """
+        Ends the coprocess.
+        """
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            try:
+                self.process.communicate('exit\n', timeout=120)
+            except (subprocess.TimeoutExpired, OSError, ValueError):
+                self.process.kill()
+                self.process.wait()
+        self.logger.debug("{} session ended.".format(self.label))
+        self.process = None
+
+    def run(self, command, retry=False, quiet=False):
+        """
+        Runs a statement in the session and streams its output to the log up to the sentinel. If the session lost its
+        connection to the instance it is restarted for the next statement. The statement is only run again if the
+        caller asks for it, as statements such as shutdown, drop database or recover must not be repeated.
+
+        Args:
+            self (object): Session Object
+            command (str): The statement or script to run.
+            retry (bool): Run the statement again if the connection was lost. Only for statements that are safe to
+                repeat, such as queries.
+            quiet (bool): Log the statement and its output at debug level, for statements that are run repeatedly.
+        Returns:
+            result (RbsOracleCommandResult): The output tail, the ORA- and RMAN- error codes and the progress totals.
+        """
+        if self.process is None or self.process.poll() is not None:
+            self.start()
+        log_level = logging.DEBUG if quiet else logging.INFO
+        self.logger.log(log_level, "{}: {}".format(self.label, command))
+        self.statement_count += 1
+        sentinel = 'RBS_STATEMENT_END_{}_{}'.format(os.getpid(), self.statement_count)
+        start = time.time()
+        tail = collections.deque(maxlen=self.tail_lines)
+        errors = {}
+        line_count = 0
+        progress = self.progress_parser()
+        try:
+            self.process.stdin.write("{}\n{}\n".format(command.rstrip(), self.sentinel_command(sentinel)))
+            self.process.stdin.flush()
+            for line in self.process.stdout:
+                line = self.clean_line(line)
+                if line is None:
+                    continue
+                if line.strip() == sentinel:
+                    break
+                line_count += 1
+                tail.append(line)
+                self.logger.log(log_level, line.rstrip('\n'))
+                for code in self.error_pattern.findall(line):
+                    errors[code] = None
+                if progress:
+                    event = progress.feed(line)
+                    if event:
+                        self.logger.info(event)
+            else:
+                self.logger.warning("{} session ended before the statement completed.".format(self.label))
+        except BrokenPipeError:
+            self.logger.warning("{} session ended before the statement was sent.".format(self.label))
+        if line_count > len(tail):
+            self.logger.debug("{} lines of output, the last {} are kept.".format(line_count, len(tail)))
+        result = RbsOracleCommandResult(command, ''.join(tail), list(errors.keys()), time.time() - start, line_count, progress)
+        if set(result.errors) & set(self.lost_connection_errors):
+            self.logger.warning("{} session lost the connection to {}, restarting the session.".format(self.label, self.oracle_sid))
+            self.restart()
+            if retry:
+                return self.run(command, retry=False, quiet=quiet)
+        return result
+
+
+class RbsOracleSqlplusSession(RbsOracleSession):
+    """
+    A persistent sqlplus / as sysdba session.
+    """
+    label = 'SQL'
+
+    def args(self):
+        return [os.path.join(self.oracle_home, 'bin', 'sqlplus'), '-S', '/', 'as', 'sysdba']
+
+    def sentinel_command(self, sentinel):
+        # The blank line ends any unterminated SQL entry so the prompt is never added to the SQL buffer
+        return "\nprompt {}".format(sentinel)
+
+    def query(self, columns, source, quiet=True):
+        """
+        Runs a query and returns its rows. The columns are joined with a separator on one line per row so values
+        with spaces, such as an open mode of READ ONLY, are read back whole.
+
+        Args:
+            self (object): Session Object
+            columns (list): The select list expressions.
+            source (str): The from clause, with any where clause.
+            quiet (bool): Log the query and its output at debug level.
+        Returns:
+            rows (list): The values of each row as strings.
+            result (RbsOracleCommandResult): The result of the query, for the error check.
+        """
+        self.run("set heading off feedback off pagesize 0 linesize 32767 trimout on", retry=True, quiet=True)
+        result = self.run("select 'RBS_ROW|' || {} from {};".format(" || '|' || ".join(columns), source), retry=True, quiet=quiet)
+        rows = [line.strip().split('|')[1:] for line in result.output.splitlines() if line.strip().startswith('RBS_ROW|')]
+        return rows, result
+
+
+class RbsOracleRmanSession(RbsOracleSession):
+    """
+    A persistent RMAN session connected as target or auxiliary.
+    """
+    label = 'RMAN'
+
+    def __init__(self, oracle_home, oracle_sid, target='target'):
+        super().__init__(oracle_home, oracle_sid)
+        self.target = target
+
+    def args(self):
+        return [os.path.join(self.oracle_home, 'bin', 'rman'), self.target, '/']
+
+    def sentinel_command(self, sentinel):
+        return "host 'echo {}';".format(sentinel)
+
+    def progress_parser(self):
+        return RmanProgressParser()
+
+    def clean_line(self, line):
+        # Strip the RMAN prompts and drop the output of the sentinel host command
+        while line.startswith('RMAN> '):
+            line = line[len('RMAN> '):]
+        if line.strip() == 'host command complete':
+            return None
+        return line
+
+
+class RmanProgressMonitor(threading.Thread):
+    """
+    Reports the progress of a long running RMAN command, such as a duplicate, from a separate sqlplus session on the
+    instance RMAN is writing to. Each interval v$session_longops gives the percent complete and the time remaining and
+    v$backup_async_io gives the read rate of each channel. Progress is logged and can also be appended to a JSON-lines
+    file.
+    """
+    longops_sql = """set pagesize 0 linesize 500 feedback off heading off trimspool on
+select 'LONGOPS|' || opname || '|' || sofar || '|' || totalwork || '|' || nvl(time_remaining, -1) || '|' || elapsed_seconds
+from v$session_longops where opname like 'RMAN%' and totalwork > 0 and sofar <> totalwork;
+select 'ASYNCIO|' || nvl(substr(s.client_info, instr(s.client_info, '=') + 1), to_char(a.sid)) || '|' || sum(a.bytes) || '|' || sum(a.effective_bytes_per_second)
+from v$backup_async_io a, v$session s
+where a.sid = s.sid and a.serial = s.serial# and a.status = 'IN PROGRESS' and a.type = 'INPUT'
+group by nvl(substr(s.client_info, instr(s.client_info, '=') + 1), to_char(a.sid));"""
+
+    def __init__(self, oracle_home, oracle_sid, interval=60, json_file=None):
+        super().__init__(daemon=True)
+        self.logger = logging.getLogger(__name__ + '.RmanProgressMonitor')
+        self.interval = interval
+        self.json_file = json_file
+        self.sqlplus = RbsOracleSqlplusSession(oracle_home, oracle_sid)
+        self.stop_event = threading.Event()
+
+    def __enter__(self):
+        if self.interval > 0:
+            self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                progress = self.poll()
+            # The instance is restarted during a duplicate so a failed poll is retried on the next interval
+            except Exception as err:
+                self.logger.debug("Progress poll failed: {}".format(err))
+                self.sqlplus.restart()
+                continue
+            if progress:
+                self.report(progress)
+        self.sqlplus.close()
+
+    def stop(self):
+        """
+        Stops the monitor and waits a few intervals for the current poll to finish. A poll that hangs, for example
+        after the instance crashed, has its sqlplus process killed so it does not hold up the workflow.
+        """
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout=max(3 * self.interval, 30))
+        if self.is_alive():
+            self.logger.warning("The RMAN progress monitor did not stop, ending its sqlplus session.")
+            process = self.sqlplus.process
+            if process is not None and process.poll() is None:
+                process.kill()
+
+    def poll(self):
+        """
+        Queries the progress views.
+
+        Returns:
+            progress (dict): Percent complete, seconds remaining and the rate of each channel in MB/s or None if no
+            RMAN work is in progress.
+        """
+        result = self.sqlplus.run(self.longops_sql, quiet=True)
+        longops = []
+        channels = {}
+        for line in result.output.splitlines():
+            fields = line.strip().split('|')
+            if fields[0] == 'LONGOPS' and len(fields) == 6:
+                longops.append({'opname': fields[1], 'sofar': float(fields[2]), 'totalwork': float(fields[3]),
+                                'time_remaining': int(fields[4]), 'elapsed': int(fields[5])})
+            elif fields[0] == 'ASYNCIO' and len(fields) == 4:
+                channels[fields[1]] = round(float(fields[3] or 0) / 1024 ** 2, 1)
+        if not longops and not channels:
+            return None
+        # The aggregate operation covers the whole command, otherwise use the sum of the running operations
+        aggregate = [op for op in longops if 'aggregate' in op['opname'].lower()]
+        operations = aggregate or longops
+        sofar = sum(op['sofar'] for op in operations)
+        totalwork = sum(op['totalwork'] for op in operations)
+        remaining = [op['time_remaining'] for op in operations if op['time_remaining'] >= 0]
+        return {'time': datetime.datetime.now().isoformat(timespec='seconds'),
+                'percent_complete': round(sofar / totalwork * 100, 1) if totalwork else None,
+                'eta_seconds': max(remaining) if remaining else None,
+                'channels_mb_per_second': channels,
+                'total_mb_per_second': round(sum(channels.values()), 1)}
+
+    def report(self, progress):
+        """
+        Logs the progress and appends it to the JSON-lines file if one was requested.
+        """
+        percent = "{}%".format(progress['percent_complete']) if progress['percent_complete'] is not None else "unknown"
+        eta = str(datetime.timedelta(seconds=progress['eta_seconds'])) if progress['eta_seconds'] is not None else "unknown"
+        channels = ", ".join("{} {} MB/s".format(channel, rate) for channel, rate in sorted(progress['channels_mb_per_second'].items()))
+        self.logger.warning("RMAN progress: {} complete, ETA {}, {} MB/s total{}".format(
+            percent, eta, progress['total_mb_per_second'], " ({})".format(channels) if channels else ""))
+        if self.json_file:
+            with open(self.json_file, 'a') as json_file:
+                json_file.write(json.dumps(progress) + '\n')
+
+
+class RbsOracleParameterFile:
+    """
+    An Oracle text parameter file (init.ora or pfile) read into entries that can be edited in place and written back
+    in one pass. Each entry is a parameter with the instance it applies to, '*' for sid.param entries that apply to
+    every instance or None for a parameter written without a prefix. Comments, including a comment at the end of a
+    parameter line, and blank lines are kept in their place.
+    """
+    name_pattern = re.compile(r'^\s*(?:([A-Za-z0-9_$#*]+)\.)?([A-Za-z0-9_]+)\s*=\s*(.*)$')
+
+    def __init__(self, path=None, text=''):
+        self.logger = logging.getLogger(__name__ + '.RbsOracleParameterFile')
+        self.path = path
+        self.entries = self.parse(text)
+
+    @classmethod
+    def read(cls, path):
+        """
+        Reads a parameter file.
+
+        Args:
+            path (str): The path of the parameter file.
+        Returns:
+            parameter_file (RbsOracleParameterFile): The parsed parameter file.
+        """
+        with open(path) as parameter_file:
+            return cls(path, parameter_file.read())
+
+    @staticmethod
+    def strip_comment(line):
+        """
+        Removes a comment from a line. A # inside a quoted value is not a comment.
+        """
+        quote = None
+        for index, character in enumerate(line):
+            if quote:
+                if character == quote:
+                    quote = None
+            elif character in '\'"':
+                quote = character
+            elif character == '#':
+                return line[:index], line[index:]
+        return line, ''
+
+    def parse(self, text):
+        """
+        Parses the parameter file text. A value that ends with a comma or a backslash continues on the next line. A
+        comment at the end of a parameter line is kept with the parameter, the comments of a continued value are
+        joined.
+
+        Returns:
+            entries (list): A dict for each parameter (sid, name, value, trailing comment) or comment line (comment).
+        """
+        entries = []
+        pending = ''
+        pending_comments = []
+        for line in text.splitlines():
+            content, comment = self.strip_comment(line)
+            if comment:
+                pending_comments.append(comment)
+            if pending:
+                content = pending + ' ' + content.strip()
+                pending = ''
+            if content.rstrip().endswith(',') or content.rstrip().endswith('\\'):
+                pending = content.rstrip().rstrip('\\').rstrip()
+                continue
+            match = self.name_pattern.match(content)
+            if match:
+                entries.append({'sid': match.group(1), 'name': match.group(2).lower(), 'value': match.group(3).strip(),
+                                'trailing': ' '.join(pending_comments)})
+                pending_comments = []
+                continue
+            pending_comments = []
+            if content.strip():
+                self.logger.warning("Unable to parse the parameter file line: {}".format(line))
+                entries.append({'comment': line})
+            else:
+                entries.append({'comment': comment})
+        if pending:
+            self.logger.warning("The parameter file ends inside a value: {}".format(pending))
+        return entries
+
+    def parameters(self, name=None, sids=None):
+        """
+        Returns the parameter entries, optionally only those for one parameter name and a list of instances. The
+        instance of an unprefixed entry is None.
+        """
+        return [entry for entry in self.entries if 'name' in entry and (name is None or entry['name'] == name.lower())
+                and (sids is None or entry['sid'] in sids)]
+
+    def get(self, name, sid='*'):
+        """
+        Gets the value of a parameter for an instance. A value for the instance is used before a '*' or unprefixed
+        value.
+
+        Returns:
+            value (str): The value as written in the file, quotes included, or None if it is not set.
+        """
+        for candidate in [sid, '*', None]:
+            entries = self.parameters(name, [candidate])
+            if entries:
+                return entries[-1]['value']
+        return None
+
+    def set(self, name, value, sid='*'):
+        """
+        Sets a parameter for an instance. The first entry for the parameter and instance is changed in place and any
+        later entries for them are removed, a parameter that is not set is added at the end.
+        """
+        # An unprefixed entry is the same parameter as a '*' entry
+        entries = self.parameters(name, ['*', None] if sid in ['*', None] else [sid])
+        if entries:
+            entries[0]['value'] = str(value)
+            self.drop(entries[1:])
+        else:
+            self.entries.append({'sid': sid, 'name': name.lower(), 'value': str(value)})
+
+    def remove(self, name, sid=None):
+        """
+        Removes a parameter, for every instance unless one is given.
+        """
+        self.drop(self.parameters(name, None if sid is None else [sid]))
+
+    def drop(self, entries):
+        """
+        Removes the given entries. Entries are matched by identity as duplicate lines are equal.
+        """
+        dropped = set(id(entry) for entry in entries)
+        self.entries = [entry for entry in self.entries if id(entry) not in dropped]
+
+    @staticmethod
+    def split_value(value):
+        """
+        Splits a list value on the commas outside of quotes.
+
+        Returns:
+            items (list): The items with their quotes.
+        """
+        items = []
+        quote = None
+        current = ''
+        for character in value:
+            if quote:
+                if character == quote:
+                    quote = None
+            elif character in '\'"':
+                quote = character
+            elif character == ',':
+                items.append(current.strip())
+                current = ''
+                continue
+            current += character
+        if current.strip():
+            items.append(current.strip())
+        return items
+
+    def rename_sid(self, old_sid, new_sid):
+        """
+        Moves the entries for one instance (old_sid.param) to another instance.
+        """
+        for entry in self.parameters(sids=[old_sid]):
+            entry['sid'] = new_sid
+
+    def rename_database(self, old_name, new_name, renamed_files=None):
+        """
+        Renames a database in the parameters without touching any other use of the old name, such as a path. The
+        db_name, the db_unique_name, instance_name and service_names that are the old name, the XDB dispatcher
+        service and the entries for the old instance are renamed. Files moved with the rename are changed wherever
+        they are listed.
+
+        Args:
+            self (object): Parameter File Object
+            old_name (str): The database name and ORACLE_SID before the rename.
+            new_name (str): The database name and ORACLE_SID after the rename.
+            renamed_files (dict): Old path to new path of the files moved with the rename, such as the control files.
+        """
+        renamed_files = renamed_files or {}
+        for entry in self.parameters():
+            quote = "'" if entry['value'].startswith("'") else ('"' if entry['value'].startswith('"') else '')
+            if entry['name'] == 'db_name':
+                entry['value'] = "{0}{1}{0}".format(quote, new_name)
+            elif entry['name'] in ['db_unique_name', 'instance_name', 'service_names']:
+                items = self.split_value(entry['value'])
+                items = ["{0}{1}{0}".format(quote, new_name) if item.strip('\'"').lower() == old_name.lower() else item for item in items]
+                entry['value'] = ",".join(items)
+            elif entry['name'] == 'dispatchers':
+                entry['value'] = re.sub(r'(?i)\(SERVICE={}XDB\)'.format(re.escape(old_name)), '(SERVICE={}XDB)'.format(new_name), entry['value'])
+            if renamed_files:
+                items = self.split_value(entry['value'])
+                changed = []
+                for item in items:
+                    quote = item[0] if item[:1] in ['"', "'"] else ''
+                    path = item.strip('\'"')
+                    changed.append("{0}{1}{0}".format(quote, renamed_files[path]) if path in renamed_files else item)
+                if changed != items:
+                    entry['value'] = ",".join(changed)
+        self.rename_sid(old_name, new_name)
+
+    def text(self):
+        """
+        Returns the parameter file text, one line for each entry.
+        """
+        lines = []
+        for entry in self.entries:
+            if 'name' in entry:
+                line = "{}{}={}".format("{}.".format(entry['sid']) if entry['sid'] else '', entry['name'], entry['value'])
+                if entry.get('trailing'):
+                    line = "{}  {}".format(line, entry['trailing'])
+                lines.append(line)
+            else:
+                lines.append(entry['comment'])
+        return "\n".join(lines) + "\n"
+
+    def write(self, path=None):
+        """
+        Writes the parameter file. The file is replaced in one step so an interrupted write leaves the old file.
+        """
+        path = path or self.path
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as parameter_file:
+            parameter_file.write(self.text())
+        os.replace(temp_path, path)
+        self.path = path
+        self.logger.debug("Parameter file written to {}".format(path))
+
+
+class RbsOracleBackupManifest:
+    """
+    A list of the backup pieces in a files only mount with the size and kind of each piece. The mount is walked with
+    a parallel os.scandir so large mounts on network file systems are listed quickly.
+    """
+    kinds = ['datafile', 'archivelog', 'controlfile', 'spfile', 'other']
+
+    def __init__(self, path, files=None, scan_seconds=0.0):
+        self.logger = logging.getLogger(__name__ + '.RbsOracleBackupManifest')
+        self.path = path
+        self.files = files or []
+        self.scan_seconds = scan_seconds
+
+    @classmethod
+    def scan(cls, path, workers=16):
+        """
+        Walks a directory tree with a pool of threads, one directory listing per task.
+
+        Args:
+            path (str): The top directory of the mount.
+            workers (int): The number of directories listed at one time.
+        Returns:
+            manifest (RbsOracleBackupManifest): The manifest of every file under the path.
+        """
+        start = time.time()
+        files = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = {executor.submit(cls.scan_directory, path)}
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    directory_files, directories = future.result()
+                    files.extend(directory_files)
+                    pending.update(executor.submit(cls.scan_directory, directory) for directory in directories)
+        manifest = cls(path, sorted(files, key=lambda x: x['path']), time.time() - start)
+        manifest.logger.debug("Scanned {} files in {} in {:0.1f} seconds.".format(len(files), path, manifest.scan_seconds))
+        return manifest
+
+    @classmethod
+    def scan_directory(cls, directory):
+        """
+        Lists one directory.
+
+        Returns:
+            files (list): The files in the directory with their path, size, modification time and kind.
+            directories (list): The subdirectories.
+        """
+        files = []
+        directories = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    files.append({'path': entry.path, 'size': stat.st_size, 'mtime': stat.st_mtime,
+                                  'kind': cls.classify(entry.path)})
+        return files, directories
+
+    @staticmethod
+    def classify(path):
+        """
+        Classifies a backup piece by its name and directory. Control file autobackups are named c-DBID-YYYYMMDD-SS.
+
+        Returns:
+            kind (str): datafile, archivelog, controlfile, spfile or other.
+        """
+        name = os.path.basename(path).lower()
+        directory = os.path.basename(os.path.dirname(path)).lower()
+        if re.match(r'c-\d+-\d{8}-[0-9a-f]{2}$', name) or 'control' in name or name.endswith('.ctl'):
+            return 'controlfile'
+        if 'spfile' in name:
+            return 'spfile'
+        if 'arch' in name or 'arch' in directory or name.endswith('.arc') or name.endswith('.dbf.arc'):
+            return 'archivelog'
+        if name.endswith('.log') or name.endswith('.txt') or name.startswith('.'):
+            return 'other'
+        return 'datafile'
+
+    def summary(self):
+        """
+        Returns the count and total bytes of each kind of backup piece.
+        """
+        summary = {kind: {'count': 0, 'bytes': 0} for kind in self.kinds}
+        for backup_file in self.files:
+            summary[backup_file['kind']]['count'] += 1
+            summary[backup_file['kind']]['bytes'] += backup_file['size']
+        return summary
+
+    @classmethod
+    def auto_channels(cls, backup_path, mount_path, channel_throughput=200, logfile=None):
+        """
+        Chooses the number of RMAN channels for a duplicate from the backup pieces on a mount. The throughput measured
+        by rubrik_oracle_mount_benchmark on this host for the mount path caps the channels the mount can feed. The
+        manifest and the decision are written next to the log file if there is one.
+
+        Args:
+            backup_path (str): The directory holding the mounted backup files.
+            mount_path (str): The path the backup files were mounted on.
+            channel_throughput (int): The per channel throughput target in MB/s.
+            logfile (str): The clone log file.
+        Returns:
+            parallelism (int): The channel count.
+        """
+        logger = logging.getLogger(__name__ + '.RbsOracleBackupManifest')
+        logger.warning("Scanning the backup pieces to choose the number of RMAN channels.")
+        manifest = cls.scan(backup_path)
+        measured = RbsOracleMountBenchmark.stored_throughput(mount_path)
+        if measured:
+            logger.warning("Using the measured mount throughput of {} MB/s from {}.".format(measured['mb_per_second'], measured['measured']))
+        channels, decision = manifest.choose_parallelism(channel_throughput, measured['mb_per_second'] if measured else None)
+        logger.warning("Using {} RMAN channels, limited by {}. Limits: {}.".format(channels, decision['limited_by'], decision['limits']))
+        logger.info("Backup piece summary: {}".format(manifest.summary()))
+        if logfile:
+            manifest.write(os.path.splitext(logfile)[0] + '_manifest.json', decision)
+        return channels
+
+    def choose_parallelism(self, channel_throughput=200, mount_throughput=None, cpu_count=None, min_channel_seconds=60):
+        """
+        Chooses the number of RMAN channels for a restore from this mount. The count is limited by the host CPU count,
+        by the number of datafile pieces, by the number of channels the mount throughput can feed at the per channel
+        throughput and so that every channel has at least min_channel_seconds of work at that throughput.
+
+        Args:
+            self (object): Manifest Object
+            channel_throughput (int): The per channel throughput target in MB/s.
+            mount_throughput (int): The measured throughput of the mount in MB/s, if known.
+            cpu_count (int): The host CPU count. Defaults to the CPU count of this host.
+            min_channel_seconds (int): The least work worth a channel of its own.
+        Returns:
+            parallelism (int): The channel count.
+            decision (dict): The inputs and limits used.
+        """
+        summary = self.summary()
+        cpu_count = cpu_count or os.cpu_count() or 1
+        limits = {'cpu_count': cpu_count, 'datafile_pieces': max(summary['datafile']['count'], 1)}
+        bytes_per_channel = channel_throughput * 1024 ** 2 * min_channel_seconds
+        limits['datafile_bytes'] = max(math.ceil(summary['datafile']['bytes'] / bytes_per_channel), 1)
+        if mount_throughput:
+            limits['mount_throughput'] = max(int(mount_throughput // channel_throughput), 1)
+        parallelism = min(limits.values())
+        decision = {'parallelism': parallelism, 'limited_by': min(limits, key=limits.get), 'limits': limits,
+                    'channel_throughput_mb': channel_throughput, 'mount_throughput_mb': mount_throughput}
+        return parallelism, decision
+
+    @staticmethod
+    def catalog_type(backup_file):
+        """
+        Returns how RMAN catalogs a file: datafilecopy for image copies (data_D-... names), archivelog for archived
+        log copies (thread_sequence_resetlogs or .arc names) and backuppiece for everything else.
+        """
+        name = os.path.basename(backup_file['path']).lower()
+        if backup_file['kind'] == 'datafile' and name.startswith('data_d-'):
+            return 'datafilecopy'
+        if backup_file['kind'] == 'archivelog' and (re.match(r'(?:.*_)?\d+_\d+_\d+\.(?:arc|dbf)$', name) or name.endswith('.arc')):
+            return 'archivelog'
+        return 'backuppiece'
+
+    def select_for_recovery(self, until_time=None, margin_seconds=3600):
+        """
+        Selects the pieces needed to restore the datafiles and recover them to a point in time. All the datafile
+        pieces are kept. Archive log pieces are kept only if they were written between the oldest datafile piece and
+        the end of the recovery window, with a margin on both sides. Control file and spfile pieces are left out.
+
+        Args:
+            self (object): Manifest Object
+            until_time (float): The recovery time as epoch seconds or None to recover to the end of the logs.
+            margin_seconds (int): The margin on each side of the window.
+        Returns:
+            selection (dict): Catalog type (datafilecopy, backuppiece or archivelog) to the list of paths.
+            skipped (int): The number of archive log pieces left out.
+        """
+        datafiles = [backup_file for backup_file in self.files if backup_file['kind'] == 'datafile']
+        window_start = min([backup_file['mtime'] for backup_file in datafiles] or [0]) - margin_seconds
+        window_end = self.archivelog_window_end(until_time, margin_seconds)
+        selection = {'datafilecopy': [], 'backuppiece': [], 'archivelog': []}
+        skipped = 0
+        for backup_file in self.files:
+            if backup_file['kind'] == 'archivelog':
+                if backup_file['mtime'] < window_start or (window_end and backup_file['mtime'] > window_end):
+                    skipped += 1
+                    continue
+            elif backup_file['kind'] != 'datafile':
+                continue
+            selection[self.catalog_type(backup_file)].append(backup_file['path'])
+        return selection, skipped
+
+    def select_archivelogs(self, since_time, until_time=None, margin_seconds=3600):
+        """
+        Selects the archive log pieces needed to roll a recovered database forward from a point in time. Archive log
+        pieces are kept only if they were written between the since time and the end of the recovery window, with a
+        margin on both sides. All the other pieces are left out.
+
+        Args:
+            self (object): Manifest Object
+            since_time (float): The checkpoint time of the database as epoch seconds.
+            until_time (float): The recovery time as epoch seconds or None to recover to the end of the logs.
+            margin_seconds (int): The margin on each side of the window.
+        Returns:
+            selection (dict): Catalog type (backuppiece or archivelog) to the list of paths.
+            skipped (int): The number of archive log pieces left out.
+        """
+        window_start = since_time - margin_seconds
+        window_end = self.archivelog_window_end(until_time, margin_seconds)
+        selection = {'backuppiece': [], 'archivelog': []}
+        skipped = 0
+        for backup_file in self.files:
+            if backup_file['kind'] != 'archivelog':
+                continue
+            if backup_file['mtime'] < window_start or (window_end and backup_file['mtime'] > window_end):
+                skipped += 1
+                continue
+            selection[self.catalog_type(backup_file)].append(backup_file['path'])
+        return selection, skipped
+
+    def archivelog_window_end(self, until_time, margin_seconds):
+        """
+        Finds the latest write time of the archive log pieces needed to recover to a point in time. The redo for the
+        recovery time is archived and backed up after it, often hours later, so the window ends at the first archive
+        log piece written after the recovery time, with a margin so the other pieces of that log backup are kept.
+
+        Returns:
+            window_end (float): Epoch seconds, or None to keep every archive log piece after the window start.
+        """
+        if not until_time:
+            return None
+        later = [backup_file['mtime'] for backup_file in self.files if backup_file['kind'] == 'archivelog' and backup_file['mtime'] > until_time]
+        if not later:
+            return None
+        return min(later) + margin_seconds
+
+    @staticmethod
+    def catalog_commands(selection, batch_size=100):
+        """
+        Builds batched RMAN catalog commands for a selection.
+
+        Returns:
+            commands (list): The RMAN catalog commands.
+        """
+        commands = []
+        for catalog_type, paths in selection.items():
+            for index in range(0, len(paths), batch_size):
+                commands.append("catalog {} {};".format(catalog_type, ", ".join("'{}'".format(path) for path in paths[index:index + batch_size])))
+        return commands
+
+    def write(self, manifest_file, decision=None):
+        """
+        Writes the manifest and the parallelism decision as JSON.
+        """
+        with open(manifest_file, 'w') as json_file:
+            json.dump({'path': self.path, 'scan_seconds': round(self.scan_seconds, 2), 'summary': self.summary(),
+                       'decision': decision, 'files': self.files}, json_file, indent=2)
+        self.logger.debug("Backup piece manifest written to {}".format(manifest_file))
+
+
+class RbsOracleMountBenchmark:
+    """
+    Measures how fast the backup pieces in a files only mount can be read with 1 to N concurrent readers. Each reader
+    reads whole pieces in large blocks, either buffered with the pages dropped from the cache after each piece or with
+    O_DIRECT into a page aligned buffer. The results are kept in the state store by host and mount path so the clone
+    tools can use the measured throughput when choosing the number of RMAN channels.
+    """
+    store_name = 'mount_throughput.json'
+
+    def __init__(self, files, block_size=8, direct=False, level_seconds=20):
+        self.logger = logging.getLogger(__name__ + '.RbsOracleMountBenchmark')
+        self.files = files
+        self.block_size = block_size * 1024 ** 2
+        self.direct = direct and hasattr(os, 'O_DIRECT')
+        self.level_seconds = level_seconds
+        self.next_file = 0
+        self.lock = threading.Lock()
+        if direct and not self.direct:
+            self.logger.warning("O_DIRECT is not available on this platform, using buffered reads.")
+
+    def take_file(self):
+        """
+        Returns the next piece to read. The pieces are handed out in turn across all the levels so each level reads
+        pieces the previous level did not.
+        """
+        with self.lock:
+            path = self.files[self.next_file % len(self.files)]
+            self.next_file += 1
+            return path
+
+    def read_file(self, path, deadline):
+        """
+        Reads one piece until its end or the deadline.
+
+        Returns:
+            bytes_read (int): The number of bytes read.
+        """
+        bytes_read = 0
+        fd = os.open(path, os.O_RDONLY | (os.O_DIRECT if self.direct else 0))
+        # An anonymous map is page aligned as O_DIRECT requires, both are reused for every block of the piece
+        buffer = mmap.mmap(-1, self.block_size) if self.direct else bytearray(self.block_size)
+        try:
+            while time.time() < deadline:
+                count = os.readv(fd, [buffer])
+                bytes_read += count
+                if count < self.block_size:
+                    break
+            if not self.direct:
+                # Drop the pages so a later level does not read this piece from the cache
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            if self.direct:
+                buffer.close()
+            os.close(fd)
+        return bytes_read
+
+    def reader(self, deadline):
+        bytes_read = 0
+        while time.time() < deadline:
+            bytes_read += self.read_file(self.take_file(), deadline)
+        return bytes_read
+
+    def run_level(self, readers):
+        """
+        Reads with a number of concurrent readers for the level time.
+
+        Returns:
+            result (dict): The readers, the bytes read, the seconds and the MB/s.
+        """
+        start = time.time()
+        deadline = start + self.level_seconds
+        with concurrent.futures.ThreadPoolExecutor(max_workers=readers) as executor:
+            bytes_read = sum(executor.map(self.reader, [deadline] * readers))
+        seconds = time.time() - start
+        result = {'readers': readers, 'bytes': bytes_read, 'seconds': round(seconds, 2),
+                  'mb_per_second': round(bytes_read / 1024 ** 2 / seconds, 1) if seconds else 0.0}
+        self.logger.warning("{} readers: {} MB/s".format(readers, result['mb_per_second']))
+        return result
+
+    def run(self, max_readers=16):
+        """
+        Runs the levels 1, 2, 4 ... up to max_readers.
+
+        Returns:
+            results (list): The result of each level.
+        """
+        levels = []
+        readers = 1
+        while readers < max_readers:
+            levels.append(readers)
+            readers *= 2
+        levels.append(max_readers)
+        return [self.run_level(readers) for readers in levels]
+
+    @staticmethod
+    def knee(results, min_gain=0.1):
+        """
+        Finds the knee of the throughput curve, the level after which adding readers gains less than min_gain.
+
+        Args:
+            results (list): The result of each level, in increasing readers.
+            min_gain (float): The smallest gain in throughput, as a fraction, that is worth the extra readers.
+        Returns:
+            knee (dict): The result of the knee level.
+        """
+        for current, following in zip(results, results[1:]):
+            if following['mb_per_second'] < current['mb_per_second'] * (1 + min_gain):
+                return current
+        return results[-1]
+
+    @classmethod
+    def save(cls, host, mount_path, record, path=None):
+        """
+        Saves a benchmark result for a host and mount path.
+        """
+        store = RbsOracleStateStore(cls.store_name, path)
+        with RbsOracleStateLock(store):
+            store.data.setdefault(host, {})[os.path.abspath(mount_path)] = record
+            store.save()
+        return store.path
+
+    @classmethod
+    def stored_throughput(cls, mount_path, host=None, path=None):
+        """
+        Gets the measured throughput of a mount path on a host. A measurement of another mount path on the same host
+        is used if the path itself has not been measured, the most recent first.
+
+        Returns:
+            record (dict): The stored benchmark result or None if the host has not been measured.
+        """
+        host = host or os.uname()[1].split('.')[0]
+        measured = RbsOracleStateStore(cls.store_name, path).data.get(host, {})
+        record = measured.get(os.path.abspath(mount_path))
+        if not record and measured:
+            record = max(measured.values(), key=lambda x: x.get('measured', ''))
+        return record
+
+
+@dataclass
+class RbsOracleNodeResult:
+    """The exit status and output of one command run on one RAC node"""
+    node: str
+    command: str
+    exit_status: int
+    output: str = ''
+    errors: str = ''
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_status == 0
+
+
+class RbsOracleRacNodeExecutor:
+    """
+    Runs shell commands on the nodes of a RAC cluster. The SSH connections to all the nodes are opened in parallel and
+    kept until the executor is closed, so every command after the first reuses them. The node running the script runs
+    its commands locally.
+    """
+    failed_marker = 'RBS_CHECK_FAILED'
+
+    def __init__(self, nodes, local_node=None, username=None, timeout=30):
+        self.logger = logging.getLogger(__name__ + '.RbsOracleRacNodeExecutor')
+        self.nodes = list(nodes)
+        self.local_node = local_node
+        self.username = username
+        self.timeout = timeout
+        self.clients = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def is_local(self, node):
+        return bool(self.local_node) and node.split('.')[0] == self.local_node.split('.')[0]
+
+    def connect_node(self, node):
+        ssh_client = paramiko.SSHClient()
+        ssh_client.load_system_host_keys()
+        ssh_client.connect(node, username=self.username, timeout=self.timeout)
+        return ssh_client
+
+    def connect(self):
+        """
+        Opens the SSH connections to the remote nodes in parallel.
+
+        Returns:
+            failures (dict): The connection error of each node that could not be reached.
+        """
+        remote_nodes = [node for node in self.nodes if not self.is_local(node) and node not in self.clients]
+        failures = {}
+        if not remote_nodes:
+            return failures
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(remote_nodes)) as executor:
+            futures = {executor.submit(self.connect_node, node): node for node in remote_nodes}
+            for future in concurrent.futures.as_completed(futures):
+                node = futures[future]
+                try:
+                    self.clients[node] = future.result()
+                    self.logger.debug("Connected to {}".format(node))
+                except Exception as err:
+                    failures[node] = str(err)
+                    self.logger.warning("Unable to connect to {}: {}".format(node, err))
+        return failures
+
+    def run_node(self, node, command):
+        """
+        Runs a command on one node.
+
+        Args:
+            node (str): The node name.
+            command (str): The shell command.
+        Returns:
+            result (RbsOracleNodeResult): The exit status and output.
+        """
+        start = time.time()
+        try:
+            if self.is_local(node):
+                process = subprocess.run(['/bin/sh', '-c', command], stdout=PIPE, stderr=PIPE, universal_newlines=True)
+                result = RbsOracleNodeResult(node, command, process.returncode, process.stdout, process.stderr)
+            else:
+                if node not in self.clients:
+                    self.clients[node] = self.connect_node(node)
+                stdin, stdout, stderr = self.clients[node].exec_command(command, timeout=self.timeout)
+                output = stdout.read().decode()
+                errors = stderr.read().decode()
+                result = RbsOracleNodeResult(node, command, stdout.channel.recv_exit_status(), output, errors)
+        except Exception as err:
+            result = RbsOracleNodeResult(node, command, -1, '', str(err))
+        result.seconds = time.time() - start
+        self.logger.debug("{} on {} exited with {} in {:0.1f} seconds: {} {}".format(
+            command, node, result.exit_status, result.seconds, result.output.strip(), result.errors.strip()))
+        return result
+
+    def run(self, command, nodes=None):
+        """
+        Runs a command on the nodes concurrently.
+
+        Args:
+            command (str): The shell command.
+            nodes (list): The nodes to run on, all of them if not set.
+        Returns:
+            results (dict): The RbsOracleNodeResult of each node.
+        """
+        nodes = nodes or self.nodes
+        results = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(nodes)) as executor:
+            futures = {executor.submit(self.run_node, node, command): node for node in nodes}
+            for future in concurrent.futures.as_completed(futures):
+                results[futures[future]] = future.result()
+        return results
+
+    def provision(self, directories=None, checks=None, nodes=None):
+        """
+        Creates the directories and runs the pre-flight checks on every node in one command per node.
+
+        Args:
+            directories (list): Directories that must exist and be writable.
+            checks (dict): Shell tests that must succeed, by description.
+            nodes (list): The nodes to provision, all of them if not set.
+        Returns:
+            failures (dict): The failed directories and checks of each node with a problem.
+        """
+        script = []
+        for directory in directories or []:
+            script.append("mkdir -p {0} && test -w {0} || echo '{1} directory {2}'".format(shlex.quote(directory), self.failed_marker, directory))
+        for description, check in (checks or {}).items():
+            script.append("{} || echo '{} {}'".format(check, self.failed_marker, description))
+        failures = {}
+        for node, result in self.run("; ".join(script), nodes).items():
+            problems = [line.split(' ', 1)[1] for line in result.output.splitlines() if line.startswith(self.failed_marker)]
+            if result.exit_status == -1:
+                problems.append(result.errors)
+            if problems:
+                failures[node] = problems
+            else:
+                self.logger.info("Node {} provisioned in {:0.1f} seconds.".format(node, result.seconds))
+        return failures
+
+    def close(self):
+        for node, ssh_client in self.clients.items():
+            ssh_client.close()
+        self.clients = {}
+
+
+class RbsOracleCrsRunner:
+    """
+    Runs the srvctl steps that register and start a RAC database in CRS. The exit code and output of every command are
+    kept, the per instance registrations and starts run concurrently and the start is verified by polling srvctl status.
+    """
+    running_pattern = re.compile(r'Instance (\S+) is running on node (\S+)')
+
+    def __init__(self, oracle_home, database_name, max_workers=8):
+        self.logger = logging.getLogger(__name__ + '.RbsOracleCrsRunner')
+        self.oracle_home = oracle_home
+        self.database_name = database_name
+        self.max_workers = max_workers
+        self.srvctl_path = os.path.join(oracle_home, 'bin', 'srvctl')
+        self.environment = dict(os.environ, ORACLE_HOME=oracle_home)
+
+    def srvctl(self, arguments, node=None):
+        """
+        Runs one srvctl command.
+
+        Args:
+            arguments (list): The srvctl arguments.
+            node (str): The node the command is for, used in the result.
+        Returns:
+            result (RbsOracleNodeResult): The exit status and output.
+        """
+        command = [self.srvctl_path] + arguments
+        start = time.time()
+        try:
+            process = subprocess.run(command, stdout=PIPE, stderr=PIPE, universal_newlines=True, env=self.environment)
+            result = RbsOracleNodeResult(node or '', ' '.join(command), process.returncode, process.stdout, process.stderr)
+        except OSError as err:
+            result = RbsOracleNodeResult(node or '', ' '.join(command), -1, '', str(err))
+        result.seconds = time.time() - start
+        self.logger.debug("{} exited with {} in {:0.1f} seconds: {} {}".format(
+            result.command, result.exit_status, result.seconds, result.output.strip(), result.errors.strip()))
+        return result
+
+    def run_instances(self, instances, arguments):
+        """
+        Runs a srvctl command for each instance concurrently.
+
+        Args:
+            instances (dict): The node of each instance.
+            arguments (callable): Returns the srvctl arguments for an instance and its node.
+        Returns:
+            results (dict): The RbsOracleNodeResult of each instance.
+        """
+        results = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.max_workers, max(len(instances), 1))) as executor:
+            futures = {executor.submit(self.srvctl, arguments(instance, node), node): instance for instance, node in instances.items()}
+            for future in concurrent.futures.as_completed(futures):
+                results[futures[future]] = future.result()
+        return results
+
+    def add_instances(self, instances):
+        return self.run_instances(instances, lambda instance, node: ['add', 'instance', '-d', self.database_name, '-i', instance, '-n', node])
+
+    def start_instances(self, instances, timeout=600, poll_interval=2, max_poll_interval=30):
+        """
+        Starts the instances concurrently and polls srvctl status with a growing interval while the starts run. Each
+        instance is timed from its own srvctl start until it is seen running or its srvctl start returns, whichever is
+        first.
+
+        Args:
+            instances (dict): The node of each instance.
+            timeout (int): Seconds to wait.
+            poll_interval (int): Seconds before the first poll, doubled after each poll.
+            max_poll_interval (int): The longest interval between polls.
+        Returns:
+            started (dict): Seconds from its start until each instance was running, None for an instance that did not
+            start.
+            results (dict): The RbsOracleNodeResult of the srvctl start of each instance that returned.
+        """
+        start_times = {}
+
+        def start_instance(instance, node):
+            start_times[instance] = time.time()
+            return self.srvctl(['start', 'instance', '-d', self.database_name, '-i', instance], node)
+
+        started = {instance: None for instance in instances}
+        results = {}
+        timeout_start = time.time()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=min(self.max_workers, max(len(instances), 1)))
+        futures = {executor.submit(start_instance, instance, node): instance for instance, node in instances.items()}
+        try:
+            while True:
+                time.sleep(poll_interval)
+                poll_interval = min(poll_interval * 2, max_poll_interval)
+                for future in [future for future in futures if future.done()]:
+                    instance = futures.pop(future)
+                    results[instance] = future.result()
+                    # srvctl start instance returns once the instance is running
+                    if results[instance].ok and started[instance] is None:
+                        started[instance] = results[instance].seconds
+                        self.logger.info("Instance {} is running on {} after {:0.0f} seconds.".format(instance, instances[instance], started[instance]))
+                for instance in self.running_instances():
+                    if instance in started and started[instance] is None and instance in start_times:
+                        started[instance] = time.time() - start_times[instance]
+                        self.logger.info("Instance {} is running on {} after {:0.0f} seconds.".format(instance, instances[instance], started[instance]))
+                if all(seconds is not None for seconds in started.values()) or not futures or time.time() - timeout_start > timeout:
+                    return started, results
+        finally:
+            # A start still running at the timeout is left to finish on its own
+            executor.shutdown(wait=False)
+
+    def running_instances(self):
+        """
+        Returns:
+            running (dict): The node each running instance of the database is on, from srvctl status.
+        """
+        result = self.srvctl(['status', 'database', '-d', self.database_name])
+        return dict(self.running_pattern.findall(result.output))
+
+
 class TimerError(Exception):
     """A custom exception used to report errors in use of Timer class"""
 
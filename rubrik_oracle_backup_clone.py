@@ -5,7 +5,7 @@ import logging
 import sys
 import os
 import platform
-from datetime import datetime
+from datetime import datetime, timedelta
 import configparser
 
 
@@ -16,7 +16,8 @@ import configparser
 @click.option('--configuration_file', '-f', type=str, help='Oracle duplicate configuration file, can be used for all optional parameters. Overrides any set as script options')
 @click.option('--time_restore', '-t', type=str, help='The point in time for the database clone in  iso 8601 format (2019-04-30T18:23:21)')
 @click.option('--oracle_home', '-o', type=str, help='ORACLE_HOME path for this database clone')
-@click.option('--parallelism', '-p', default=4, type=str, help='The degree of parallelism to use for the RMAN duplicate')
+@click.option('--parallelism', '-p', default=4, type=str, help='The degree of parallelism to use for the RMAN duplicate or auto to choose it from the backup pieces, the host CPU count and the measured mount throughput')
+@click.option('--channel_throughput', type=int, default=200, help='Per channel throughput target in MB/s used by --parallelism auto (default 200)')
 @click.option('--no_spfile', is_flag=True, help='Restore SPFILE and replace instance specific parameters with new DB name')
 @click.option('--no_file_name_check', is_flag=True, help='Do not check for existing files and overwrite existing files. Potentially destructive use with caution')
 @click.option('--refresh_db', is_flag=True, help='Refresh and existing database. Overwriting exiting database. Requires no_file_name_check.')
@@ -26,10 +27,16 @@ import configparser
 @click.option('--audit_file_dest', type=str, help='Set the path for the audit files. This path must exist on the target host')
 @click.option('--core_dump_dest', type=str, help='Set the path for the core dump files. This path must exist on the target host')
 @click.option('--log_path', '-l', type=str, help='Log directory, if not specified the mount_path with be used.')
+@click.option('--progress_interval', type=int, default=60, help='Seconds between RMAN duplicate progress reports (default 60). 0 turns the reports off')
+@click.option('--progress_file', type=str, help='Also append the RMAN duplicate progress reports to this file as JSON lines')
+@click.option('--resume', is_flag=True, help='Resume a failed clone from the step that failed, reusing the mounted backup files')
+@click.option('--roll_forward', is_flag=True, help='Keep the clone as a mounted standby and refresh it by recovering it with the newer archive logs. A full duplicate is only run when there is no clone or its incarnation has changed')
+@click.option('--catalog_margin', type=int, default=60, help='Minutes of archive logs before the clone checkpoint and after the restore time to catalog with --roll_forward (default 60)')
 @click.option('--debug_level', '-d', type=str, default='WARNING', help='Logging level: DEBUG, INFO, WARNING or CRITICAL.')
-def cli(source_host_db, mount_path, new_oracle_name, configuration_file, time_restore, oracle_home, parallelism,
+def cli(source_host_db, mount_path, new_oracle_name, configuration_file, time_restore, oracle_home, parallelism, channel_throughput,
         no_spfile, no_file_name_check, refresh_db, control_files, db_file_name_convert, log_file_name_convert,
-        audit_file_dest, core_dump_dest,  log_path, debug_level):
+        audit_file_dest, core_dump_dest,  log_path, progress_interval, progress_file, resume, roll_forward, catalog_margin,
+        debug_level):
     """
     This will use the Rubrik RMAN backups to do a duplicate (or refresh) of an Oracle Database.
 
@@ -40,6 +47,21 @@ def cli(source_host_db, mount_path, new_oracle_name, configuration_file, time_re
     parameters can be provided in a configuration file. All the flag options must be entered as true false in the
     configuration file. If the Oracle Home is not specified the ORACLE_HOME path from the source database will be used.
     If a log directory is not specified, no log will be created.
+
+\b
+    The clone runs as a series of steps (mount, prepare, duplicate, unmount) and its state is kept in
+    ~/.rubrik_oracle_tools/backup_clone_<new_oracle_name>.json. If a clone fails, rerun it with --resume to skip the
+    completed steps and reuse the mounted backup files. A resumed duplicate restarts the auxiliary instance and RMAN
+    skips the datafiles already restored. The backup files are mounted while the auxiliary instance is started on
+    this host. Several clones can share the mount path on one host, their backup files are mounted one at a time.
+\b
+    With --roll_forward the clone is duplicated for standby, named for the new db name with db_unique_name, and left
+    mounted. Later refreshes mount the backup files for the new point in time, catalog only the archive logs written
+    since the clone checkpoint and recover the clone to the new point in time, which takes minutes for a day of
+    changes. The DBID of the clone is checked against the latest control file autobackup in the mount and the
+    incarnation against the cataloged archive logs. If either has changed, or there is no standby clone, a full
+    duplicate is run instead. Replacing an existing clone requires --refresh_db and --no_file_name_check. The
+    standby clone can be opened read only between refreshes, it is mounted again for the next refresh.
 \b
 Example:
 rubrik_oracle_backup_clone -s jz-sourcehost-1:ora1db -m /u02/oradata/restore -n oracln -t 2020-11-06T00:06:00 -p 8
@@ -55,8 +77,10 @@ Example Configuration File:
 ### The following line is required:
 [parameters]
 ### All parameters are optional. Command line flags are boolean (true/false)
-### The degree of parallelism to use for the RMAN duplicate (default is 4)
+### The degree of parallelism to use for the RMAN duplicate (default is 4) or auto
 # parallelism = 4
+### Per channel throughput target in MB/s used when parallelism is auto
+# channel_throughput = 200
 ### Do not restore the spfile renaming the parameters with the new db name.
 # no_spfile = true
 ### Pint in time for duplicate
@@ -80,6 +104,14 @@ Example Configuration File:
 # core_dump_dest = '/u01/app/oracle/admin/clonedb/cdump'
 ### Directory where logs will be created. If not provided not logs will be created
 # log_path = /home/oracle/clone_logs
+### Seconds between RMAN duplicate progress reports, 0 turns the reports off
+# progress_interval = 60
+### File to append the RMAN duplicate progress reports to as JSON lines
+# progress_file = /home/oracle/clone_logs/clonedb_progress.json
+### Keep the clone as a mounted standby and roll it forward with the newer archive logs
+# roll_forward = true
+### Minutes of archive logs to catalog on each side of the roll forward window
+# catalog_margin = 60
 \b
 Example:
 rubrik_oracle_backup_clone -s jz-sourcehost-1:ora1db -m /u02/oradata/restore -n oracln -f /home/oracle/clone_config.txt
@@ -102,6 +134,8 @@ rubrik_oracle_backup_clone -s jz-sourcehost-1:ora1db -m /u02/oradata/restore -n
         configuration.read(configuration_file)
         if 'parallelism' in configuration['parameters'].keys():
             parallelism = configuration['parameters']['parallelism']
+        if 'channel_throughput' in configuration['parameters'].keys():
+            channel_throughput = configuration['parameters'].getint('channel_throughput')
         if 'no_spfile' in configuration['parameters'].keys():
             no_spfile = configuration['parameters'].getboolean('no_spfile')
         if 'oracle_home' in configuration['parameters'].keys():
@@ -118,6 +152,14 @@ rubrik_oracle_backup_clone -s jz-sourcehost-1:ora1db -m /u02/oradata/restore -n
             log_file_name_convert = configuration['parameters']['log_file_name_convert']
         if 'log_path' in configuration['parameters'].keys():
             log_path = configuration['parameters']['log_path']
+        if 'progress_interval' in configuration['parameters'].keys():
+            progress_interval = configuration['parameters'].getint('progress_interval')
+        if 'progress_file' in configuration['parameters'].keys():
+            progress_file = configuration['parameters']['progress_file']
+        if 'roll_forward' in configuration['parameters'].keys():
+            roll_forward = configuration['parameters'].getboolean('roll_forward')
+        if 'catalog_margin' in configuration['parameters'].keys():
+            catalog_margin = configuration['parameters'].getint('catalog_margin')
         if 'time_restore' in configuration['parameters'].keys():
             time_restore = configuration['parameters']['time_restore']
         if 'audit_file_dest' in configuration['parameters'].keys():
@@ -127,6 +169,7 @@ rubrik_oracle_backup_clone -s jz-sourcehost-1:ora1db -m /u02/oradata/restore -n
         logger.debug("Parameters for duplicate loaded from file: {}.".format(configuration))
 
     # Set up the file logging
+    logfile = None
     if log_path:
         os.makedirs(log_path, exist_ok=True)
         logfile = os.path.join(log_path, "{}_Clone_{}.log".format(new_oracle_name, datetime.now().strftime("%Y%m%d-%H%M%S")))
@@ -156,8 +199,24 @@ rubrik_oracle_backup_clone -s jz-sourcehost-1:ora1db -m /u02/oradata/restore -n
             host_id = database.get_rac_id(rubrik.cluster_id, host_target)
     else:
         host_id = database.get_host_id(rubrik.cluster_id, host_target)
+    checkpoint = rbs_oracle_common.RbsOracleCloneCheckpoint('backup_clone', new_oracle_name, resume)
+    if resume and not checkpoint.resumed:
+        logger.debug("There is no saved state in {} for a clone of {} to resume. Aborting clone".format(checkpoint.path, new_oracle_name))
+        raise RubrikOracleBackupMountCloneError("There is no saved state in {} for a clone of {} to resume.".format(checkpoint.path, new_oracle_name))
+    if checkpoint.resumed:
+        if checkpoint.get('source_host_db') != ":".join(source_host_db):
+            logger.debug("The clone being resumed was from {}, not {}. Aborting clone".format(checkpoint.get('source_host_db'), ":".join(source_host_db)))
+            raise RubrikOracleBackupMountCloneError("The clone being resumed was from {}, not {}.".format(checkpoint.get('source_host_db'), ":".join(source_host_db)))
+        logger.warning("Resuming the clone of {} to {}. Completed steps: {}.".format(source_host_db[1], new_oracle_name, ", ".join(checkpoint.get('completed_steps'))))
+    elif checkpoint.previous.get('live_mount_id'):
+        logger.warning("A previous clone to {} did not complete and left live mount id {} mounted at {}. Use --resume to reuse it.".format(
+            new_oracle_name, checkpoint.previous['live_mount_id'], checkpoint.previous.get('backup_path')))
     # Use the provided time or if no time has been provided use the the most recent recovery point
-    if time_restore:
+    if checkpoint.resumed:
+        time_restore = checkpoint.get('time_restore')
+        time_ms = checkpoint.get('time_ms')
+        logger.warning("Using the restore time of the clone being resumed: {}.".format(time_restore or "most recent recovery point"))
+    elif time_restore:
         time_ms = database.epoch_time(time_restore, rubrik.timezone)
         logger.warning("Materializing backup set from time {} for mount.". format(time_restore))
     else:
@@ -172,103 +231,254 @@ rubrik_oracle_backup_clone -s jz-sourcehost-1:ora1db -m /u02/oradata/restore -n
     if not os.path.exists(oracle_home):
         logger.debug("The ORACLE_HOME: {} does not exist on the target host: {}".format(oracle_home, host_target))
         raise RubrikOracleBackupMountCloneError("The ORACLE_HOME: {} does not exist on the target host: {}".format(oracle_home, host_target))
-    # Get directories in path to allow us to find the new directory after the mount
-    live_mount_directories = os.listdir(mount_path)
-    logger.warning("Starting the mount of the requested {} backup pieces on {}.".format(source_host_db[1], host_target))
-    live_mount_info = database.live_mount(host_id, time_ms, files_only=True, mount_path=mount_path)
-    live_mount_info = database.async_requests_wait(live_mount_info['id'], 20)
-    logger.debug("Backup Live Mount Asyc Request: {}".format(live_mount_info))
-    logger.info("Async request completed with status: {}".format(live_mount_info['status']))
-    if live_mount_info['status'] != "SUCCEEDED":
-        logger.debug("Mount of backup files did not complete successfully. Mount ended with status {}".format(live_mount_info['status']))
-        raise RubrikOracleBackupMountCloneError("Mount of backup files did not complete successfully. Mount ended with status {}".format(live_mount_info['status']))
-    logger.warning("Live mount of the backup files completed.")
-    # Now determine the new live mount directory
-    new_live_mount_directories = os.listdir(mount_path)
-    live_mount_directory = list(set(new_live_mount_directories) - set(live_mount_directories))
-    if len(live_mount_directory) == 1:
-        backup_path = os.path.join(mount_path, live_mount_directory[0])
-    else:
-        logger.debug("Multiple directories were created in {} during this operation. Live mount directory cannot be determined".format(mount_path))
-        raise RubrikOracleBackupMountCloneError("Multiple directories were created in {} during this operation. Live mount directory cannot be determined".format(mount_path))
-    logger.info("Using the live mount path: {}".format(backup_path))
-    live_mount_id = live_mount_directory[0].split('_')[1]
-    logger.debug("Live mount ID is {}".format(live_mount_id))
 
-    os.environ["ORACLE_HOME"] = oracle_home
-    os.environ["ORACLE_SID"] = new_oracle_name
-    logger.debug("Setting env variable ORACLE_HOME={}, ORACLE_SID={}.".format(oracle_home, new_oracle_name))
+    if checkpoint.done('mount') and not os.path.isdir(checkpoint.get('backup_path')):
+        logger.warning("The backup files are no longer mounted at {}, mounting them again.".format(checkpoint.get('backup_path')))
+        checkpoint.redo('mount')
+    if checkpoint.done('mount'):
+        logger.warning("Reusing the live mount of the backup files at {}.".format(checkpoint.get('backup_path')))
 
-    if refresh_db:
-        logger.warning("Shutting down {} database for refresh".format(new_oracle_name))
-        logger.info(database.sqlplus_sysdba(oracle_home, "shutdown immediate;"))
-    if no_spfile:
-        logger.warning("Starting auxiliary instance")
-        sql_return = database.sqlplus_sysdba(oracle_home, "startup nomount")
-        logger.info(sql_return)
-    else:
-        logger.warning("Creating minimal init file to start instance")
-        init_file = os.path.join(oracle_home, 'dbs', 'init{}.ora'.format(new_oracle_name))
-        logger.debug("Creating new temporary init file {}".format(init_file))
-        with open(init_file, 'w') as file:
-            file.write('db_name={}\n'.format(new_oracle_name))
-        logger.warning("Starting auxiliary instance")
-        sql_return = database.sqlplus_sysdba(oracle_home, "startup nomount pfile='{}'".format(init_file))
-        logger.info(sql_return)
+    def mount_backup_files():
+        logger.warning("Starting the mount of the requested {} backup pieces on {}.".format(source_host_db[1], host_target))
+        with rbs_oracle_common.RbsOracleMountPathLock(mount_path):
+            live_mount_info = database.live_mount(host_id, time_ms, files_only=True, mount_path=mount_path)
+            live_mount_info = database.async_requests_wait(live_mount_info['id'], 20)
+            logger.debug("Backup Live Mount Asyc Request: {}".format(live_mount_info))
+            logger.info("Async request completed with status: {}".format(live_mount_info['status']))
+            if live_mount_info['status'] != "SUCCEEDED":
+                logger.debug("Mount of backup files did not complete successfully. Mount ended with status {}".format(live_mount_info['status']))
+                raise RubrikOracleBackupMountCloneError("Mount of backup files did not complete successfully. Mount ended with status {}".format(live_mount_info['status']))
+            live_mount_id, backup_path = database.get_files_only_mount(live_mount_info, mount_path)
+        logger.warning("Live mount of the backup files completed.")
+        logger.info("Using the live mount path: {}".format(backup_path))
+        logger.debug("Live mount ID is {}".format(live_mount_id))
+        checkpoint.complete('mount', source_host_db=":".join(source_host_db), time_restore=time_restore, time_ms=time_ms,
+                            live_mount_id=live_mount_id, backup_path=backup_path)
 
-    if "ORA-01081: cannot start already-running ORACLE" in sql_return:
-        logger.debug("There is an instance of {} all ready running on this host. Aborting clone".format(new_oracle_name))
-        raise RubrikOracleBackupMountCloneError("There is an instance of {} all ready running on this host or refreshed DB did not start cleanly. Aborting clone".format(new_oracle_name))
-    sql_return = database.sqlplus_sysdba(oracle_home, "select instance_name from v$instance;")
-    logger.info(sql_return)
-    if new_oracle_name not in sql_return:
-        logger.debug("DB Instance check failed. Instance name is not {}. Aborting clone".format(new_oracle_name))
-        raise RubrikOracleBackupMountCloneError("DB Instance check failed. Instance name is not {}. Aborting clone".format(new_oracle_name))
+    def prepare_auxiliary():
+        # Create the audit and core dump directories set for the duplicate
+        for directory in [audit_file_dest, core_dump_dest]:
+            if directory:
+                logger.debug("Creating directory {} if not present.".format(directory.strip("'")))
+                os.makedirs(directory.strip("'"), exist_ok=True)
+        sqlplus = rbs_oracle_common.RbsOracleSqlplusSession(oracle_home, new_oracle_name)
+        # A resumed clone restarts whatever the failed duplicate left of the auxiliary instance
+        startup_command = "startup force nomount" if checkpoint.resumed else "startup nomount"
+        if refresh_db and not checkpoint.resumed:
+            logger.warning("Shutting down {} database for refresh".format(new_oracle_name))
+            sqlplus.run("shutdown immediate;")
+        if no_spfile:
+            logger.warning("Starting auxiliary instance")
+            sql_return = sqlplus.run(startup_command)
+        else:
+            logger.warning("Creating minimal init file to start instance")
+            init_file = os.path.join(oracle_home, 'dbs', 'init{}.ora'.format(new_oracle_name))
+            logger.debug("Creating new temporary init file {}".format(init_file))
+            with open(init_file, 'w') as file:
+                if roll_forward:
+                    # A standby keeps the source db name and is told apart by its db_unique_name
+                    file.write('db_name={}\ndb_unique_name={}\n'.format(source_host_db[1], new_oracle_name))
+                else:
+                    file.write('db_name={}\n'.format(new_oracle_name))
+            logger.warning("Starting auxiliary instance")
+            sql_return = sqlplus.run("{} pfile='{}'".format(startup_command, init_file))
 
-    logger.warning("Beginning duplicate of {} to {} on host {}.".format(source_host_db[1], new_oracle_name, source_host_db[0]))
-    duplicate_commands = "run { "
-    for x in range(int(parallelism)):
-        channel = x + 1
-        duplicate_commands = duplicate_commands + "allocate auxiliary channel aux{} device type disk; ".format(channel)
-    duplicate_commands = duplicate_commands + "duplicate database to '{}' ".format(new_oracle_name)
-    if time_restore:
-        time_restore = time_restore.replace("T", "")
-        duplicate_commands = duplicate_commands + """until time "TO_DATE('{}','YYYY-MM-DD HH24:MI:SS')"  """.format(time_restore)
-    if not no_spfile:
-        duplicate_commands = duplicate_commands + "SPFILE parameter_value_convert ('{}','{}') ".format(source_host_db[1], new_oracle_name)
-    if control_files:
-        duplicate_commands = duplicate_commands + "set  control_files = {} ".format(control_files)
-    if db_file_name_convert:
-        duplicate_commands = duplicate_commands + "set  db_file_name_convert = {} ".format(db_file_name_convert)
-    if log_file_name_convert:
-        duplicate_commands = duplicate_commands + "set  log_file_name_convert = {} ".format(log_file_name_convert)
-    if audit_file_dest:
-        duplicate_commands = duplicate_commands + "set  audit_file_dest = {} ".format(audit_file_dest)
-    if core_dump_dest:
-        duplicate_commands = duplicate_commands + "set  core_dump_dest = {} ".format(core_dump_dest)
-    duplicate_commands = duplicate_commands + "BACKUP LOCATION '{}' ".format(mount_path)
-    if no_file_name_check:
-        duplicate_commands = duplicate_commands + "NOFILENAMECHECK; }"
-    else:
-        duplicate_commands = duplicate_commands + "; }"
+        if "ORA-01081" in sql_return.errors:
+            logger.debug("There is an instance of {} all ready running on this host. Aborting clone".format(new_oracle_name))
+            raise RubrikOracleBackupMountCloneError("There is an instance of {} all ready running on this host or refreshed DB did not start cleanly. Aborting clone".format(new_oracle_name))
+        sql_return = sqlplus.run("select instance_name from v$instance;")
+        sqlplus.close()
+        if new_oracle_name not in sql_return.output:
+            logger.debug("DB Instance check failed. Instance name is not {}. Aborting clone".format(new_oracle_name))
+            raise RubrikOracleBackupMountCloneError("DB Instance check failed. Instance name is not {}. Aborting clone".format(new_oracle_name))
 
-    logger.debug("Duplicate script: "
-                 "{}".format(duplicate_commands))
-    logger.info(database.rman(oracle_home, duplicate_commands, "auxiliary"))
-    logger.warning("Duplicate of {} database complete.".format(new_oracle_name))
+    def duplicate_database():
+        logger.warning("Beginning duplicate of {} to {} on host {}.".format(source_host_db[1], new_oracle_name, source_host_db[0]))
+        backup_path = checkpoint.get('backup_path')
+        channels = parallelism
+        if str(parallelism).lower() == 'auto':
+            channels = rbs_oracle_common.RbsOracleBackupManifest.auto_channels(backup_path, mount_path, channel_throughput, logfile)
+        duplicate_commands = "run { "
+        for x in range(int(channels)):
+            channel = x + 1
+            duplicate_commands = duplicate_commands + "allocate auxiliary channel aux{} device type disk; ".format(channel)
+        if roll_forward:
+            duplicate_commands = duplicate_commands + "duplicate database for standby dorecover "
+        else:
+            duplicate_commands = duplicate_commands + "duplicate database to '{}' ".format(new_oracle_name)
+        if time_restore:
+            duplicate_commands = duplicate_commands + """until time "TO_DATE('{}','YYYY-MM-DD HH24:MI:SS')"  """.format(time_restore.replace("T", ""))
+        if not no_spfile:
+            duplicate_commands = duplicate_commands + "SPFILE parameter_value_convert ('{}','{}') ".format(source_host_db[1], new_oracle_name)
+            if roll_forward:
+                duplicate_commands = duplicate_commands + "set db_unique_name = '{}' ".format(new_oracle_name)
+        if control_files:
+            duplicate_commands = duplicate_commands + "set  control_files = {} ".format(control_files)
+        if db_file_name_convert:
+            duplicate_commands = duplicate_commands + "set  db_file_name_convert = {} ".format(db_file_name_convert)
+        if log_file_name_convert:
+            duplicate_commands = duplicate_commands + "set  log_file_name_convert = {} ".format(log_file_name_convert)
+        if audit_file_dest:
+            duplicate_commands = duplicate_commands + "set  audit_file_dest = {} ".format(audit_file_dest)
+        if core_dump_dest:
+            duplicate_commands = duplicate_commands + "set  core_dump_dest = {} ".format(core_dump_dest)
+        duplicate_commands = duplicate_commands + "BACKUP LOCATION '{}' ".format(backup_path)
+        if no_file_name_check:
+            duplicate_commands = duplicate_commands + "NOFILENAMECHECK; }"
+        else:
+            duplicate_commands = duplicate_commands + "; }"
+
+        logger.debug("Duplicate script: "
+                     "{}".format(duplicate_commands))
+        with rbs_oracle_common.RbsOracleRmanSession(oracle_home, new_oracle_name, "auxiliary") as rman, \
+                rbs_oracle_common.RmanProgressMonitor(oracle_home, new_oracle_name, progress_interval, progress_file):
+            duplicate_result = rman.run(duplicate_commands)
+        if duplicate_result.rman_failed():
+            logger.debug("The duplicate of {} failed with {}. Aborting clone".format(new_oracle_name, ", ".join(duplicate_result.errors)))
+            raise RubrikOracleBackupMountCloneError("The duplicate of {} failed with {}. Rerun with --resume to restart it without remounting the backup files.".format(
+                new_oracle_name, ", ".join(duplicate_result.errors)))
+        checkpoint.complete('duplicate')
+        if roll_forward:
+            logger.warning("Duplicate of {} database complete. The standby clone is mounted.".format(new_oracle_name))
+        else:
+            logger.warning("Duplicate of {} database complete.".format(new_oracle_name))
+
+    def inspect_clone():
+        sqlplus = rbs_oracle_common.RbsOracleSqlplusSession(oracle_home, new_oracle_name)
+        columns = ["dbid", "database_role", "open_mode", "resetlogs_change#",
+                   "(select to_char(min(checkpoint_time), 'YYYY-MM-DD HH24:MI:SS') from v$datafile_header)"]
+        rows, sql_return = sqlplus.query(columns, "v$database")
+        if not rows and 'ORA-01034' in sql_return.errors:
+            logger.warning("The clone {} is not running, starting it mounted.".format(new_oracle_name))
+            sqlplus.run("startup mount;")
+            rows, sql_return = sqlplus.query(columns, "v$database")
+        if not rows:
+            sqlplus.close()
+            logger.warning("There is no mounted clone of {} to roll forward ({}). Running a full duplicate.".format(
+                new_oracle_name, ", ".join(sql_return.errors) or "no database"))
+            checkpoint.complete('inspect', full_duplicate=True, clone_exists='ORA-01507' in sql_return.errors)
+            return
+        dbid, database_role, open_mode, resetlogs_change, checkpoint_time = rows[0]
+        logger.info("Clone {}: DBID {}, role {}, open mode {}, resetlogs change {}, checkpoint {}.".format(
+            new_oracle_name, dbid, database_role, open_mode, resetlogs_change, checkpoint_time))
+        if database_role != 'PHYSICAL STANDBY':
+            sqlplus.close()
+            logger.warning("The clone {} is a {} database, not a standby clone. Running a full duplicate.".format(new_oracle_name, database_role.lower()))
+            checkpoint.complete('inspect', full_duplicate=True, clone_exists=True)
+            return
+        if open_mode != 'MOUNTED':
+            logger.warning("The clone {} is open {}, mounting it for the roll forward.".format(new_oracle_name, open_mode.lower()))
+            sqlplus.run("shutdown immediate;")
+            sqlplus.run("startup mount;")
+        sqlplus.close()
+        checkpoint.complete('inspect', full_duplicate=False, clone_exists=True, clone_dbid=dbid,
+                            clone_resetlogs_change=int(resetlogs_change), clone_checkpoint_time=checkpoint_time)
+
+    def roll_forward_clone():
+        if checkpoint.get('full_duplicate'):
+            return
+        backup_path = checkpoint.get('backup_path')
+        autobackup_dbid = rbs_oracle_common.RubrikRbsOracleDatabase.autobackup_key(database.get_latest_autobackup(backup_path))[2]
+        if autobackup_dbid != checkpoint.get('clone_dbid'):
+            logger.warning("The clone DBID {} does not match the backup DBID {}. Running a full duplicate.".format(checkpoint.get('clone_dbid'), autobackup_dbid))
+            checkpoint.complete('roll_forward', full_duplicate=True)
+            return
+        since_time = datetime.strptime(checkpoint.get('clone_checkpoint_time'), '%Y-%m-%d %H:%M:%S').timestamp()
+        # The mount time was converted from the cluster time zone
+        until_time = time_ms / 1000 if time_restore else None
+        manifest = rbs_oracle_common.RbsOracleBackupManifest.scan(backup_path)
+        selection, skipped = manifest.select_archivelogs(since_time, until_time, catalog_margin * 60)
+        if logfile:
+            manifest.write(os.path.splitext(logfile)[0] + '_manifest.json', {'selection': selection, 'skipped_archive_logs': skipped})
+        logger.warning("Cataloging {} archive log pieces written since the clone checkpoint {}, skipping {} older archive log pieces.".format(
+            len(selection['backuppiece']) + len(selection['archivelog']), checkpoint.get('clone_checkpoint_time'), skipped))
+        with rbs_oracle_common.RbsOracleRmanSession(oracle_home, new_oracle_name) as rman:
+            for catalog_command in manifest.catalog_commands(selection):
+                rman.run(catalog_command)
+            with rbs_oracle_common.RbsOracleSqlplusSession(oracle_home, new_oracle_name) as sqlplus:
+                rows, sql_return = sqlplus.query(["nvl(max(resetlogs_change#), 0)"], "v$backup_redolog")
+            if rows and int(rows[0][0]) > checkpoint.get('clone_resetlogs_change'):
+                logger.warning("The source database has a new incarnation (resetlogs change {}, the clone is at {}). Running a full duplicate.".format(
+                    rows[0][0], checkpoint.get('clone_resetlogs_change')))
+                checkpoint.complete('roll_forward', full_duplicate=True)
+                return
+            logger.warning("Rolling the clone {} forward to {}.".format(new_oracle_name, time_restore or "the most recent recovery point"))
+            recover_command = "recover database"
+            if time_restore:
+                recover_command = recover_command + " until time \"TO_DATE('{}','YYYY-MM-DD HH24:MI:SS')\"".format(time_restore.replace("T", " "))
+            recover_result = rman.run(recover_command + ";")
+        # Running out of logs (RMAN-06054) ends a roll forward to the most recent point, but with an until time it
+        # means the clone stopped short of the requested time
+        if recover_result.rman_failed() and (time_restore or 'RMAN-06054' not in recover_result.errors):
+            logger.debug("The roll forward of {} failed with {}. Aborting clone".format(new_oracle_name, ", ".join(recover_result.errors)))
+            raise RubrikOracleBackupMountCloneError("The roll forward of {} failed with {}. Rerun with --resume to retry the recovery.".format(
+                new_oracle_name, ", ".join(recover_result.errors)))
+        if time_restore:
+            with rbs_oracle_common.RbsOracleSqlplusSession(oracle_home, new_oracle_name) as sqlplus:
+                rows, sql_return = sqlplus.query(["to_char(min(checkpoint_time), 'YYYY-MM-DD HH24:MI:SS')"], "v$datafile_header")
+            target_time = datetime.strptime(time_restore.replace("T", " ")[:19], '%Y-%m-%d %H:%M:%S')
+            if not rows or not rows[0][0] or datetime.strptime(rows[0][0], '%Y-%m-%d %H:%M:%S') < target_time - timedelta(minutes=catalog_margin):
+                checkpoint_time = rows[0][0] if rows else 'unknown'
+                logger.debug("The roll forward of {} stopped at {}, before {}. Aborting clone".format(new_oracle_name, checkpoint_time, time_restore))
+                raise RubrikOracleBackupMountCloneError("The roll forward of {} stopped at {}, before the requested time {}. Rerun with --resume to retry the recovery.".format(
+                    new_oracle_name, checkpoint_time, time_restore))
+        applied_logs = len(recover_result.progress.applied_logs)
+        logger.warning("The roll forward applied {} archived logs in {:0.0f} seconds.".format(applied_logs, recover_result.seconds))
+        checkpoint.complete('roll_forward', full_duplicate=False)
 
-    mount = rbs_oracle_common.RubrikRbsOracleMount(rubrik, source_host_db[1], source_host_db[0], host_target)
-    logger.warning("Unmounting backups.")
-    delete_request = mount.live_mount_delete(live_mount_id)
-    delete_request = mount.async_requests_wait(delete_request['id'], 12)
-    logger.info("Async request completed with status: {}".format(delete_request['status']))
-    logger.debug(delete_request)
-    if delete_request['status'] != "SUCCEEDED":
-        logger.warning("Unmount of backup files failed with status: {}".format(delete_request['status']))
+    os.environ["ORACLE_HOME"] = oracle_home
+    os.environ["ORACLE_SID"] = new_oracle_name
+    logger.debug("Setting env variable ORACLE_HOME={}, ORACLE_SID={}.".format(oracle_home, new_oracle_name))
+    # The backup files mount runs on the Rubrik cluster while the auxiliary instance is prepared on this host
+    steps = rbs_oracle_common.RbsOracleStepGraph()
+    if not checkpoint.done('mount'):
+        steps.add('mount', mount_backup_files)
+    if checkpoint.done('duplicate') or (checkpoint.done('roll_forward') and not checkpoint.get('full_duplicate')):
+        logger.warning("The refresh of {} completed in the run being resumed.".format(new_oracle_name))
+    elif roll_forward and not checkpoint.get('full_duplicate'):
+        # The clone is inspected on this host while the backup files are mounted
+        if not checkpoint.done('inspect'):
+            steps.add('inspect', inspect_clone)
+        steps.add('roll_forward', roll_forward_clone, depends_on=['mount', 'inspect'])
     else:
-        logger.info("Live mount of backup data files with id: {} has been unmounted.".format(live_mount_id))
-        logger.warning("Backups unmounted")
+        steps.add('prepare', prepare_auxiliary)
+        steps.add('duplicate', duplicate_database, depends_on=['mount', 'prepare'])
+    # The steps leave the session open for the steps still running, it is deleted here once they have all stopped
+    try:
+        steps.run()
+    except (Exception, SystemExit):
+        rubrik.delete_session()
+        raise
+    if roll_forward and checkpoint.get('full_duplicate') and not checkpoint.done('duplicate'):
+        if checkpoint.get('clone_exists') and not (refresh_db and no_file_name_check):
+            logger.debug("Replacing the clone {} with a full duplicate requires --refresh_db and --no_file_name_check. Aborting clone".format(new_oracle_name))
+            raise RubrikOracleBackupMountCloneError("The clone {} can not be rolled forward and replacing it with a full duplicate requires --refresh_db and --no_file_name_check. Rerun with them and --resume.".format(new_oracle_name))
+        steps = rbs_oracle_common.RbsOracleStepGraph()
+        steps.add('prepare', prepare_auxiliary)
+        steps.add('duplicate', duplicate_database, depends_on=['prepare'])
+        try:
+            steps.run()
+        except (Exception, SystemExit):
+            rubrik.delete_session()
+            raise
+    live_mount_id = checkpoint.get('live_mount_id')
+
+    if not checkpoint.done('unmount'):
+        mount = rbs_oracle_common.RubrikRbsOracleMount(rubrik, source_host_db[1], source_host_db[0], host_target)
+        logger.warning("Unmounting backups.")
+        delete_request = mount.live_mount_delete(live_mount_id)
+        delete_request = mount.async_requests_wait(delete_request['id'], 12)
+        logger.info("Async request completed with status: {}".format(delete_request['status']))
+        logger.debug(delete_request)
+        if delete_request['status'] != "SUCCEEDED":
+            logger.warning("Unmount of backup files failed with status: {}. Rerun with --resume to retry the unmount.".format(delete_request['status']))
+        else:
+            logger.info("Live mount of backup data files with id: {} has been unmounted.".format(live_mount_id))
+            logger.warning("Backups unmounted")
+            checkpoint.complete('unmount')
 
+    if checkpoint.done('unmount'):
+        checkpoint.finish()
     logger.warning("Database clone complete")
     rubrik.delete_session()
     return
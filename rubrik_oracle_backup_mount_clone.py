@@ -18,8 +18,16 @@ from subprocess import PIPE, Popen
 @click.option('--files_directory', '-f', type=str, required=True, help='Location for Oracle files written to the host, control files, redo, etc.')
 @click.option('--oracle_home', '-o', type=str, help='ORACLE_HOME path for this database clone')
 @click.option('--time_restore', '-t', type=str, help='The point in time for the database clone in  iso 8601 format (2019-04-30T18:23:21)')
+@click.option('--selective_catalog', is_flag=True, help='Catalog only the datafile pieces and the archive logs needed to reach the restore time instead of the whole mount')
+@click.option('--catalog_margin', type=int, default=60, help='Minutes of archive logs to catalog on each side of the recovery window with --selective_catalog (default 60)')
+@click.option('--recovery_parallelism', type=int, default=0, help='Degree of parallel media recovery (recovery_parallelism and RECOVER ... PARALLEL). Default is the Oracle default')
+@click.option('--recovery_channels', type=int, default=0, help='Number of disk channels to allocate for the RMAN recover. Default is the configured channels')
+@click.option('--delete_archivelog', is_flag=True, help='Delete the archived logs restored from backup as soon as they have been applied')
+@click.option('--resume', is_flag=True, help='Resume a failed clone from the step that failed, reusing the mounted backup files')
 @click.option('--debug_level', '-d', type=str, default='WARNING', help='Logging level: DEBUG, INFO, WARNING or CRITICAL.')
-def cli(source_host_db, mount_path, time_restore, host_target, oracle_home, new_oracle_name, files_directory, debug_level):
+def cli(source_host_db, mount_path, time_restore, selective_catalog, catalog_margin, recovery_parallelism,
+        recovery_channels, delete_archivelog, host_target, oracle_home, new_oracle_name,
+        files_directory, resume, debug_level):
     """
     This will mount the requested Rubrik Oracle backup set on the provided path.
 
@@ -29,6 +37,22 @@ def cli(source_host_db, mount_path, time_restore, host_target, oracle_home, new_
     the directory for the temp, redo, etc. and the new database name. If the Oracle Home is not specified the ORACLE
     HOME path from the source database will be used. This is for a single instance database only, at present it will
     NOT work on RAC.
+
+\b
+    With --selective_catalog the mounted backup pieces are listed and only the datafile pieces and the archive logs
+    written between the oldest datafile piece and the restore time (plus the catalog margin on each side) are
+    cataloged, in batches. The list of pieces is written next to the clone log.
+
+\b
+    Media recovery can be tuned with the recovery parallelism, the number of disk channels allocated for the recover
+    and the deletion of the applied archived logs. The number of archived logs applied per second is reported at the
+    end of the recovery.
+
+\b
+    The clone runs as a series of steps (mount, spfile, controlfile, relocate, catalog, recover, open, rename) and its
+    state is kept in ~/.rubrik_oracle_tools/backup_mount_clone_<new_oracle_name>.json. If a clone fails, rerun it with
+    --resume to skip the completed steps and reuse the mounted backup files. Several clones can share the mount path on
+    one host, their backup files are mounted one at a time.
     """
     numeric_level = getattr(logging, debug_level.upper(), None)
     if not isinstance(numeric_level, int):
@@ -48,7 +72,7 @@ def cli(source_host_db, mount_path, time_restore, host_target, oracle_home, new_
     oradata_files_path = os.path.join(oracle_files_path, "oradata")
     os.makedirs(oradata_files_path, exist_ok=True)
     logfile = os.path.join(oracle_files_path, "{}_Clone.log".format(new_oracle_name))
-    fh = logging.FileHandler(logfile, mode='w')
+    fh = logging.FileHandler(logfile, mode='a' if resume else 'w')
     fh.setLevel(logging.DEBUG)
     file_formatter = logging.Formatter('%(asctime)s:%(name)s:%(levelname)s: %(message)s')
     fh.setFormatter(file_formatter)
@@ -71,8 +95,24 @@ def cli(source_host_db, mount_path, time_restore, host_target, oracle_home, new_
             host_id = database.get_rac_id(rubrik.cluster_id, host_target)
     else:
         host_id = database.get_host_id(rubrik.cluster_id, host_target)
+    checkpoint = rbs_oracle_common.RbsOracleCloneCheckpoint('backup_mount_clone', new_oracle_name, resume)
+    if resume and not checkpoint.resumed:
+        logger.debug("There is no saved state in {} for a clone of {} to resume. Aborting clone".format(checkpoint.path, new_oracle_name))
+        raise RubrikOracleBackupMountCloneError("There is no saved state in {} for a clone of {} to resume.".format(checkpoint.path, new_oracle_name))
+    if checkpoint.resumed:
+        if checkpoint.get('source_host_db') != ":".join(source_host_db):
+            logger.debug("The clone being resumed was from {}, not {}. Aborting clone".format(checkpoint.get('source_host_db'), ":".join(source_host_db)))
+            raise RubrikOracleBackupMountCloneError("The clone being resumed was from {}, not {}.".format(checkpoint.get('source_host_db'), ":".join(source_host_db)))
+        logger.warning("Resuming the clone of {} to {}. Completed steps: {}.".format(source_host_db[1], new_oracle_name, ", ".join(checkpoint.get('completed_steps'))))
+    elif checkpoint.previous.get('live_mount_id'):
+        logger.warning("A previous clone to {} did not complete and left live mount id {} mounted at {}. Use --resume to reuse it.".format(
+            new_oracle_name, checkpoint.previous['live_mount_id'], checkpoint.previous.get('backup_path')))
     # Use the provided time or if no time has been provided use the the most recent recovery point
-    if time_restore:
+    if checkpoint.resumed:
+        time_restore = checkpoint.get('time_restore')
+        time_ms = checkpoint.get('time_ms')
+        logger.warning("Using the restore time of the clone being resumed: {}.".format(time_restore or "most recent recovery point"))
+    elif time_restore:
         time_ms = database.epoch_time(time_restore, rubrik.timezone)
         logger.warning("Using {} for mount.". format(time_restore))
     else:
@@ -84,158 +124,233 @@ def cli(source_host_db, mount_path, time_restore, host_target, oracle_home, new_
     if not os.path.exists(oracle_home):
         logger.debug("The ORACLE_HOME: {} does not exist on the target host: {}".format(oracle_home, host_target))
         raise RubrikOracleBackupMountCloneError("The ORACLE_HOME: {} does not exist on the target host: {}".format(oracle_home, host_target))
-    # Get directories in path to allow us to find the new directory after the mount
-    live_mount_directories = os.listdir(mount_path)
-    logger.warning("Starting the mount of the requested {} backup pieces on {}.".format(source_host_db[1], host_target))
-    live_mount_info = database.live_mount(host_id, time_ms, files_only=True, mount_path=mount_path)
-    live_mount_info = database.async_requests_wait(live_mount_info['id'], 20)
-    logger.info("Async request completed with status: {}".format(live_mount_info['status']))
-    if live_mount_info['status'] != "SUCCEEDED":
-        logger.debug("Mount of backup files did not complete successfully. Mount ended with status {}".format(live_mount_info['status']))
-        raise RubrikOracleBackupMountCloneError("Mount of backup files did not complete successfully. Mount ended with status {}".format(live_mount_info['status']))
-    logger.warning("Live mount of the backup files completed.")
-    # Now determine the new live mount directory
-    new_live_mount_directories = os.listdir(mount_path)
-    live_mount_directory = list(set(new_live_mount_directories) - set(live_mount_directories))
-    if len(live_mount_directory) == 1:
-        backup_path = os.path.join(mount_path, live_mount_directory[0])
+
+    backup_path = checkpoint.get('backup_path')
+    auto_backup_file = checkpoint.get('auto_backup_file')
+    if checkpoint.done('mount') and not os.path.isdir(backup_path):
+        if checkpoint.done('catalog'):
+            logger.debug("The backup files are no longer mounted at {} and the clone uses them as its datafiles. Aborting clone".format(backup_path))
+            raise RubrikOracleBackupMountCloneError("The backup files are no longer mounted at {} and the clone uses them as its datafiles. Start a new clone without --resume".format(backup_path))
+        logger.warning("The backup files are no longer mounted at {}, mounting them again.".format(backup_path))
+        checkpoint.redo('mount')
+    if checkpoint.done('mount'):
+        logger.warning("Reusing the live mount of the backup files at {}.".format(backup_path))
     else:
-        logger.debug("Multiple directories were created in {} during this operation. Live mount directory cannot be determined".format(mount_path))
-        raise RubrikOracleBackupMountCloneError("Multiple directories were created in {} during this operation. Live mount directory cannot be determined".format(mount_path))
-    logger.info("Using the live mount path: {}".format(backup_path))
-    auto_backup_file = database.get_latest_autobackup(backup_path)
+        logger.warning("Starting the mount of the requested {} backup pieces on {}.".format(source_host_db[1], host_target))
+        with rbs_oracle_common.RbsOracleMountPathLock(mount_path):
+            live_mount_info = database.live_mount(host_id, time_ms, files_only=True, mount_path=mount_path)
+            live_mount_info = database.async_requests_wait(live_mount_info['id'], 20)
+            logger.info("Async request completed with status: {}".format(live_mount_info['status']))
+            if live_mount_info['status'] != "SUCCEEDED":
+                logger.debug("Mount of backup files did not complete successfully. Mount ended with status {}".format(live_mount_info['status']))
+                raise RubrikOracleBackupMountCloneError("Mount of backup files did not complete successfully. Mount ended with status {}".format(live_mount_info['status']))
+            live_mount_id, backup_path = database.get_files_only_mount(live_mount_info, mount_path)
+        logger.warning("Live mount of the backup files completed.")
+        logger.info("Using the live mount path: {}".format(backup_path))
+        auto_backup_file = database.get_latest_autobackup(backup_path)
+        checkpoint.complete('mount', source_host_db=":".join(source_host_db), time_restore=time_restore, time_ms=time_ms,
+                            live_mount_id=live_mount_id, backup_path=backup_path,
+                            auto_backup_file=auto_backup_file)
 
-    # Create the audit directory
     audit_dir = os.path.join(oracle_files_path, 'adump')
-    logger.debug("Creating audit dump directory {} if not present.".format(oracle_files_path))
-    os.makedirs(audit_dir, exist_ok=True)
-    # Create the FRA directory
     fast_recovery_area = os.path.join(oracle_files_path, 'fast_recovery_area')
-    logger.debug("Creating fast recovery area directory {} if not present.".format(fast_recovery_area))
-    os.makedirs(fast_recovery_area, exist_ok=True)
-    # Create the temporary pfile to start Oracle
-    init_file = os.path.join(oracle_home, 'dbs', 'init{}.ora'.format(new_oracle_name))
-    logger.debug("Creating new temporary init file {}".format(init_file))
-    with open(init_file, 'w') as file:
-        file.write('db_name={}\n'.format(source_host_db[1]))
-        file.write('db_unique_name={}\n'.format(new_oracle_name))
-        file.write('shared_pool_size=503736000')
     logger.debug("Setting env variable ORACLE_HOME={}, ORACLE_SID={}.".format(oracle_home, new_oracle_name))
     os.environ["ORACLE_HOME"] = oracle_home
     os.environ["ORACLE_SID"] = new_oracle_name
-    logger.warning("Restoring and configuring server parameter file.")
-    sql_return = database.sqlplus_sysdba(oracle_home, "startup nomount pfile='{}'".format(init_file))
-    logger.info(sql_return)
-    if "ORA-01081: cannot start already-running ORACLE" in sql_return:
-        logger.debug("There is an instance of {} all ready running on this host. Aborting clone".format(new_oracle_name))
-        raise RubrikOracleBackupMountCloneError("There is an instance of {} all ready running on this host. Aborting clone".format(new_oracle_name))
-    sql_return = database.sqlplus_sysdba(oracle_home, "select instance_name from v$instance;")
-    logger.info(sql_return)
-    if new_oracle_name not in sql_return:
-        logger.debug("DB Instance check failed. Instance name is not {}. Aborting clone".format(new_oracle_name))
-        raise RubrikOracleBackupMountCloneError("DB Instance check failed. Instance name is not {}. Aborting clone".format(new_oracle_name))
-    logger.info(database.rman(oracle_home, "restore spfile from '{}';".format(auto_backup_file)))
-    logger.info("Setting parameters in spfile before starting instance.")
-    spfile = os.path.join(oracle_home, 'dbs', 'spfile{}.ora'.format(new_oracle_name))
-    logger.info(database.sqlplus_sysdba(oracle_home, "alter system set spfile='{}';".format(spfile)))
-    logger.info(database.sqlplus_sysdba(oracle_home, "alter system set audit_file_dest='{}' scope=spfile;".format(audit_dir)))
-    logger.info(database.sqlplus_sysdba(oracle_home, "alter system set db_unique_name='{}' scope=spfile;".format(new_oracle_name)))
-    logger.info(database.sqlplus_sysdba(oracle_home, "alter system set control_files = '{}/control01.ctl' scope=spfile;".format(oradata_files_path)))
-    logger.info(database.sqlplus_sysdba(oracle_home, "alter system set db_recovery_file_dest = '{}' scope=spfile;".format(fast_recovery_area)))
-    logger.info(database.sqlplus_sysdba(oracle_home, "alter system set diagnostic_dest = '{}' scope=spfile;".format(oracle_files_path)))
-    logger.info(database.sqlplus_sysdba(oracle_home, "alter system set db_recovery_file_dest_size = '1G' scope=spfile;"))
-    logger.info(database.sqlplus_sysdba(oracle_home, 'startup force nomount;'))
-    logger.info(database.rman(oracle_home, "restore controlfile to '{0}/control01.ctl' from '{1}';".format(oradata_files_path, auto_backup_file)))
-    logger.info(database.sqlplus_sysdba(oracle_home, 'alter database mount;'))
-
-    logger.warning("Setting redo log location.")
-    move_redo_sql = """
-        SET SERVEROUTPUT ON
-        DECLARE
-            l_oracle_files_path VARCHAR2(350):= '{}';
-            l_new_member VARCHAR2(360);
-            l_sql_stmt VARCHAR2(200);
-            CURSOR c_redo_files IS
-            select member,
-            substr(member,(instr(member,'/',-1,1) +1),length(member)) new_member
-            from v$logfile;
-            c_redo_files_var c_redo_files%ROWTYPE;
-        BEGIN
-            FOR c_redo_files_var in c_redo_files LOOP
-               l_new_member := (l_oracle_files_path || '/' || c_redo_files_var.new_member);
-               l_sql_stmt := 'alter database rename file ''' || c_redo_files_var.member || ''' to ''' || l_new_member || ''';' ;
-               DBMS_OUTPUT.PUT_LINE(l_sql_stmt);
-               EXECUTE IMMEDIATE 'alter database rename file ''' || c_redo_files_var.member || ''' to ''' || l_new_member || '''';
-           END LOOP;
-        END;
-        / """.format(oradata_files_path)
-    sql_return = database.sqlplus_sysdba(oracle_home, move_redo_sql)
-    logger.info(sql_return)
-    if "PL/SQL procedure successfully completed" not in sql_return:
-        logger.debug("Renaming redo logs failed. Aborting clone")
-        raise RubrikOracleBackupMountCloneError("Renaming redo logs failed. Aborting clone")
-    logger.warning("Setting temporary tablespace location.")
-    move_temp_sql = """
-        SET SERVEROUTPUT ON
-        DECLARE
-            l_oracle_files_path VARCHAR2(350):= '{}';
-            l_new_file VARCHAR2(360);
-            l_sql_stmt VARCHAR2(200);
-            CURSOR c_temp_files IS
-            select name,
-            substr(name,(instr(name,'/',-1,1) +1),length(name)) new_name
-            from v$tempfile;
-            c_temp_files_var c_temp_files%ROWTYPE;
-        BEGIN
-            FOR c_temp_files_var in c_temp_files LOOP
-               l_new_file := (l_oracle_files_path || '/' || c_temp_files_var.new_name);
-               l_sql_stmt := 'alter database rename file ''' || c_temp_files_var.name || ''' to ''' || l_new_file || ''';' ;
-               DBMS_OUTPUT.PUT_LINE(l_sql_stmt);
-               EXECUTE IMMEDIATE 'alter database rename file ''' || c_temp_files_var.name  || ''' to ''' || l_new_file || '''';
-           END LOOP;
-        END;
-        / """.format(oradata_files_path)
-    sql_return = database.sqlplus_sysdba(oracle_home, move_temp_sql)
-    logger.info(sql_return)
-    if "PL/SQL procedure successfully completed" not in sql_return:
-        logger.debug("Renaming tempfiles failed. Aborting clone")
-        raise RubrikOracleBackupMountCloneError("Renaming tempfiles failed. Aborting clone")
-
-    logger.warning("Cataloging the backup files.")
-    logger.info(database.rman(oracle_home, 'crosscheck copy; crosscheck backup; delete noprompt expired copy; delete noprompt expired backup;'))
-    logger.info(database.rman(oracle_home, "catalog start with '{}' noprompt;".format(backup_path)))
-    logger.warning("Switching to the Rubrik mounted data files.")
-    logger.info(database.rman(oracle_home, 'switch database to copy;'))
-
-    logger.warning("Recovering the Database.")
-    # Fix the time format for Oracle if set and recover the database
-    if time_restore:
-        time_restore = time_restore.replace("T", "")
-        logger.info(database.rman(oracle_home, """recover database until time "TO_DATE('{}','YYYY-MM-DD HH24:MI:SS')"; """.format(time_restore)))
-    else:
-        logger.info(database.rman(oracle_home, "recover database;"))
-    logger.warning("Switching to no archive log mode.")
-    logger.info(database.sqlplus_sysdba(oracle_home, 'alter database noarchivelog;'))
-    logger.warning("Switching to new database name.")
-    logger.info(database.sqlplus_sysdba(oracle_home, 'alter database open resetlogs;'))
-    logger.info(database.sqlplus_sysdba(oracle_home, 'shutdown immediate;'))
-    logger.info(database.sqlplus_sysdba(oracle_home, 'startup mount'))
-    nid_log_file = oracle_files_path + '/nid_' + new_oracle_name + '.log'
-    logger.info("Temp NID Logfile: {}".format(nid_log_file))
-    session = Popen([os.path.join(oracle_home, 'bin', 'nid'), 'target=/', 'dbname={}'.format(new_oracle_name), 'logfile={}'.format(nid_log_file), 'append=YES'], stdin=PIPE, stdout=PIPE, stderr=PIPE)
-    stdout, stderr = session.communicate()
-    logger.info("NID standard out: {}, standard error: {}.".format(stdout.decode(), stderr.decode()))
-    logger.info("NID output:")
-    logger.info(open(nid_log_file).read())
-    if "Succesfully changed database name and ID" not in open(nid_log_file).read():
-        logger.debug("Renaming the database with the NID utility failed. Aborting clone")
-        raise RubrikOracleBackupMountCloneError("Renaming the database with the NID utility failed. Aborting clone")
-    os.remove(nid_log_file)
-    logger.info(database.sqlplus_sysdba(oracle_home, 'startup force nomount;'))
-    logger.info(database.sqlplus_sysdba(oracle_home, "alter system set db_name='{}' scope=spfile;".format(new_oracle_name)))
-    logger.info(database.sqlplus_sysdba(oracle_home, 'shutdown immediate;'))
-    logger.info(database.sqlplus_sysdba(oracle_home, 'startup mount'))
-    logger.info(database.sqlplus_sysdba(oracle_home, 'alter database open resetlogs;'))
+    sqlplus = rbs_oracle_common.RbsOracleSqlplusSession(oracle_home, new_oracle_name)
+    rman = rbs_oracle_common.RbsOracleRmanSession(oracle_home, new_oracle_name)
+    # Bring a resumed clone back to the state the failed step started from
+    if checkpoint.done('controlfile') and not checkpoint.done('rename'):
+        logger.warning("Mounting {} to resume the clone.".format(new_oracle_name))
+        sqlplus.run('startup force mount;')
+    elif checkpoint.done('spfile') and not checkpoint.done('controlfile'):
+        logger.warning("Starting {} to resume the clone.".format(new_oracle_name))
+        sqlplus.run('startup force nomount;')
+
+    if not checkpoint.done('spfile'):
+        # Create the audit directory
+        logger.debug("Creating audit dump directory {} if not present.".format(oracle_files_path))
+        os.makedirs(audit_dir, exist_ok=True)
+        # Create the FRA directory
+        logger.debug("Creating fast recovery area directory {} if not present.".format(fast_recovery_area))
+        os.makedirs(fast_recovery_area, exist_ok=True)
+        # Create the temporary pfile to start Oracle
+        init_file = os.path.join(oracle_home, 'dbs', 'init{}.ora'.format(new_oracle_name))
+        logger.debug("Creating new temporary init file {}".format(init_file))
+        with open(init_file, 'w') as file:
+            file.write('db_name={}\n'.format(source_host_db[1]))
+            file.write('db_unique_name={}\n'.format(new_oracle_name))
+            file.write('shared_pool_size=503736000')
+        logger.warning("Restoring and configuring server parameter file.")
+        # A resumed clone restarts whatever the failed step left of the instance
+        startup_command = "startup force nomount" if checkpoint.resumed else "startup nomount"
+        sql_return = sqlplus.run("{} pfile='{}'".format(startup_command, init_file))
+        if "ORA-01081" in sql_return.errors:
+            logger.debug("There is an instance of {} all ready running on this host. Aborting clone".format(new_oracle_name))
+            raise RubrikOracleBackupMountCloneError("There is an instance of {} all ready running on this host. Aborting clone".format(new_oracle_name))
+        sql_return = sqlplus.run("select instance_name from v$instance;")
+        if new_oracle_name not in sql_return.output:
+            logger.debug("DB Instance check failed. Instance name is not {}. Aborting clone".format(new_oracle_name))
+            raise RubrikOracleBackupMountCloneError("DB Instance check failed. Instance name is not {}. Aborting clone".format(new_oracle_name))
+        rman.run("restore spfile from '{}';".format(auto_backup_file))
+        logger.info("Setting parameters in spfile before starting instance.")
+        spfile = os.path.join(oracle_home, 'dbs', 'spfile{}.ora'.format(new_oracle_name))
+        sqlplus.run("alter system set spfile='{}';".format(spfile))
+        sqlplus.run("alter system set audit_file_dest='{}' scope=spfile;".format(audit_dir))
+        sqlplus.run("alter system set db_unique_name='{}' scope=spfile;".format(new_oracle_name))
+        sqlplus.run("alter system set control_files = '{}/control01.ctl' scope=spfile;".format(oradata_files_path))
+        sqlplus.run("alter system set db_recovery_file_dest = '{}' scope=spfile;".format(fast_recovery_area))
+        sqlplus.run("alter system set diagnostic_dest = '{}' scope=spfile;".format(oracle_files_path))
+        sqlplus.run("alter system set db_recovery_file_dest_size = '1G' scope=spfile;")
+        if recovery_parallelism:
+            sqlplus.run("alter system set recovery_parallelism = {} scope=spfile;".format(recovery_parallelism))
+        sqlplus.run('startup force nomount;')
+        checkpoint.complete('spfile')
+
+    if not checkpoint.done('controlfile'):
+        # The instance was restarted under the RMAN session
+        rman.restart()
+        rman.run("restore controlfile to '{0}/control01.ctl' from '{1}';".format(oradata_files_path, auto_backup_file))
+        sqlplus.run('alter database mount;')
+        checkpoint.complete('controlfile')
+    # Reconnect RMAN so it sees the mounted control file
+    rman.restart()
+
+    if not checkpoint.done('relocate'):
+        logger.warning("Setting redo log location.")
+        move_redo_sql = """
+            SET SERVEROUTPUT ON
+            DECLARE
+                l_oracle_files_path VARCHAR2(350):= '{}';
+                l_new_member VARCHAR2(360);
+                l_sql_stmt VARCHAR2(200);
+                CURSOR c_redo_files IS
+                select member,
+                substr(member,(instr(member,'/',-1,1) +1),length(member)) new_member
+                from v$logfile;
+                c_redo_files_var c_redo_files%ROWTYPE;
+            BEGIN
+                FOR c_redo_files_var in c_redo_files LOOP
+                   l_new_member := (l_oracle_files_path || '/' || c_redo_files_var.new_member);
+                   l_sql_stmt := 'alter database rename file ''' || c_redo_files_var.member || ''' to ''' || l_new_member || ''';' ;
+                   DBMS_OUTPUT.PUT_LINE(l_sql_stmt);
+                   EXECUTE IMMEDIATE 'alter database rename file ''' || c_redo_files_var.member || ''' to ''' || l_new_member || '''';
+               END LOOP;
+            END;
+            / """.format(oradata_files_path)
+        sql_return = sqlplus.run(move_redo_sql)
+        if "PL/SQL procedure successfully completed" not in sql_return.output:
+            logger.debug("Renaming redo logs failed. Aborting clone")
+            raise RubrikOracleBackupMountCloneError("Renaming redo logs failed. Aborting clone")
+        logger.warning("Setting temporary tablespace location.")
+        move_temp_sql = """
+            SET SERVEROUTPUT ON
+            DECLARE
+                l_oracle_files_path VARCHAR2(350):= '{}';
+                l_new_file VARCHAR2(360);
+                l_sql_stmt VARCHAR2(200);
+                CURSOR c_temp_files IS
+                select name,
+                substr(name,(instr(name,'/',-1,1) +1),length(name)) new_name
+                from v$tempfile;
+                c_temp_files_var c_temp_files%ROWTYPE;
+            BEGIN
+                FOR c_temp_files_var in c_temp_files LOOP
+                   l_new_file := (l_oracle_files_path || '/' || c_temp_files_var.new_name);
+                   l_sql_stmt := 'alter database rename file ''' || c_temp_files_var.name || ''' to ''' || l_new_file || ''';' ;
+                   DBMS_OUTPUT.PUT_LINE(l_sql_stmt);
+                   EXECUTE IMMEDIATE 'alter database rename file ''' || c_temp_files_var.name  || ''' to ''' || l_new_file || '''';
+               END LOOP;
+            END;
+            / """.format(oradata_files_path)
+        sql_return = sqlplus.run(move_temp_sql)
+        if "PL/SQL procedure successfully completed" not in sql_return.output:
+            logger.debug("Renaming tempfiles failed. Aborting clone")
+            raise RubrikOracleBackupMountCloneError("Renaming tempfiles failed. Aborting clone")
+        checkpoint.complete('relocate')
+
+    if not checkpoint.done('catalog'):
+        logger.warning("Cataloging the backup files.")
+        rman.run('crosscheck copy; crosscheck backup; delete noprompt expired copy; delete noprompt expired backup;')
+        if selective_catalog:
+            manifest = rbs_oracle_common.RbsOracleBackupManifest.scan(backup_path)
+            # The mount time was converted from the cluster time zone
+            until_time = time_ms / 1000 if time_restore else None
+            selection, skipped = manifest.select_for_recovery(until_time, catalog_margin * 60)
+            manifest.write(os.path.splitext(logfile)[0] + '_manifest.json', {'selection': selection, 'skipped_archive_logs': skipped})
+            if selection['datafilecopy'] or selection['backuppiece']:
+                logger.warning("Cataloging {} datafile copies, {} backup pieces and {} archive logs, skipping {} archive logs outside the recovery window.".format(
+                    len(selection['datafilecopy']), len(selection['backuppiece']), len(selection['archivelog']), skipped))
+                for catalog_command in manifest.catalog_commands(selection):
+                    rman.run(catalog_command)
+            else:
+                logger.warning("No datafile pieces were found in the manifest, cataloging the whole mount.")
+                rman.run("catalog start with '{}' noprompt;".format(backup_path))
+        else:
+            rman.run("catalog start with '{}' noprompt;".format(backup_path))
+        logger.warning("Switching to the Rubrik mounted data files.")
+        rman.run('switch database to copy;')
+        checkpoint.complete('catalog')
+
+    if not checkpoint.done('recover'):
+        logger.warning("Recovering the Database.")
+        # Fix the time format for Oracle if set and recover the database
+        recover_command = "recover database"
+        if time_restore:
+            time_restore = time_restore.replace("T", " ")
+            recover_command = recover_command + " until time \"TO_DATE('{}','YYYY-MM-DD HH24:MI:SS')\"".format(time_restore)
+        if recovery_parallelism:
+            recover_command = recover_command + " parallel {}".format(recovery_parallelism)
+        if delete_archivelog:
+            recover_command = recover_command + " delete archivelog"
+        recover_command = recover_command + ";"
+        if recovery_channels:
+            channels = "".join("allocate channel rcv{} device type disk; ".format(channel + 1) for channel in range(recovery_channels))
+            recover_command = "run { " + channels + recover_command + " }"
+        recover_result = rman.run(recover_command)
+        # Running out of logs (RMAN-06054) ends a recovery to the most recent point, but with an until time it means
+        # the database would open before the requested time
+        if recover_result.rman_failed() and (time_restore or 'RMAN-06054' not in recover_result.errors):
+            logger.debug("Recovery of {} failed with {}. Aborting clone".format(new_oracle_name, ", ".join(recover_result.errors)))
+            raise RubrikOracleBackupMountCloneError("Recovery of {} failed with {}. Rerun with --resume to retry the recovery.".format(
+                new_oracle_name, ", ".join(recover_result.errors)))
+        applied_logs = len(recover_result.progress.applied_logs)
+        logger.warning("Media recovery applied {} archived logs in {:0.0f} seconds ({:0.2f} logs per second).".format(
+            applied_logs, recover_result.seconds, applied_logs / recover_result.seconds if recover_result.seconds else 0))
+        checkpoint.complete('recover')
+    rman.close()
+
+    if not checkpoint.done('open'):
+        logger.warning("Switching to no archive log mode.")
+        sqlplus.run('alter database noarchivelog;')
+        sqlplus.run('alter database open resetlogs;')
+        checkpoint.complete('open')
+
+    if not checkpoint.done('rename'):
+        logger.warning("Switching to new database name.")
+        sqlplus.run('shutdown immediate;')
+        sqlplus.run('startup mount')
+        # NID needs the only connection to the mounted database
+        sqlplus.restart()
+        nid_log_file = oracle_files_path + '/nid_' + new_oracle_name + '.log'
+        logger.info("Temp NID Logfile: {}".format(nid_log_file))
+        session = Popen([os.path.join(oracle_home, 'bin', 'nid'), 'target=/', 'dbname={}'.format(new_oracle_name), 'logfile={}'.format(nid_log_file), 'append=YES'], stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        stdout, stderr = session.communicate()
+        logger.info("NID standard out: {}, standard error: {}.".format(stdout.decode(), stderr.decode()))
+        logger.info("NID output:")
+        logger.info(open(nid_log_file).read())
+        if "Succesfully changed database name and ID" not in open(nid_log_file).read():
+            logger.debug("Renaming the database with the NID utility failed. Aborting clone")
+            raise RubrikOracleBackupMountCloneError("Renaming the database with the NID utility failed. Aborting clone")
+        os.remove(nid_log_file)
+        sqlplus.run('startup force nomount;')
+        sqlplus.run("alter system set db_name='{}' scope=spfile;".format(new_oracle_name))
+        sqlplus.run('shutdown immediate;')
+        sqlplus.run('startup mount')
+        sqlplus.run('alter database open resetlogs;')
+        checkpoint.complete('rename')
+    sqlplus.close()
+    checkpoint.finish()
     logger.warning("Database live mount complete")
     rubrik.delete_session()
     return
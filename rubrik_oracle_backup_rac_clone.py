@@ -4,7 +4,7 @@ import logging
 import sys
 import os
 import shutil
-import paramiko
+import shlex
 import platform
 from datetime import datetime
 import configparser
@@ -26,7 +26,9 @@ import configparser
 @click.option('--spfile_loc', '-c', default='+DATA', type=str,
               help='ASM DG for SPFILE (default:+DATA)  +DATA/{new_oracle_name}/PARAMETERFILE/spfile{new_oracle_name}.ora')
 @click.option('--parallelism', '-p', default=4, type=str,
-              help='The degree of parallelism to use for the RMAN duplicate')
+              help='The degree of parallelism to use for the RMAN duplicate or auto to choose it from the backup pieces, the host CPU count and the measured mount throughput')
+@click.option('--channel_throughput', type=int, default=200,
+              help='Per channel throughput target in MB/s used by --parallelism auto (default 200)')
 @click.option('--no_spfile', is_flag=True,
               help='Restore SPFILE and replace instance specific parameters with new DB name')
 @click.option('--no_file_name_check', is_flag=False,
@@ -46,12 +48,17 @@ import configparser
 @click.option('--core_dump_dest', type=str,
               help='Set the path for the core dump files. This path must exist on the target host')
 @click.option('--log_path', '-l', type=str, help='Log directory, if not specified the mount_path with be used.')
+@click.option('--progress_interval', type=int, default=60, help='Seconds between RMAN duplicate progress reports (default 60). 0 turns the reports off')
+@click.option('--progress_file', type=str, help='Also append the RMAN duplicate progress reports to this file as JSON lines')
+@click.option('--start_timeout', type=int, default=10, help='Minutes to wait for all the RAC instances to start (default 10)')
+@click.option('--resume', is_flag=True,
+              help='Resume a failed clone from the step that failed, reusing the mounted backup files')
 @click.option('--debug_level', '-d', type=str, default='WARNING',
               help='Logging level: DEBUG, INFO, WARNING or CRITICAL.')
 def cli(source_host_db, rac_node_list, mount_path, new_oracle_name, configuration_file, time_restore, oracle_home,
-        undo_tbsp, spfile_loc, parallelism,
+        undo_tbsp, spfile_loc, parallelism, channel_throughput,
         no_spfile, no_file_name_check, refresh_db, control_files, db_file_name_convert, log_file_name_convert, parameter_value_convert,
-        audit_file_dest, core_dump_dest, log_path, debug_level):
+        audit_file_dest, core_dump_dest, log_path, progress_interval, progress_file, start_timeout, resume, debug_level):
     """
     This will use the Rubrik RMAN backups to do a duplicate (or refresh)
     of a source Oracle RAC Database to target RAC database with new name on mentioned RAC nodes of a RAC cluster.
@@ -64,6 +71,18 @@ def cli(source_host_db, rac_node_list, mount_path, new_oracle_name, configuratio
       configuration file. If the Oracle Home is not specified the ORACLE_HOME path from the source database will be used.
       If a log directory is not specified, no log will be created.
 
+\b
+      The clone runs as a series of steps (mount, prepare, provision, duplicate, rac_spfile, rac_init, crs, unmount)
+      and its state is kept in ~/.rubrik_oracle_tools/backup_rac_clone_<new_oracle_name>.json. If a clone fails, for
+      example when srvctl add instance fails on one node, rerun it with --resume to skip the completed steps and reuse
+      the mounted backup files.
+      The backup files are mounted while the auxiliary instance is started and the RAC nodes are prepared. Several
+      clones can share the mount path on one host, their backup files are mounted one at a time.
+      Preparing the RAC nodes creates the audit and core dump directories and checks the ORACLE_HOME and srvctl on
+      every node at once, over one SSH connection per node that is kept for the whole clone.
+      The RAC instances are registered with srvctl and started concurrently, and srvctl status is polled while they
+      start. The time each instance took to start is reported.
+
 \b
   Example:
   rubrik_oracle_backup_rac_clone -s orcl-sr-cluster:ORA19C -r orcl-tgt-1,orcl-tgt-2 -m /home/oracle/restore   -t 2023-08-06T00:06:00
@@ -78,8 +97,10 @@ Example Configuration File:
 ### The following line is required:
 [parameters]
 ### All parameters are optional. Command line flags are boolean (true/false)
-### The degree of parallelism to use for the RMAN duplicate (default is 4)
+### The degree of parallelism to use for the RMAN duplicate (default is 4) or auto
 # parallelism = 4
+### Per channel throughput target in MB/s used when parallelism is auto
+# channel_throughput = 200
 ### Do not restore the spfile renaming the parameters with the new db name.
 # no_spfile = true
 ### Pint in time for duplicate
@@ -103,6 +124,12 @@ Example Configuration File:
 # core_dump_dest = '/u01/app/oracle/admin/clonedb/cdump'
 ### Directory where logs will be created. If not provided not logs will be created
 # log_path = /home/oracle/clone_logs
+### Seconds between RMAN duplicate progress reports, 0 turns the reports off
+# progress_interval = 60
+### File to append the RMAN duplicate progress reports to as JSON lines
+# progress_file = /home/oracle/clone_logs/clonedb_progress.json
+### Minutes to wait for all the RAC instances to start
+# start_timeout = 10
 \b
 Example:
 rubrik_oracle_backup_rac_clone -s orcl-sr-cluster:ORA19C -r orcl-tgt-1,orcl-tgt-2 -m /home/oracle/restore -n oracln -f /home/oracle/clone_config.txt
@@ -121,11 +148,12 @@ rubrik_oracle_backup_rac_clone -s orcl-sr-cluster:ORA19C -r orcl-tgt-1,orcl-tgt-
     logger.addHandler(ch)
 
     # Set up the file logging
+    logfile = None
     if log_path:
         os.makedirs(log_path, exist_ok=True)
         logfile = os.path.join(log_path,
                                "{}_Clone_{}.log".format(new_oracle_name, datetime.now().strftime("%Y%m%d-%H%M%S")))
-        fh = logging.FileHandler(logfile, mode='w')
+        fh = logging.FileHandler(logfile, mode='a' if resume else 'w')
         if debug_level.upper() == 'DEBUG':
             fh.setLevel(logging.DEBUG)
         else:
@@ -144,6 +172,8 @@ rubrik_oracle_backup_rac_clone -s orcl-sr-cluster:ORA19C -r orcl-tgt-1,orcl-tgt-
         configuration.read(configuration_file)
         if 'parallelism' in configuration['parameters'].keys():
             parallelism = configuration['parameters']['parallelism']
+        if 'channel_throughput' in configuration['parameters'].keys():
+            channel_throughput = configuration['parameters'].getint('channel_throughput')
         if 'no_spfile' in configuration['parameters'].keys():
             no_spfile = configuration['parameters'].getboolean('no_spfile')
         if 'oracle_home' in configuration['parameters'].keys():
@@ -162,6 +192,12 @@ rubrik_oracle_backup_rac_clone -s orcl-sr-cluster:ORA19C -r orcl-tgt-1,orcl-tgt-
             parameter_value_convert = configuration['parameters']['parameter_value_convert']
         if 'log_path' in configuration['parameters'].keys():
             log_path = configuration['parameters']['log_path']
+        if 'progress_interval' in configuration['parameters'].keys():
+            progress_interval = configuration['parameters'].getint('progress_interval')
+        if 'progress_file' in configuration['parameters'].keys():
+            progress_file = configuration['parameters']['progress_file']
+        if 'start_timeout' in configuration['parameters'].keys():
+            start_timeout = configuration['parameters'].getint('start_timeout')
         if 'time_restore' in configuration['parameters'].keys():
             time_restore = configuration['parameters']['time_restore']
         if 'audit_file_dest' in configuration['parameters'].keys():
@@ -210,8 +246,30 @@ rubrik_oracle_backup_rac_clone -s orcl-sr-cluster:ORA19C -r orcl-tgt-1,orcl-tgt-
     database = rbs_oracle_common.RubrikRbsOracleDatabase(rubrik, source_host_db[1], source_host_db[0])
     oracle_db_info = database.get_oracle_db_info()
     host_id = database.get_any_rac_target_id(rubrik.cluster_id, host_target)
+    checkpoint = rbs_oracle_common.RbsOracleCloneCheckpoint('backup_rac_clone', new_oracle_name, resume)
+    if resume and not checkpoint.resumed:
+        logger.debug("There is no saved state in {} for a clone of {} to resume. Aborting clone".format(checkpoint.path, new_oracle_name))
+        rubrik.delete_session()
+        raise RubrikOracleBackupMountCloneError(
+            "There is no saved state in {} for a clone of {} to resume.".format(checkpoint.path, new_oracle_name))
+    if checkpoint.resumed:
+        if checkpoint.get('source_host_db') != ":".join(source_host_db):
+            logger.debug("The clone being resumed was from {}, not {}. Aborting clone".format(
+                checkpoint.get('source_host_db'), ":".join(source_host_db)))
+            rubrik.delete_session()
+            raise RubrikOracleBackupMountCloneError(
+                "The clone being resumed was from {}, not {}.".format(checkpoint.get('source_host_db'), ":".join(source_host_db)))
+        logger.warning("Resuming the clone of {} to {}. Completed steps: {}.".format(
+            source_host_db[1], new_oracle_name, ", ".join(checkpoint.get('completed_steps'))))
+    elif checkpoint.previous.get('live_mount_id'):
+        logger.warning("A previous clone to {} did not complete and left live mount id {} mounted at {}. Use --resume to reuse it.".format(
+            new_oracle_name, checkpoint.previous['live_mount_id'], checkpoint.previous.get('backup_path')))
     # Use the provided time or if no time has been provided use the the most recent recovery point
-    if time_restore:
+    if checkpoint.resumed:
+        time_restore = checkpoint.get('time_restore')
+        time_ms = checkpoint.get('time_ms')
+        logger.warning("Using the restore time of the clone being resumed: {}.".format(time_restore or "most recent recovery point"))
+    elif time_restore:
         time_ms = database.epoch_time(time_restore, rubrik.timezone)
         logger.warning("Materializing backup set from time {} for mount.".format(time_restore))
     else:
@@ -229,240 +287,273 @@ rubrik_oracle_backup_rac_clone -s orcl-sr-cluster:ORA19C -r orcl-tgt-1,orcl-tgt-
         rubrik.delete_session()
         raise RubrikOracleBackupMountCloneError(
             "The ORACLE_HOME: {} does not exist on the target host: {}".format(oracle_home, host_target))
-    # Get directories in path to allow us to find the new directory after the mount
-    live_mount_directories = os.listdir(mount_path)
-    logger.warning("Starting the mount of the requested {} backup pieces on {}.".format(source_host_db[1], host_target))
-    live_mount_info = database.live_mount(host_id, time_ms, files_only=True, mount_path=mount_path)
-    live_mount_info = database.async_requests_wait(live_mount_info['id'], 20)
-    logger.debug("Backup Live Mount Asyc Request: {}".format(live_mount_info))
-    logger.info("Async request completed with status: {}".format(live_mount_info['status']))
-    if live_mount_info['status'] != "SUCCEEDED":
-        logger.debug("Mount of backup files did not complete successfully. Mount ended with status {}".format(
-            live_mount_info['status']))
-        rubrik.delete_session()
-        raise RubrikOracleBackupMountCloneError(
-            "Mount of backup files did not complete successfully. Mount ended with status {}".format(
-                live_mount_info['status']))
-    logger.warning("Live mount of the backup files completed.")
-    # Now determine the new live mount directory
-    new_live_mount_directories = os.listdir(mount_path)
-    live_mount_directory = list(set(new_live_mount_directories) - set(live_mount_directories))
-    if len(live_mount_directory) == 1:
-        backup_path = os.path.join(mount_path, live_mount_directory[0])
-    else:
-        logger.debug(
-            "Multiple directories were created in {} during this operation. Live mount directory cannot be determined".format(
-                mount_path))
-        rubrik.delete_session()
-        raise RubrikOracleBackupMountCloneError(
-            "Multiple directories were created in {} during this operation. Live mount directory cannot be determined".format(
-                mount_path))
-    logger.info("Using the live mount path: {}".format(backup_path))
-    live_mount_id = live_mount_directory[0].split('_')[1]
-    logger.debug("Live mount ID is {}".format(live_mount_id))
+
+    if checkpoint.done('mount') and not os.path.isdir(checkpoint.get('backup_path')):
+        logger.warning("The backup files are no longer mounted at {}, mounting them again.".format(checkpoint.get('backup_path')))
+        checkpoint.redo('mount')
+    if checkpoint.done('mount'):
+        logger.warning("Reusing the live mount of the backup files at {}.".format(checkpoint.get('backup_path')))
+
+    def mount_backup_files():
+        logger.warning("Starting the mount of the requested {} backup pieces on {}.".format(source_host_db[1], host_target))
+        with rbs_oracle_common.RbsOracleMountPathLock(mount_path):
+            live_mount_info = database.live_mount(host_id, time_ms, files_only=True, mount_path=mount_path)
+            live_mount_info = database.async_requests_wait(live_mount_info['id'], 20)
+            logger.debug("Backup Live Mount Asyc Request: {}".format(live_mount_info))
+            logger.info("Async request completed with status: {}".format(live_mount_info['status']))
+            if live_mount_info['status'] != "SUCCEEDED":
+                logger.debug("Mount of backup files did not complete successfully. Mount ended with status {}".format(
+                    live_mount_info['status']))
+                raise RubrikOracleBackupMountCloneError(
+                    "Mount of backup files did not complete successfully. Mount ended with status {}".format(
+                        live_mount_info['status']))
+            live_mount_id, backup_path = database.get_files_only_mount(live_mount_info, mount_path)
+        logger.warning("Live mount of the backup files completed.")
+        logger.info("Using the live mount path: {}".format(backup_path))
+        logger.debug("Live mount ID is {}".format(live_mount_id))
+        checkpoint.complete('mount', source_host_db=":".join(source_host_db), time_restore=time_restore, time_ms=time_ms,
+                            live_mount_id=live_mount_id, backup_path=backup_path)
+
+    def prepare_auxiliary():
+        # A resumed clone restarts whatever the failed duplicate left of the auxiliary instance
+        startup_command = "startup force nomount" if checkpoint.resumed else "startup nomount"
+        if refresh_db and not checkpoint.resumed:
+            logger.warning("Shutting down {} database for refresh".format(new_oracle_name))
+            result = crs.srvctl(['stop', 'database', '-d', new_oracle_name])
+            if not result.ok:
+                logger.warning("srvctl stop database {} exited with {}: {}".format(new_oracle_name, result.exit_status, result.output.strip() or result.errors.strip()))
+        if no_spfile:
+            logger.warning("Starting auxiliary instance")
+            sql_return = sqlplus.run(startup_command)
+        else:
+            logger.warning("Creating minimal init file to start instance")
+            init_file = os.path.join(oracle_home, 'dbs', 'init{}.ora'.format(new_oracle_name))
+            logger.debug("Creating new temporary init file {}".format(init_file))
+            with open(init_file, 'w') as file:
+                file.write('db_name={}\n'.format(new_oracle_name))
+            logger.warning("Starting auxiliary instance")
+            sql_return = sqlplus.run("{} pfile='{}'".format(startup_command, init_file))
+
+        if "ORA-01081" in sql_return.errors:
+            logger.debug(
+                "There is an instance of {} all ready running on this host. Aborting clone".format(new_oracle_name))
+            raise RubrikOracleBackupMountCloneError(
+                "There is an instance of {} all ready running on this host or refreshed DB did not start cleanly. Aborting clone".format(
+                    new_oracle_name))
+        sql_return = sqlplus.run("select instance_name from v$instance;")
+        # The duplicate restarts the auxiliary instance
+        sqlplus.restart()
+        if new_oracle_name not in sql_return.output:
+            logger.debug("DB Instance check failed. Instance name is not {}. Aborting clone".format(new_oracle_name))
+            raise RubrikOracleBackupMountCloneError(
+                "DB Instance check failed. Instance name is not {}. Aborting clone".format(new_oracle_name))
+
+    def provision_nodes():
+        logger.warning("Preparing the RAC nodes {}.".format(", ".join(rac_node_names)))
+        failures = {node: [error] for node, error in rac_nodes.connect().items()}
+        directories = [directory.strip("'") for directory in [audit_file_dest, core_dump_dest] if directory]
+        checks = {
+            "ORACLE_HOME {}".format(oracle_home): "test -x {}".format(shlex.quote(os.path.join(oracle_home, 'bin', 'oracle'))),
+            "srvctl in the ORACLE_HOME": "test -x {}".format(shlex.quote(os.path.join(oracle_home, 'bin', 'srvctl')))
+        }
+        failures.update(rac_nodes.provision(directories, checks, [node for node in rac_node_names if node not in failures]))
+        if failures:
+            for node, problems in failures.items():
+                logger.warning("RAC node {} failed: {}".format(node, ", ".join(problems)))
+            raise RubrikOracleBackupMountCloneError(
+                "Preparing the RAC nodes failed on {}. Aborting clone".format(", ".join(sorted(failures))))
+        logger.warning("The RAC nodes {} are ready for the clone.".format(", ".join(rac_node_names)))
+
+    def duplicate_database():
+        logger.warning(
+            "Beginning duplicate of {} to {} on host {}.".format(source_host_db[1], new_oracle_name, source_host_db[0]))
+        backup_path = checkpoint.get('backup_path')
+        channels = parallelism
+        if str(parallelism).lower() == 'auto':
+            channels = rbs_oracle_common.RbsOracleBackupManifest.auto_channels(backup_path, mount_path, channel_throughput, logfile)
+        duplicate_commands = "run { "
+        for x in range(int(channels)):
+            channel = x + 1
+            duplicate_commands = duplicate_commands + "allocate auxiliary channel aux{} device type disk; ".format(channel)
+        duplicate_commands = duplicate_commands + "duplicate database to '{}' ".format(new_oracle_name)
+        if time_restore:
+            duplicate_commands = duplicate_commands + """until time "TO_DATE('{}','YYYY-MM-DD HH24:MI:SS')"  """.format(
+                time_restore.replace("T", ""))
+        if not no_spfile:
+            duplicate_commands = duplicate_commands + "SPFILE parameter_value_convert ('{}','{}') ".format(
+                source_host_db[1], new_oracle_name)
+        if control_files:
+            duplicate_commands = duplicate_commands + "set  control_files = {} ".format(control_files)
+        if db_file_name_convert:
+            duplicate_commands = duplicate_commands + "set  db_file_name_convert = {} ".format(db_file_name_convert)
+        if log_file_name_convert:
+            duplicate_commands = duplicate_commands + "set  log_file_name_convert = {} ".format(log_file_name_convert)
+        if audit_file_dest:
+            duplicate_commands = duplicate_commands + "set  audit_file_dest = {} ".format(audit_file_dest)
+        if core_dump_dest:
+            duplicate_commands = duplicate_commands + "set  core_dump_dest = {} ".format(core_dump_dest)
+        duplicate_commands = duplicate_commands + "set cluster_database='FALSE'  "
+        duplicate_commands = duplicate_commands + "BACKUP LOCATION '{}' ".format(backup_path)
+        if no_file_name_check:
+            duplicate_commands = duplicate_commands + "NOFILENAMECHECK; }"
+        else:
+            duplicate_commands = duplicate_commands + "; }"
+
+        logger.debug("Duplicate script: "
+                     "{}".format(duplicate_commands))
+        with rbs_oracle_common.RbsOracleRmanSession(oracle_home, new_oracle_name, "auxiliary") as rman, \
+                rbs_oracle_common.RmanProgressMonitor(oracle_home, new_oracle_name, progress_interval, progress_file):
+            duplicate_result = rman.run(duplicate_commands)
+        if duplicate_result.rman_failed():
+            logger.debug("The duplicate of {} failed with {}. Aborting clone".format(new_oracle_name, ", ".join(duplicate_result.errors)))
+            raise RubrikOracleBackupMountCloneError(
+                "The duplicate of {} failed with {}. Rerun with --resume to restart it without remounting the backup files.".format(
+                    new_oracle_name, ", ".join(duplicate_result.errors)))
+        checkpoint.complete('duplicate')
+        logger.warning("Duplicate of non-RAC {} database complete.".format(new_oracle_name))
 
     os.environ["ORACLE_HOME"] = oracle_home
     os.environ["ORACLE_SID"] = new_oracle_name
     logger.debug("Setting env variable ORACLE_HOME={}, ORACLE_SID={}.".format(oracle_home, new_oracle_name))
-
-    if refresh_db:
-        logger.warning("Shutting down {} database for refresh".format(new_oracle_name))
-        shut_command = f"srvctl stop database -d {new_oracle_name}"
-        os.system(shut_command)
-    if no_spfile:
-        logger.warning("Starting auxiliary instance")
-        sql_return = database.sqlplus_sysdba(oracle_home, "startup nomount")
-        logger.info(sql_return)
-    else:
-        logger.warning("Creating minimal init file to start instance")
-        init_file = os.path.join(oracle_home, 'dbs', 'init{}.ora'.format(new_oracle_name))
-        logger.debug("Creating new temporary init file {}".format(init_file))
-        with open(init_file, 'w') as file:
-            file.write('db_name={}\n'.format(new_oracle_name))
-        logger.warning("Starting auxiliary instance")
-        sql_return = database.sqlplus_sysdba(oracle_home, "startup nomount pfile='{}'".format(init_file))
-        logger.info(sql_return)
-
-    if "ORA-01081: cannot start already-running ORACLE" in sql_return:
-        logger.debug(
-            "There is an instance of {} all ready running on this host. Aborting clone".format(new_oracle_name))
-        rubrik.delete_session()
-        raise RubrikOracleBackupMountCloneError(
-            "There is an instance of {} all ready running on this host or refreshed DB did not start cleanly. Aborting clone".format(
-                new_oracle_name))
-    sql_return = database.sqlplus_sysdba(oracle_home, "select instance_name from v$instance;")
-    logger.info(sql_return)
-    if new_oracle_name not in sql_return:
-        logger.debug("DB Instance check failed. Instance name is not {}. Aborting clone".format(new_oracle_name))
-        rubrik.delete_session()
-        raise RubrikOracleBackupMountCloneError(
-            "DB Instance check failed. Instance name is not {}. Aborting clone".format(new_oracle_name))
-
-    logger.warning(
-        "Beginning duplicate of {} to {} on host {}.".format(source_host_db[1], new_oracle_name, source_host_db[0]))
-    duplicate_commands = "run { "
-    for x in range(int(parallelism)):
-        channel = x + 1
-        duplicate_commands = duplicate_commands + "allocate auxiliary channel aux{} device type disk; ".format(channel)
-    duplicate_commands = duplicate_commands + "duplicate database to '{}' ".format(new_oracle_name)
-    if time_restore:
-        time_restore = time_restore.replace("T", "")
-        duplicate_commands = duplicate_commands + """until time "TO_DATE('{}','YYYY-MM-DD HH24:MI:SS')"  """.format(
-            time_restore)
-    if not no_spfile:
-        duplicate_commands = duplicate_commands + "SPFILE parameter_value_convert ('{}','{}') ".format(
-            source_host_db[1], new_oracle_name)
-    if control_files:
-        duplicate_commands = duplicate_commands + "set  control_files = {} ".format(control_files)
-    if db_file_name_convert:
-        duplicate_commands = duplicate_commands + "set  db_file_name_convert = {} ".format(db_file_name_convert)
-    if log_file_name_convert:
-        duplicate_commands = duplicate_commands + "set  log_file_name_convert = {} ".format(log_file_name_convert)
-    if audit_file_dest:
-        for rac_node in rac_node_names:
-          if rac_node == host_target:
-            # Local host, no need for SSH
-             if not os.path.exists(audit_file_dest):
-                logger.info(f"Creating Directory '{audit_file_dest}'  on {host_target}.")
-                os.makedirs(audit_file_dest)  # Create the directory locally
-             else:
-               logger.info(f"Directory '{audit_file_dest}' already exists on {host_target}.")
-          else:
-             try:
-               ssh_client = paramiko.SSHClient()
-               ssh_client.load_system_host_keys()
-               ssh_client.connect(rac_node,username=uname)
-               # Check if the audit_file_dest directory exists
-               stdin, stdout, stderr = ssh_client.exec_command(f'test -d {audit_file_dest} && echo "exists" || echo "not exists"')
-               directory_status = stdout.read().decode().strip()
-               # If the directory doesn't exist, create it
-               if directory_status == 'not exists':
-                     ssh_client.exec_command(f'mkdir -p {audit_file_dest}')
-                     logger.info(f"Directory '{audit_file_dest}' created on {rac_node}.")
-               else:
-                     logger.warning(f"Directory '{audit_file_dest}' already exists on {rac_node}.")
-               ssh_client.close()   
-             except Exception as e:
-                print(f"Error on {rac_node}: {str(e)}")
-        duplicate_commands = duplicate_commands + "set  audit_file_dest = {} ".format(audit_file_dest)
-    if core_dump_dest:
-        duplicate_commands = duplicate_commands + "set  core_dump_dest = {} ".format(core_dump_dest)
-    duplicate_commands = duplicate_commands + "set cluster_database='FALSE'  "
-    duplicate_commands = duplicate_commands + "BACKUP LOCATION '{}' ".format(mount_path)
-    if no_file_name_check:
-        duplicate_commands = duplicate_commands + "NOFILENAMECHECK; }"
+    sqlplus = rbs_oracle_common.RbsOracleSqlplusSession(oracle_home, new_oracle_name)
+
+    sp_file_path = f"{spfile_loc}/spfile{new_oracle_name}.ora"  # Specify the sp_file_path
+    # One SSH connection per node is kept for the whole clone
+    rac_nodes = rbs_oracle_common.RbsOracleRacNodeExecutor(rac_node_names, host_target, uname)
+    crs = rbs_oracle_common.RbsOracleCrsRunner(oracle_home, new_oracle_name)
+    # The backup files mount runs on the Rubrik cluster while the auxiliary instance and the RAC nodes are prepared
+    steps = rbs_oracle_common.RbsOracleStepGraph()
+    if not checkpoint.done('mount'):
+        steps.add('mount', mount_backup_files)
+    if checkpoint.done('duplicate'):
+        logger.warning("The duplicate of {} completed in the run being resumed.".format(new_oracle_name))
     else:
-        duplicate_commands = duplicate_commands + "; }"
-
-    logger.debug("Duplicate script: "
-                 "{}".format(duplicate_commands))
-    logger.info(database.rman(oracle_home, duplicate_commands, "auxiliary"))
-    logger.warning("Duplicate of non-RAC {} database complete.".format(new_oracle_name))
-
-    ####Create temp init file and append RAC settings####
-    logger.debug("Creating temporary init file")
-    sql_return = database.sqlplus_sysdba(oracle_home,
-                                         "create pfile='{}/dbs/rbktempinit{}.ora' from spfile;".format(oracle_home,
-                                                                                                       new_oracle_name))
-    logger.info(sql_return)
-    temp_init_file = os.path.join(oracle_home, 'dbs', 'rbktempinit{}.ora'.format(new_oracle_name))
-    logger.debug(f"Temp init file: {temp_init_file}")
-    for instance in racinst_dict:
-        logger.debug(
-            f"Adding RAC instance parameters: {instance}.instance_name={racinst_dict[instance]['instance_number']}, "
-            f"{instance}.thread={racinst_dict[instance]['thread']}, "
-            f"{instance}.undo_tablespace={racinst_dict[instance]['undo_tablespace']} ")
-    # Writing the dynamically generated RAC variables and *.cluster_database=TRUE to the temp_init_file in append mode
-    with open(temp_init_file, 'a') as file:
-        file.write("*.cluster_database=TRUE\n")  # Writing the additional line
-        for variable_name, variable_value in racinst_dict.items():
-            file.write(f"{variable_name}.instance_number = {variable_value['instance_number']}\n")
-            file.write(f"{variable_name}.thread = {variable_value['thread']}\n")
-            file.write(f"{variable_name}.undo_tablespace = '{variable_value['undo_tablespace']}'\n")
-    # Create spfile from temp_init_file with RAC settings in shared area
-    sp_file_path = f"{spfile_loc}/spfile{new_oracle_name}.ora"  # Specify the sp_file_path\
-    sql_command = f"create spfile='{sp_file_path}' from pfile='{temp_init_file}';"
-    sql_return = database.sqlplus_sysdba(oracle_home, sql_command)
-    logger.info(sql_return)
-    ## Shutdown non-cluster database
-    sql_return = database.sqlplus_sysdba(oracle_home, "shutdown immediate;")
-    logger.info(sql_return)
-    ###On Node1 , set Oracle_SID=new_oracle_name<1>
-    ### Set ORACLE_SID to new_oracle_name1
-    os.environ["ORACLE_SID"] = f"{new_oracle_name}1"
-    logger.debug(f"Setting env variable ORACLE_SID={new_oracle_name}1")
-    ### Construct the path to the init file with the "1" suffix on node1
-    init_file_path = os.path.join(oracle_home, "dbs", f"init{new_oracle_name}1.ora")
-    ### Check if the init file exists
-    if os.path.exists(init_file_path):
-        ### Create a backup filename by adding '.bak' extension
-        backup_file_path = os.path.join(oracle_home, "dbs", f"init{new_oracle_name}1.ora.bak")
-        ### Make a backup by copying the init file
-        shutil.copy(init_file_path, backup_file_path)
-        logger.debug(f"Backup of {init_file_path} created at {backup_file_path}")
-    # Open the init file in write mode and write the line with variable
-    logger.debug(f"Creating init file: {init_file_path} with sp file path: {sp_file_path}")
-    with open(init_file_path, 'w') as file:
-        file.write(f"SPFILE='{sp_file_path}'\n")  # Writing the SPFILE line
-
-    sql_return = database.sqlplus_sysdba(oracle_home, "startup;")
-    logger.info(sql_return)
-    sql_return = database.sqlplus_sysdba(oracle_home, f"@{oracle_home}/rdbms/admin/catclust.sql;")
-    logger.info(sql_return)
-    sql_return = database.sqlplus_sysdba(oracle_home, "shutdown immediate;")
-    logger.info(sql_return)
-
-    ###### Add RAC Database to CRS Registry#####
-    logger.warning("Clearing any existing database settings with srvctl.")
-    delete_command = f"srvctl remove database -d {new_oracle_name} -y"
-    os.system(delete_command)
-    command = (
-        f"{oracle_home}/bin/srvctl"
-        f" add database -d {new_oracle_name} -o {oracle_home} -p {sp_file_path}"
-    )
-
+        steps.add('prepare', prepare_auxiliary)
+        steps.add('provision', provision_nodes)
+        steps.add('duplicate', duplicate_database, depends_on=['mount', 'prepare', 'provision'])
+    # The steps leave the session open for the steps still running, it is deleted here once they have all stopped
     try:
-        exit_code = os.system(command)
-        if exit_code == 0:
-            logger.warning(f"srvctl add database {new_oracle_name} Command executed successfully")
+        steps.run()
+    except (Exception, SystemExit):
+        rubrik.delete_session()
+        raise
+    live_mount_id = checkpoint.get('live_mount_id')
+
+    if not checkpoint.done('rac_spfile'):
+        ####Create temp init file and set the RAC parameters####
+        logger.debug("Creating temporary init file")
+        sqlplus.run("create pfile='{}/dbs/rbktempinit{}.ora' from spfile;".format(oracle_home, new_oracle_name))
+        temp_init_file = os.path.join(oracle_home, 'dbs', 'rbktempinit{}.ora'.format(new_oracle_name))
+        logger.debug(f"Temp init file: {temp_init_file}")
+        # The parameters are set in place so a rerun or the cluster_database=FALSE from the duplicate are not repeated
+        parameter_file = rbs_oracle_common.RbsOracleParameterFile.read(temp_init_file)
+        parameter_file.set('cluster_database', 'TRUE')
+        for instance in racinst_dict:
+            logger.debug(
+                f"Setting RAC instance parameters: {instance}.instance_number={racinst_dict[instance]['instance_number']}, "
+                f"{instance}.thread={racinst_dict[instance]['thread']}, "
+                f"{instance}.undo_tablespace={racinst_dict[instance]['undo_tablespace']} ")
+            parameter_file.set('instance_number', racinst_dict[instance]['instance_number'], instance)
+            parameter_file.set('thread', racinst_dict[instance]['thread'], instance)
+            parameter_file.set('undo_tablespace', "'{}'".format(racinst_dict[instance]['undo_tablespace']), instance)
+        parameter_file.write()
+        # Create spfile from temp_init_file with RAC settings in shared area
+        sql_command = f"create spfile='{sp_file_path}' from pfile='{temp_init_file}';"
+        sqlplus.run(sql_command)
+        ## Shutdown non-cluster database
+        sqlplus.run("shutdown immediate;")
+        checkpoint.complete('rac_spfile')
+
+    if not checkpoint.done('rac_init'):
+        ###On Node1 , set Oracle_SID=new_oracle_name<1>
+        ### Set ORACLE_SID to new_oracle_name1
+        os.environ["ORACLE_SID"] = f"{new_oracle_name}1"
+        sqlplus.restart(f"{new_oracle_name}1")
+        logger.debug(f"Setting env variable ORACLE_SID={new_oracle_name}1")
+        ### Construct the path to the init file with the "1" suffix on node1
+        init_file_path = os.path.join(oracle_home, "dbs", f"init{new_oracle_name}1.ora")
+        ### Check if the init file exists
+        if os.path.exists(init_file_path):
+            ### Create a backup filename by adding '.bak' extension
+            backup_file_path = os.path.join(oracle_home, "dbs", f"init{new_oracle_name}1.ora.bak")
+            ### Make a backup by copying the init file
+            shutil.copy(init_file_path, backup_file_path)
+            logger.debug(f"Backup of {init_file_path} created at {backup_file_path}")
+        # Open the init file in write mode and write the line with variable
+        logger.debug(f"Creating init file: {init_file_path} with sp file path: {sp_file_path}")
+        init_file = rbs_oracle_common.RbsOracleParameterFile(init_file_path)
+        init_file.set('spfile', f"'{sp_file_path}'", sid=None)
+        init_file.write()
+
+        sqlplus.run("startup;")
+        sqlplus.run(f"@{oracle_home}/rdbms/admin/catclust.sql;")
+        sqlplus.run("shutdown immediate;")
+        sqlplus.close()
+        checkpoint.complete('rac_init')
+
+    if not checkpoint.done('crs'):
+        ###### Add RAC Database to CRS Registry#####
+        logger.warning("Clearing any existing database settings with srvctl.")
+        result = crs.srvctl(['remove', 'database', '-d', new_oracle_name, '-y'])
+        if not result.ok:
+            logger.info("srvctl remove database {} exited with {}: {}".format(new_oracle_name, result.exit_status, result.output.strip() or result.errors.strip()))
+        result = crs.srvctl(['add', 'database', '-d', new_oracle_name, '-o', oracle_home, '-p', sp_file_path])
+        if not result.ok:
+            logger.debug("srvctl add database {} failed: {} {}".format(new_oracle_name, result.output, result.errors))
+            rubrik.delete_session()
+            raise RubrikOracleBackupMountCloneError(
+                "srvctl add database {} failed with exit code {}: {}".format(new_oracle_name, result.exit_status, result.output.strip() or result.errors.strip()))
+        logger.warning(f"srvctl add database {new_oracle_name} Command executed successfully")
+
+        # Add RAC Instances to CRS registry for all the nodes at once
+        instances = {f"{new_oracle_name}{i}": node_name for i, node_name in enumerate(rac_node_names, start=1)}
+        failures = {instance: result for instance, result in crs.add_instances(instances).items() if not result.ok}
+        for instance, result in failures.items():
+            logger.warning("srvctl add instance {} on {} failed with exit code {}: {}".format(
+                instance, instances[instance], result.exit_status, result.output.strip() or result.errors.strip()))
+        if failures:
+            rubrik.delete_session()
+            raise RubrikOracleBackupMountCloneError(
+                "srvctl add instance failed for {}. Rerun with --resume to retry the CRS registration.".format(", ".join(sorted(failures))))
+        logger.warning("srvctl add instance completed for {}.".format(", ".join(instances)))
+
+        # Start the instances and wait for srvctl status to show them all running
+        logger.warning(f"Starting RAC database {new_oracle_name} on RAC nodes {rac_node_list}")
+        started, start_results = crs.start_instances(instances, start_timeout * 60)
+        for instance, node_name in instances.items():
+            if started[instance] is not None:
+                logger.warning("Instance {} on {} started in {:0.0f} seconds.".format(instance, node_name, started[instance]))
+            elif instance in start_results:
+                logger.warning("Instance {} on {} is not running. srvctl start instance exited with {}: {}".format(
+                    instance, node_name, start_results[instance].exit_status,
+                    start_results[instance].output.strip() or start_results[instance].errors.strip()))
+            else:
+                logger.warning("Instance {} on {} is not running. srvctl start instance is still running.".format(instance, node_name))
+        not_started = [instance for instance, seconds in started.items() if seconds is None]
+        if not_started:
+            rubrik.delete_session()
+            raise RubrikOracleBackupMountCloneError(
+                "Instances {} did not start within {} minutes. Rerun with --resume to retry the CRS registration.".format(
+                    ", ".join(not_started), start_timeout))
+        checkpoint.complete('crs')
+
+    if not checkpoint.done('unmount'):
+        mount = rbs_oracle_common.RubrikRbsOracleMount(rubrik, source_host_db[1], source_host_db[0], host_target)
+        logger.warning("Unmounting backups.")
+        delete_request = mount.live_mount_delete(live_mount_id)
+        delete_request = mount.async_requests_wait(delete_request['id'], 12)
+        logger.info("Async request completed with status: {}".format(delete_request['status']))
+        logger.debug(delete_request)
+        if delete_request['status'] != "SUCCEEDED":
+            logger.warning("Unmount of backup files failed with status: {}. Rerun with --resume to retry the unmount.".format(delete_request['status']))
         else:
-            logger.warning("srvctl add database Command execution failed")
-    except Exception as e:
-        logger.debug("Error:", e)
-
-    # Add RAC Instances to CRS registry in a loop based on node list
-    for i, node_name in enumerate(rac_node_names, start=1):
-        command = (
-            f"{oracle_home}/bin/srvctl"
-            f" add instance -d {new_oracle_name}"
-            f" -i {new_oracle_name}{str(i)}"
-            f" -n {node_name}"
-        )
-
-        try:
-            os.system(command)
-            logger.warning(f"srvctl add instance for node {node_name} executed successfully")
-        except Exception as e:
-            logger.debug(f"Error for node {node_name}: {e}")
-
-    # Restart database using srvctl
-    logger.warning(f"Starting RAC database {new_oracle_name} on RAC nodes {rac_node_list}")
-    start_command = f"srvctl start database -d {new_oracle_name}"
-    os.system(start_command)
-    status_command = f"srvctl status database -d {new_oracle_name}"
-    os.system(status_command)
-    mount = rbs_oracle_common.RubrikRbsOracleMount(rubrik, source_host_db[1], source_host_db[0], host_target)
-    logger.warning("Unmounting backups.")
-    delete_request = mount.live_mount_delete(live_mount_id)
-    delete_request = mount.async_requests_wait(delete_request['id'], 12)
-    logger.info("Async request completed with status: {}".format(delete_request['status']))
-    logger.debug(delete_request)
-    if delete_request['status'] != "SUCCEEDED":
-        logger.warning("Unmount of backup files failed with status: {}".format(delete_request['status']))
-    else:
-        logger.info("Live mount of backup data files with id: {} has been unmounted.".format(live_mount_id))
-        logger.warning("Backups unmounted")
+            logger.info("Live mount of backup data files with id: {} has been unmounted.".format(live_mount_id))
+            logger.warning("Backups unmounted")
+            checkpoint.complete('unmount')
 
+    rac_nodes.close()
+    if checkpoint.done('unmount'):
+        checkpoint.finish()
     logger.warning("Database clone complete")
     rubrik.delete_session()
     return
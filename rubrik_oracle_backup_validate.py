@@ -4,17 +4,30 @@ import logging
 import sys
 import datetime
 import pytz
+import time
+from tabulate import tabulate
 
 
 @click.command()
-@click.option('--source_host_db', '-s', type=str, required=True,  help='The source <host or RAC cluster>:<database>')
-@click.option('--time_restore', '-t', type=str, help='Point in time to validate the DB, format is YY:MM:DDTHH:MM:SS example 2019-01-01T20:30:15')
-@click.option('--host_target', '-h', type=str, help='Target Host for DB Validation ')
-@click.option('--wait', is_flag=True, help='Wait for the DB Validate to complete. Will timeout after 2 hours.')
+@click.option('--source_host_db', '-s', type=str, multiple=True, help='The source <host or RAC cluster>:<database>. Repeat or separate with commas to validate many databases')
+@click.option('--source_file', type=str, help='Validate the <host or RAC cluster>:<database> pairs in this file, one per line')
+@click.option('--select_sla', type=str, help='Validate all the databases protected by this SLA Domain')
+@click.option('--select_host', type=str, help='Validate all the databases on this host')
+@click.option('--select_rac', type=str, help='Validate all the databases on this RAC cluster')
+@click.option('--time_restore', '-t', type=str, help='Point in time to validate the DB, format is YY:MM:DDTHH:MM:SS example 2019-01-01T20:30:15. Not used with many databases')
+@click.option('--host_target', '-h', type=str, help='Target Host for DB Validation. With many databases, the one host to run all the validations on')
+@click.option('--wait', is_flag=True, help='Wait for the DB Validate to complete. Will timeout after 2 hours. Many databases are always waited on')
+@click.option('--host_pool', type=str, multiple=True, help='Many databases: hosts or RAC clusters to run the validations on. Repeat or separate with commas. Default is each source host')
+@click.option('--max_per_host', type=int, default=2, help='Many databases: maximum number of validations running on one target at one time (default 2)')
+@click.option('--max_in_flight', type=int, default=10, help='Many databases: maximum number of validations running on the cluster at one time (default 10)')
+@click.option('--max_databases', type=int, default=0, help='Many databases: only validate this many of the databases, least recently validated first (default all)')
+@click.option('--timeout', type=int, default=720, help='Many databases: minutes to wait for all the validations to complete (default 720)')
+@click.option('--history_file', type=str, help='Many databases: validation history file (default ~/.rubrik_oracle_tools/validation_history.json)')
 @click.option('--keyfile', '-k', type=str, required=False,  help='The connection keyfile path')
 @click.option('--insecure', is_flag=True,  help='Flag to use insecure connection')
 @click.option('--debug_level', '-d', type=str, default='WARNING', help='Logging level: DEBUG, INFO, WARNING, ERROR or CRITICAL.')
-def cli(source_host_db, time_restore, host_target, wait, keyfile, insecure, debug_level):
+def cli(source_host_db, source_file, select_sla, select_host, select_rac, time_restore, host_target, wait, host_pool,
+        max_per_host, max_in_flight, max_databases, timeout, history_file, keyfile, insecure, debug_level):
     """
     This will Validate the requested Rubrik Oracle backup set on source or target host or RAC cluster
 
@@ -22,6 +35,14 @@ def cli(source_host_db, time_restore, host_target, wait, keyfile, insecure, debu
     The source database is specified in a host:db format.  If the restore time is not
     provided the most recent recoverable time will be used. The host for the validation can be specified if it is not it
     will be validate on the source host.
+\b
+    Many databases are validated when more than one source database is supplied, a file of host:db pairs is supplied
+    or the databases are selected by SLA Domain, host or RAC cluster. The most recent recovery point of each database
+    is validated, so a restore time can not be given. The databases validated least recently are submitted first.
+    The validations are spread over the host pool, run on the host target, or run on each source host, with no more
+    than max_per_host running on one target and no more than max_in_flight running on the cluster. All the
+    validations are waited on together and the result and duration of each is recorded in the validation history for
+    the next run.
 \b
     Returns:
         oracle_validate_info (dict): The information about the requested database validate returned from the Rubrik CDM.
@@ -48,7 +69,27 @@ def cli(source_host_db, time_restore, host_target, wait, keyfile, insecure, debu
     else:
         logger.debug("Cluster version {}.{}.{} is post 5.3".format(cdm_version[0], cdm_version[1], cdm_version[2]))
 
-    source_host_db = source_host_db.split(":")
+    if not (source_host_db or source_file or select_sla or select_host or select_rac):
+        rubrik.delete_session()
+        raise RubrikOracleBackupValidateError("A source database, a host:db file or a database selector is required.")
+    if source_file or select_sla or select_host or select_rac or len(source_host_db) > 1 or ',' in source_host_db[0]:
+        if time_restore:
+            rubrik.delete_session()
+            raise RubrikOracleBackupValidateError("A restore time can not be used with many databases, the most recent recovery point of each is validated.")
+        if host_target and host_pool:
+            rubrik.delete_session()
+            raise RubrikOracleBackupValidateError("Use either a host target or a host pool for many databases, not both.")
+        if host_target:
+            host_pool = (host_target,)
+        results = bulk_validate(rubrik, source_host_db, source_file, select_sla, select_host, select_rac, host_pool,
+                                max_per_host, max_in_flight, max_databases, timeout, history_file)
+        rubrik.delete_session()
+        failures = [name for name, result in results.items() if result['status'] != 'SUCCEEDED']
+        if failures:
+            raise RubrikOracleBackupValidateError("{} of {} database validations did not complete successfully: {}".format(
+                len(failures), len(results), ", ".join(failures)))
+        return results
+    source_host_db = source_host_db[0].split(":")
     database = rbs_oracle_common.RubrikRbsOracleDatabase(rubrik, source_host_db[1], source_host_db[0])
     oracle_db_info = database.get_oracle_db_info()
     logger.debug(oracle_db_info)
@@ -85,6 +126,102 @@ def cli(source_host_db, time_restore, host_target, wait, keyfile, insecure, debu
         return oracle_validate_info
 
 
+def bulk_validate(rubrik, source_host_db, source_file, select_sla, select_host, select_rac, host_pool, max_per_host,
+                  max_in_flight, max_databases, timeout, history_file):
+    """
+    Validates many databases with per target and cluster wide caps and one wait for all of them. The databases
+    validated least recently are submitted first and the results are recorded in the validation history.
+
+    Returns:
+        results (dict): host:db to the result of the validate request.
+    """
+    logger = logging.getLogger(__name__)
+    fleet = rbs_oracle_common.RubrikRbsOracleFleet(rubrik)
+    host_db_list = fleet.read_host_db_list(source_host_db, source_file)
+    if select_sla or select_host or select_rac:
+        host_db_list.extend(fleet.select(select_sla, select_host, select_rac))
+    databases, failures = fleet.resolve(host_db_list)
+    if not databases:
+        rubrik.delete_session()
+        raise RubrikOracleBackupValidateError("No databases were found to validate. {}".format(failures))
+    store = rbs_oracle_common.RbsOracleStateStore('validation_history.json', history_file)
+    history = store.data.setdefault(rubrik.cluster_id, {})
+    # Never validated databases sort first, then the oldest successful validation
+    names = sorted(databases.keys(), key=lambda name: history.get(databases[name].oracle_id, {}).get('last_success', 0))
+    if max_databases and len(names) > max_databases:
+        logger.warning("Validating the {} least recently validated of {} databases.".format(max_databases, len(names)))
+        names = names[:max_databases]
+    results = {}
+    for name, reason in failures.items():
+        results[name] = {'id': None, 'status': 'NOT_FOUND', 'submitted': None, 'completed': None, 'error': reason}
+    pool = rbs_oracle_common.RubrikRbsOracleFleet.read_host_db_list(host_pool)
+    if pool:
+        pool_ids, pool_failures = fleet.resolve_targets(pool)
+        if pool_failures:
+            rac_ids, pool_failures = fleet.resolve_targets(list(pool_failures.keys()), rac=True)
+            pool_ids.update(rac_ids)
+        for target, reason in pool_failures.items():
+            logger.warning("Host pool target {} will not be used: {}".format(target, reason))
+        pool = [target for target in pool if target in pool_ids]
+        if not pool:
+            rubrik.delete_session()
+            raise RubrikOracleBackupValidateError("None of the host pool targets were found: {}".format(pool_failures))
+        targets = {name: pool[index % len(pool)] for index, name in enumerate(names)}
+        target_ids = pool_ids
+    else:
+        # Validate on the source host or RAC cluster
+        targets = {}
+        hosts = []
+        racs = []
+        for name in names:
+            record = fleet.records[databases[name].oracle_id]
+            if record.get('racName'):
+                targets[name] = record['racName']
+                racs.append(record['racName'])
+            else:
+                targets[name] = record.get('standaloneHostName')
+                hosts.append(record.get('standaloneHostName'))
+        target_ids, target_failures = fleet.resolve_targets(list(dict.fromkeys(hosts)))
+        rac_ids, rac_failures = fleet.resolve_targets(list(dict.fromkeys(racs)), rac=True)
+        target_ids.update(rac_ids)
+    queue = rbs_oracle_common.RubrikRbsOracleAsyncQueue(rubrik, max_in_flight, max_per_group=max_per_host)
+    for name in names:
+        database = databases[name]
+        record = fleet.records[database.oracle_id]
+        if targets[name] not in target_ids:
+            results[name] = {'id': None, 'status': 'NOT_FOUND', 'submitted': None, 'completed': None,
+                             'error': "Validation target {} was not found".format(targets[name])}
+            continue
+        if not record.get('latestRecoveryPoint'):
+            results[name] = {'id': None, 'status': 'NO_RECOVERY_POINT', 'submitted': None, 'completed': None,
+                             'error': "The database has no recovery point to validate"}
+            continue
+        time_ms = database.epoch_time(record['latestRecoveryPoint'], rubrik.timezone)
+        queue.add(name, lambda database=database, target_id=target_ids[targets[name]], time_ms=time_ms: database.oracle_validate(target_id, time_ms),
+                  group=targets[name])
+    logger.warning("Starting the Validation of {} databases on {} targets, {} per target and {} on the cluster at a time.".format(
+        len(queue.pending), len(set(targets.values())), max_per_host, max_in_flight))
+    results.update(queue.wait(timeout))
+    for name in names:
+        if name not in queue.results:
+            continue
+        result = queue.results[name]
+        entry = history.setdefault(databases[name].oracle_id, {})
+        entry['name'] = name
+        entry['target'] = targets[name]
+        entry['last_attempt'] = int(time.time())
+        entry['last_status'] = result['status']
+        if result.get('submitted') and result.get('completed'):
+            entry['last_seconds'] = int(result['completed'] - result['submitted'])
+        if result['status'] == 'SUCCEEDED':
+            entry['last_success'] = int(time.time())
+    store.save()
+    rows = [row[:1] + [targets.get(row[0], '')] + row[1:] for row in queue.summary()]
+    rows.extend([[name, targets.get(name, ''), result['status'], '', '', result['error']] for name, result in results.items() if name not in queue.results])
+    print(tabulate(rows, headers=["Host:Database", "Target", "Status", "Seconds", "Request ID", "Error"]))
+    return results
+
+
 class RubrikOracleBackupValidateError(rbs_oracle_common.NoTraceBackWithLineNumber):
     """
         Renames object so error is named with calling script
@@ -0,0 +1,366 @@
+import rbs_oracle_common
+import click
+import logging
+import sys
+import os
+import platform
+import getpass
+import time
+import datetime
+import configparser
+from tabulate import tabulate
+
+
+@click.command()
+@click.option('--configuration_file', '-f', type=str, required=True, help='Clone pool configuration file. One section per pool, see example_clone_pool_config.ini')
+@click.option('--action', '-a', type=click.Choice(['status', 'replenish', 'recycle', 'maintain', 'checkout']), default='status', help='status: list the pools, replenish: mount up to the pool size, recycle: unmount aged mounts, maintain: recycle then replenish, checkout: hand out a warm mount (default status)')
+@click.option('--pool', '-p', type=str, multiple=True, help='The pool(s) to act on. Repeat or separate with commas. Default is all the pools in the configuration file (checkout requires one pool)')
+@click.option('--new_oracle_name', '-n', type=str, help='Checkout: rename the checked out database with the Oracle NID utility. Must be run on the mount host')
+@click.option('--owner', type=str, help='Checkout: the owner recorded against the checked out mount (default the OS user)')
+@click.option('--wait', is_flag=True, help='Wait for the new mounts to complete. By default the mounts are requested and picked up by the next run.')
+@click.option('--timeout', type=int, default=60, help='Minutes to wait for the new mounts to complete when --wait is used (default 60)')
+@click.option('--interval', type=int, default=0, help='Maintain: minutes between maintenance passes. Runs until interrupted. Default is a single pass')
+@click.option('--state_file', type=str, help='Pool state file. Use a shared path when the pool is used from more than one host (default ~/.rubrik_oracle_tools/clone_pool.json)')
+@click.option('--keyfile', '-k', type=str, required=False,  help='The connection keyfile path')
+@click.option('--insecure', is_flag=True,  help='Flag to use insecure connection')
+@click.option('--debug_level', '-d', type=str, default='WARNING', help='Logging level: DEBUG, INFO, WARNING, ERROR or CRITICAL.')
+def cli(configuration_file, action, pool, new_oracle_name, owner, wait, timeout, interval, state_file, keyfile, insecure, debug_level):
+    """Keeps pools of warm live mounts ready to check out.
+
+\b
+    Each pool in the configuration file keeps up to size live mounts of a source database warm on the pool hosts.
+    The mounts are made from the latest recovery point. A host holds one warm mount of a pool at a time, as the
+    mounts use the source database name, so the pool size is capped at the number of pool hosts. Mounts are
+    requested without waiting and are picked up when complete by the next run of any action, unless --wait is used.
+\b
+    Checkout hands out the warm mount with the most recent recovery point immediately and requests a replacement
+    mount in the background. The checked out database is renamed with the Oracle NID utility if a new name is
+    supplied. The rename must be run on the mount host. Checked out mounts are removed with rubrik_oracle_unmount
+    or, if renamed, rubrik_oracle_clone_unmount and are dropped from the pool when they are gone.
+\b
+    Recycle unmounts the warm mounts older than the max_age_hours of the pool. Maintain recycles and then
+    replenishes each pool, repeating every interval minutes if one is given.
+\b
+    Returns:
+        checkout (dict): For checkout, the pool entry of the checked out mount.
+    """
+    numeric_level = getattr(logging, debug_level.upper(), None)
+    if not isinstance(numeric_level, int):
+        raise ValueError('Invalid log level: {}'.format(debug_level))
+    logger = logging.getLogger()
+    logger.setLevel(logging.NOTSET)
+    ch = logging.StreamHandler(sys.stdout)
+    ch.setLevel(numeric_level)
+    console_formatter = logging.Formatter('%(asctime)s: %(message)s')
+    ch.setFormatter(console_formatter)
+    logger.addHandler(ch)
+
+    pools = read_pools(configuration_file)
+    names = rbs_oracle_common.RubrikRbsOracleFleet.read_host_db_list(pool) or list(pools.keys())
+    unknown = [name for name in names if name not in pools]
+    if unknown:
+        raise RubrikOracleClonePoolError("The pool(s) {} are not in the configuration file {}.".format(", ".join(unknown), configuration_file))
+    if action == 'checkout' and len(names) != 1:
+        raise RubrikOracleClonePoolError("Checkout requires one pool. Pools configured: {}".format(", ".join(names)))
+    rubrik = rbs_oracle_common.RubrikConnection(keyfile, insecure)
+    store = rbs_oracle_common.RbsOracleStateStore('clone_pool.json', state_file)
+    # The pool hosts are resolved from one listing, only for the actions that request mounts
+    fleet = rbs_oracle_common.RubrikRbsOracleFleet(rubrik) if action in ['replenish', 'maintain', 'checkout'] else None
+    managers = {name: RbsOracleClonePool(rubrik, store, name, pools[name], fleet) for name in names}
+    if action == 'checkout':
+        manager = managers[names[0]]
+        entry = manager.checkout(owner or getpass.getuser())
+        logger.warning("Checked out the mount of {} on {} at recovery point {}.".format(
+            manager.database_name, entry['host'], entry['recovery_point']))
+        manager.replenish()
+        if new_oracle_name:
+            manager.rename(entry, new_oracle_name)
+            # The renamed mount no longer holds the source database name so its host can take a new mount
+            manager.replenish()
+        print_status(managers)
+        rubrik.delete_session()
+        return entry
+    while True:
+        for manager in managers.values():
+            if action in ['recycle', 'maintain']:
+                manager.recycle()
+            if action in ['replenish', 'maintain']:
+                manager.replenish()
+        if wait and action in ['replenish', 'maintain']:
+            wait_for_mounts(rubrik, managers, timeout)
+        if action == 'status':
+            for manager in managers.values():
+                manager.refresh()
+        print_status(managers)
+        if action != 'maintain' or not interval:
+            break
+        logger.warning("Next maintenance pass in {} minutes.".format(interval))
+        time.sleep(interval * 60)
+    rubrik.delete_session()
+    return
+
+
+def read_pools(configuration_file):
+    """
+    Reads the pool definitions. Each section of the configuration file is a pool.
+
+    Returns:
+        pools (dict): Pool name to the pool parameters.
+    """
+    if not os.path.exists(configuration_file):
+        raise RubrikOracleClonePoolError("The configuration file {} does not exist.".format(configuration_file))
+    configuration = configparser.ConfigParser()
+    configuration.read(configuration_file)
+    pools = {}
+    for name in configuration.sections():
+        section = configuration[name]
+        if 'source_host_db' not in section.keys() or 'hosts' not in section.keys():
+            raise RubrikOracleClonePoolError("Pool {} requires source_host_db and hosts.".format(name))
+        pools[name] = {
+            'source_host_db': section['source_host_db'],
+            'hosts': [host.strip() for host in section['hosts'].split(',') if host.strip()],
+            'size': section.getint('size', 1),
+            'max_age_hours': section.getint('max_age_hours', 24),
+            'oracle_home': section.get('oracle_home')
+        }
+    if not pools:
+        raise RubrikOracleClonePoolError("No pools were found in the configuration file {}.".format(configuration_file))
+    return pools
+
+
+class RbsOracleClonePool:
+    """
+    A pool of live mounts of one source database. The pool entries are kept in the state store under the pool name.
+    """
+    warm_states = ['PENDING', 'WARM']
+
+    def __init__(self, rubrik, store, name, parameters, fleet=None):
+        self.logger = logging.getLogger(__name__ + '.RbsOracleClonePool')
+        self.rubrik = rubrik
+        self.store = store
+        self.name = name
+        self.parameters = parameters
+        source_host_db = parameters['source_host_db'].split(":")
+        self.database_name = source_host_db[1]
+        self.database = rbs_oracle_common.RubrikRbsOracleMount(rubrik, source_host_db[1], source_host_db[0], parameters['hosts'][0])
+        self.fleet = fleet
+        self.target_ids = None
+
+    @property
+    def entries(self):
+        return self.store.data.setdefault(self.name, [])
+
+    def reconcile(self):
+        """
+        Brings the pool entries up to date. Completed mount requests become warm mounts, failed requests are dropped
+        and mounts that are no longer on the Rubrik CDM are dropped. A completed request without a live mount result is
+        matched to the mount of the source database on its host, or kept pending until the mount can be found.
+        """
+        live_mounts = self.rubrik.connection.get('internal', '/oracle/db/mount?source_database_id={}'.format(self.database.oracle_id))
+        live_mount_ids = [mount['id'] for mount in live_mounts['data']]
+        pooled_ids = [entry.get('mount_id') for entry in self.entries if entry.get('mount_id')]
+        for entry in list(self.entries):
+            if entry['status'] == 'PENDING':
+                try:
+                    oracle_request = self.rubrik.connection.get('internal', '/oracle/request/{}'.format(entry['request_id']))
+                except Exception as err:
+                    self.logger.debug("Status check of {} failed, will retry: {}".format(entry['request_id'], err))
+                    continue
+                if oracle_request['status'] == 'SUCCEEDED':
+                    mount_id = self.database.live_mount_id_from_request(oracle_request)
+                    if not mount_id:
+                        found = [mount['id'] for mount in live_mounts['data'] if mount['id'] not in pooled_ids
+                                 and not mount.get('isFilesOnlyMount')
+                                 and self.database.match_hostname(mount.get('targetHostname') or '', entry['host'])]
+                        if len(found) != 1:
+                            self.logger.warning("Pool {}: the mount request {} on {} succeeded but {} matching live mounts were found. It will be looked up again on the next run.".format(
+                                self.name, entry['request_id'], entry['host'], len(found)))
+                            continue
+                        mount_id = found[0]
+                    entry['mount_id'] = mount_id
+                    pooled_ids.append(mount_id)
+                    entry['status'] = 'WARM'
+                    entry['warm'] = int(time.time())
+                    self.logger.info("Pool {}: the mount on {} is warm.".format(self.name, entry['host']))
+                elif oracle_request['status'] in ['FAILED', 'CANCELED']:
+                    self.logger.warning("Pool {}: the mount on {} ended with status {}: {}".format(
+                        self.name, entry['host'], oracle_request['status'], oracle_request.get('error', {}).get('message', '')))
+                    self.entries.remove(entry)
+            elif entry.get('mount_id') not in live_mount_ids:
+                self.logger.info("Pool {}: the {} mount on {} is no longer mounted.".format(self.name, entry['status'].lower(), entry['host']))
+                self.entries.remove(entry)
+
+    def refresh(self):
+        """
+        Brings the pool entries up to date and saves them.
+        """
+        with rbs_oracle_common.RbsOracleStateLock(self.store):
+            self.reconcile()
+            self.store.save()
+
+    def free_hosts(self):
+        """
+        Returns the pool hosts that can take a new mount. A host with a warm mount, or a checked out mount that still
+        uses the source database name, is not free.
+        """
+        used = [entry['host'] for entry in self.entries if entry['status'] in self.warm_states or not entry.get('new_oracle_name')]
+        return [host for host in self.parameters['hosts'] if host not in used]
+
+    def replenish(self):
+        """
+        Requests live mounts from the latest recovery point until the pool is at its size. The requests are not
+        waited on.
+
+        Returns:
+            requests (list): The pool entries of the new mount requests.
+        """
+        requests = []
+        with rbs_oracle_common.RbsOracleStateLock(self.store):
+            self.reconcile()
+            needed = self.parameters['size'] - len([entry for entry in self.entries if entry['status'] in self.warm_states])
+            hosts = self.free_hosts()
+            if needed > 0 and hosts:
+                oracle_db_info = self.database.get_oracle_db_info()
+                if self.target_ids is None:
+                    self.target_ids, failures = self.fleet.resolve_targets(self.parameters['hosts'], bool(oracle_db_info.get('racName')))
+                    for host, reason in failures.items():
+                        self.logger.warning("Pool {}: the host {} can not be used: {}".format(self.name, host, reason))
+                hosts = [host for host in hosts if host in self.target_ids]
+            if needed > len(hosts):
+                self.logger.warning("Pool {}: {} mounts are needed but only {} hosts are free.".format(self.name, needed, len(hosts)))
+            if needed > 0 and hosts:
+                time_ms = self.database.epoch_time(oracle_db_info['latestRecoveryPoint'], self.rubrik.timezone)
+                for host in hosts[:needed]:
+                    # The mount is posted directly, as live_mount deletes the session on an error and would end the run
+                    payload = self.database.live_mount_payload(self.target_ids[host], time_ms, oracle_home=self.parameters['oracle_home'])
+                    live_mount_info, error = self.rubrik.run_guarded(
+                        self.rubrik.connection.post, 'internal', '/oracle/db/{}/mount'.format(self.database.oracle_id),
+                        payload, timeout=self.database.cdm_timeout)
+                    if error is not None:
+                        self.logger.warning("Pool {}: the mount request on {} failed: {}".format(self.name, host, error))
+                        continue
+                    entry = {'status': 'PENDING', 'host': host, 'request_id': live_mount_info['id'], 'mount_id': None,
+                             'requested': int(time.time()), 'recovery_point': oracle_db_info['latestRecoveryPoint']}
+                    self.entries.append(entry)
+                    requests.append(entry)
+                    self.logger.warning("Pool {}: requested a mount of {} on {}.".format(self.name, self.database_name, host))
+            self.store.save()
+        return requests
+
+    def recycle(self):
+        """
+        Unmounts the warm mounts older than the max_age_hours of the pool.
+
+        Returns:
+            recycled (list): The pool entries of the unmounted mounts.
+        """
+        recycled = []
+        with rbs_oracle_common.RbsOracleStateLock(self.store):
+            self.reconcile()
+            oldest = time.time() - self.parameters['max_age_hours'] * 3600
+            for entry in list(self.entries):
+                if entry['status'] != 'WARM' or entry['requested'] > oldest:
+                    continue
+                try:
+                    self.database.live_mount_delete(entry['mount_id'])
+                except Exception as err:
+                    self.logger.warning("Pool {}: the unmount of {} on {} failed: {}".format(self.name, entry['mount_id'], entry['host'], err))
+                    continue
+                self.logger.warning("Pool {}: recycled the mount on {} made {:0.1f} hours ago.".format(
+                    self.name, entry['host'], (time.time() - entry['requested']) / 3600))
+                self.entries.remove(entry)
+                recycled.append(entry)
+            self.store.save()
+        return recycled
+
+    def checkout(self, owner):
+        """
+        Hands out the warm mount with the most recent recovery point.
+
+        Returns:
+            entry (dict): The pool entry of the checked out mount.
+        """
+        with rbs_oracle_common.RbsOracleStateLock(self.store):
+            self.reconcile()
+            warm = [entry for entry in self.entries if entry['status'] == 'WARM']
+            if not warm:
+                self.store.save()
+                self.rubrik.delete_session()
+                pending = len([entry for entry in self.entries if entry['status'] == 'PENDING'])
+                raise RubrikOracleClonePoolError("Pool {} has no warm mounts to check out, {} are pending. Replenish the pool or wait for the pending mounts.".format(self.name, pending))
+            entry = max(warm, key=lambda x: x['recovery_point'])
+            entry['status'] = 'CHECKED_OUT'
+            entry['owner'] = owner
+            entry['checked_out'] = int(time.time())
+            self.store.save()
+        return entry
+
+    def rename(self, entry, new_oracle_name):
+        """
+        Renames a checked out mount with the Oracle NID utility. Must be run on the mount host.
+        """
+        if entry['host'].split('.')[0] != platform.uname()[1].split('.')[0]:
+            self.rubrik.delete_session()
+            raise RubrikOracleClonePoolError("The mount is checked out on {}. The rename must be run on that host, rerun the checkout there or rename it with the Oracle NID utility.".format(entry['host']))
+        oracle_home = self.parameters['oracle_home'] or self.database.get_oracle_db_info()['oracleHome']
+        if not os.path.exists(oracle_home):
+            self.rubrik.delete_session()
+            raise RubrikOracleClonePoolError("The ORACLE_HOME: {} does not exist on this host.".format(oracle_home))
+        self.logger.warning("Renaming the checked out database {} to {}.".format(self.database_name, new_oracle_name))
+        self.database.oracle_db_rename(self.database_name, oracle_home, new_oracle_name)
+        with rbs_oracle_common.RbsOracleStateLock(self.store):
+            for stored in self.entries:
+                if stored.get('request_id') == entry['request_id']:
+                    stored['new_oracle_name'] = new_oracle_name
+            self.store.save()
+
+    def status(self):
+        """
+        Builds a status row for each pool entry.
+
+        Returns:
+            rows (list): [pool, host, status, recovery point, age hours, owner, name] for each entry.
+        """
+        rows = []
+        for entry in self.entries:
+            rows.append([self.name, entry['host'], entry['status'], entry['recovery_point'],
+                         "{:0.1f}".format((time.time() - entry['requested']) / 3600), entry.get('owner') or '',
+                         entry.get('new_oracle_name') or self.database_name])
+        if not rows:
+            rows.append([self.name, '', 'EMPTY', '', '', '', ''])
+        return rows
+
+
+def wait_for_mounts(rubrik, managers, timeout):
+    """
+    Waits on all the pending mount requests of the pools together and brings the pools up to date.
+    """
+    queue = rbs_oracle_common.RubrikRbsOracleAsyncQueue(rubrik)
+    for name, manager in managers.items():
+        for entry in manager.entries:
+            if entry['status'] == 'PENDING':
+                queue.add_request("{}:{}".format(name, entry['host']), {'id': entry['request_id'], 'status': 'PENDING'})
+    if not queue.in_flight:
+        return
+    queue.wait(timeout)
+    for manager in managers.values():
+        manager.refresh()
+
+
+def print_status(managers):
+    rows = []
+    for manager in managers.values():
+        rows.extend(manager.status())
+    print("Clone pool status at {}:".format(datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    print(tabulate(rows, headers=["Pool", "Host", "Status", "Recovery Point", "Age Hours", "Owner", "Database"]))
+
+
+class RubrikOracleClonePoolError(rbs_oracle_common.NoTraceBackWithLineNumber):
+    """
+        Renames object so error is named with calling script
+    """
+    pass
+
+
+if __name__ == "__main__":
+    cli()
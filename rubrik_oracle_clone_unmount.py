@@ -3,8 +3,9 @@ import click
 import logging
 import sys
 import platform
-import pytz
-import datetime
+import time
+import concurrent.futures
+from tabulate import tabulate
 
 
 @click.command()
@@ -13,11 +14,17 @@ import datetime
 @click.option('--new_oracle_name', '-n', required=True, type=str, help='Oracle database clone name. If unmounting more than one separate with commas.')
 @click.option('--oracle_home', '-o', type=str, help='ORACLE_HOME path for the mounted database(s) if different than source database ORACLE_HOME')
 @click.option('--all_mounts', '-a', is_flag=True, help='Unmount all mounts from the source host:db. Provide all the clone names separated by commas.')
+@click.option('--max_concurrent', type=int, default=4, help='The number of clone databases to drop at the same time (default 4)')
+@click.option('--timeout', type=int, default=12, help='Minutes to wait for the unmounts to complete (default 12)')
 @click.option('--debug_level', '-d', type=str, default='WARNING', help='Logging level: DEBUG, INFO, WARNING or CRITICAL.')
-def cli(source_host_db, mounted_host, new_oracle_name, oracle_home, all_mounts, debug_level):
+def cli(source_host_db, mounted_host, new_oracle_name, oracle_home, all_mounts, max_concurrent, timeout, debug_level):
     """
     This will unmount a Rubrik live mount that has had the name changed after the live mount
      using the the live mount host:Original DB Name, new Oracle DB name and the ORACLE_HOME
+
+\b
+    With --all_mounts all the unmount requests are issued at once and waited on together, then the clone databases
+    are dropped max_concurrent at a time, each in its own sqlplus session.
     """
     numeric_level = getattr(logging, debug_level.upper(), None)
     if not isinstance(numeric_level, int):
@@ -45,51 +52,59 @@ def cli(source_host_db, mounted_host, new_oracle_name, oracle_home, all_mounts,
         source_db_info = mount.get_oracle_db_info()
         oracle_home = source_db_info['oracleHome']
     force = True
-    cluster_timezone = pytz.timezone(rubrik.timezone)
-    utc = pytz.utc
-    fmt = '%Y-%m-%d %H:%M:%S %Z'
     if not live_mount_ids:
         raise RubrikOracleCloneUnmountError("No live mounts found for {} live mounted on {}. ".format(source_host_db[1], mounted_host))
-    elif len(live_mount_ids) == 0:
-        raise RubrikOracleCloneUnmountError(
-            "No live mounts found for {} live mounted on {}. ".format(source_host_db[1], source_host_db[0]))
     elif len(live_mount_ids) == 1:
         logger.warning("Found live mount id: {} on {}".format(live_mount_ids[0], mounted_host))
-        logger.warning("Deleting live mount.")
-        delete_request = mount.live_mount_delete(live_mount_ids[0], force)
-        delete_request = mount.async_requests_wait(delete_request['id'], 12)
-        logger.warning("Async request completed with status: {}".format(delete_request['status']))
-        logger.debug(delete_request)
-        if delete_request['status'] != "SUCCEEDED":
-            logger.warning("Unmount of backup files failed with status: {}".format(delete_request['status']))
-        else:
-            logger.warning("Live mount of backup data files with id: {} has been unmounted.".format(live_mount_ids[0]))
-        mount.oracle_db_clone_cleanup(new_oracle_name[0], oracle_home)
-        logger.warning("Clone database {} has been dropped.".format(new_oracle_name[0]))
-        rubrik.delete_session()
-        return
-    elif len(live_mount_ids) > 1 and all_mounts:
+        new_oracle_name = new_oracle_name[:1]
+    elif all_mounts:
         logger.warning("Delete all mounts is set to {}. Deleting all mounts on {}".format(all_mounts, mounted_host))
-        for live_mount_id in live_mount_ids:
-            logger.debug(live_mount_id)
-            logger.warning("Deleting live mount with id: {} on {}".format(live_mount_ids[0], mounted_host))
-            delete_request = mount.live_mount_delete(live_mount_id, force)
-            delete_request = mount.async_requests_wait(delete_request['id'], 12)
-            logger.warning("Async request completed with status: {}".format(delete_request['status']))
-            logger.debug(delete_request)
-            if delete_request['status'] != "SUCCEEDED":
-                logger.warning("Unmount of backup files failed with status: {}".format(delete_request['status']))
-            else:
-                logger.warning("Live mount of backup data files with id: {} has been unmounted.".format(live_mount_id))
-        for name in new_oracle_name:
-            mount.oracle_db_clone_cleanup(name, oracle_home)
-            logger.warning("Clone database {} has been dropped.".format(name))
-        rubrik.delete_session()
-        return
     else:
         raise RubrikOracleCloneUnmountError( "Multiple live mounts found for source database {} live mounted on {}. "
                                             "Use --all_mounts to unmount all or some of the mounts "
                                             .format(source_host_db[1], mounted_host))
+    # All the unmount requests are issued at once and polled together
+    queue = rbs_oracle_common.RubrikRbsOracleAsyncQueue(rubrik, max_in_flight=len(live_mount_ids))
+    for live_mount_id in live_mount_ids:
+        logger.warning("Deleting live mount with id: {} on {}".format(live_mount_id, mounted_host))
+        queue.add(live_mount_id, lambda live_mount_id=live_mount_id: mount.live_mount_delete(live_mount_id, force))
+    queue.wait(timeout)
+    for live_mount_id, result in queue.results.items():
+        logger.debug(result)
+        if result['status'] != "SUCCEEDED":
+            logger.warning("Unmount of live mount {} failed with status: {} {}".format(live_mount_id, result['status'], result.get('error') or ''))
+        else:
+            logger.warning("Live mount of backup data files with id: {} has been unmounted.".format(live_mount_id))
+    # Each drop runs in its own sqlplus session with its own ORACLE_SID
+    logger.warning("Dropping {} clone database(s), {} at a time.".format(len(new_oracle_name), max_concurrent))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_concurrent, len(new_oracle_name)))) as executor:
+        drops = dict(zip(new_oracle_name, executor.map(lambda name: timed_clone_drop(mount, name, oracle_home), new_oracle_name)))
+    for name, drop in drops.items():
+        if drop[0] == 'SUCCEEDED':
+            logger.warning("Clone database {} has been dropped.".format(name))
+        else:
+            logger.warning("Drop of clone database {} failed: {}".format(name, drop[2]))
+    rows = [[row[0], 'unmount'] + row[1:3] + [row[4]] for row in queue.summary()]
+    rows.extend([[name, 'drop'] + drop for name, drop in drops.items()])
+    print(tabulate(rows, headers=["Mount ID / Database", "Step", "Status", "Seconds", "Error"]))
+    rubrik.delete_session()
+    return
+
+
+def timed_clone_drop(mount, oracle_sid, oracle_home):
+    """
+    Drops a clone database and times the drop.
+
+    Returns:
+        result (list): [status, seconds, error]
+    """
+    start = time.time()
+    drop_result, error = mount.rubrik.run_guarded(mount.oracle_db_clone_cleanup, oracle_sid, oracle_home)
+    if error is not None:
+        return ['FAILED', "{:0.0f}".format(time.time() - start), error]
+    if drop_result.errors:
+        return ['FAILED', "{:0.0f}".format(time.time() - start), ", ".join(drop_result.errors)]
+    return ['SUCCEEDED', "{:0.0f}".format(time.time() - start), '']
 
 
 class RubrikOracleCloneUnmountError(rbs_oracle_common.NoTraceBackWithLineNumber):
@@ -5,12 +5,14 @@ import sys
 import datetime
 import pytz
 import base64
-from configparser import ConfigParser
+import functools
+from configparser import ConfigParser, Error as ConfigParserError
+from tabulate import tabulate
 
 
 @click.command()
 @click.option('--source_host_db', '-s', type=str, required=True,  help='The source <host or RAC cluster>:<database>')
-@click.option('--host_target', '-h', type=str, required=True, help='Host or RAC cluster name (RAC target required if source is RAC)  for the Live Mount ')
+@click.option('--host_target', '-h', type=str, help='Host or RAC cluster name (RAC target required if source is RAC)  for the Live Mount. Required unless a manifest is used.')
 @click.option('--time_restore', '-t', type=str, help='Point in time to mount the DB, iso format is YY:MM:DDTHH:MM:SS example 2019-01-01T20:30:15')
 @click.option('--new_name', '-n', type=str, help='Name for cloned database')
 @click.option('--pfile', '-p', type=str, help='Custom Pfile path (on target host)')
@@ -18,10 +20,12 @@ from configparser import ConfigParser
 @click.option('--oracle_home', '-o', type=str, help='ORACLE_HOME on destination host. Required as option or in ACO File if source is a Data Guard Group.')
 @click.option('--wait', is_flag=True, help='Wait for clone to complete. Times out at wait time.')
 @click.option('--wait_time', type=int, default=1800, help='Time for script to wait for clone to complete. Script exits but clone continues at time out.')
+@click.option('--manifest', type=str, help='Clone to every target in this manifest file. Each [section] is a target with host_target and optionally new_name, aco_file_path, pfile and oracle_home')
+@click.option('--max_concurrent', type=int, default=4, help='Manifest: maximum number of clones running at one time (default 4)')
 @click.option('--keyfile', '-k', type=str, required=False,  help='The connection keyfile path')
 @click.option('--insecure', is_flag=True,  help='Flag to use insecure connection')
 @click.option('--debug_level', '-d', type=str, default='WARNING', help='Logging level: DEBUG, INFO, WARNING, ERROR or CRITICAL.')
-def cli(source_host_db, host_target, time_restore, new_name, pfile, aco_file_path, oracle_home, wait, wait_time, keyfile, insecure, debug_level):
+def cli(source_host_db, host_target, time_restore, new_name, pfile, aco_file_path, oracle_home, wait, wait_time, manifest, max_concurrent, keyfile, insecure, debug_level):
     """Clones an Oracle Database (alternate host restore or duplicate).
 
      Initiates an Oracle DB clone using the Rubrik RBS automated clone. This can be run on any host since clone will
@@ -36,6 +40,17 @@ def cli(source_host_db, host_target, time_restore, new_name, pfile, aco_file_pat
     initiate the clone and exit unless --wait is specified. Then the script will monitor the async request for the
     wait time (default 30 min.)
 
+    To clone the same recovery point to many targets use a manifest. The source and the recovery point are resolved
+    once, the clones are submitted with no more than max_concurrent running at one time and all of them are waited on
+    together for the wait time. Each section of the manifest is one target:
+
+   \b
+   [dev1]
+   host_target = devhost1
+   new_name = DEV1
+   aco_file_path = /home/oracle/dev1.aco
+   oracle_home = /u01/app/oracle/product/19.0.0/dbhome_1
+
     \b
     Returns:
       db_clone_info (json); JSON text file with the Rubrik cluster response to the database clone request
@@ -52,11 +67,28 @@ def cli(source_host_db, host_target, time_restore, new_name, pfile, aco_file_pat
     ch.setFormatter(console_formatter)
     logger.addHandler(ch)
 
+    if not (host_target or manifest):
+        raise RubrikOracleDBCloneError("A host target or a manifest of targets is required.")
     rubrik = rbs_oracle_common.RubrikConnection(keyfile, insecure)
     source_host_db = source_host_db.split(":")
     database = rbs_oracle_common.RubrikRbsOracleDatabase(rubrik, source_host_db[1], source_host_db[0])
     oracle_db_info = database.get_oracle_db_info()
     logger.debug(oracle_db_info)
+    if time_restore:
+        time_ms = database.epoch_time(time_restore, rubrik.timezone)
+        logger.warning("Using {} for mount.". format(time_restore))
+    else:
+        logger.warning("Using most recent recovery point for mount.")
+        time_ms = database.epoch_time(oracle_db_info['latestRecoveryPoint'], rubrik.timezone)
+    if manifest:
+        results = fan_out_clone(rubrik, database, oracle_db_info, time_ms, manifest, max_concurrent, wait_time)
+        rubrik.delete_session()
+        failures = [name for name, result in results.items() if result['status'] != 'SUCCEEDED']
+        if failures:
+            raise RubrikOracleDBCloneError("{} of {} clones did not complete successfully: {}".format(
+                len(failures), len(results), ", ".join(failures)))
+        logger.warning("All {} clones of the database have completed.".format(len(results)))
+        return results
     # If source DB is RAC then the target for the live mount must be a RAC cluster
     host_id = None
     if 'racName' in oracle_db_info.keys():
@@ -64,31 +96,11 @@ def cli(source_host_db, host_target, time_restore, new_name, pfile, aco_file_pat
             host_id = database.get_rac_id(rubrik.cluster_id, host_target)
     else:
         host_id = database.get_host_id(rubrik.cluster_id, host_target)
-    if time_restore:
-        time_ms = database.epoch_time(time_restore, rubrik.timezone)
-        logger.warning("Using {} for mount.". format(time_restore))
-    else:
-        logger.warning("Using most recent recovery point for mount.")
-        time_ms = database.epoch_time(oracle_db_info['latestRecoveryPoint'], rubrik.timezone)
-    aco_config = None
-    aco_parameters = None
-    base64_aco_file = None
-    if aco_file_path:
-        logger.warning("Using ACO File: {}".format(aco_file_path))
-        aco_config = ConfigParser()
-        with open(aco_file_path) as f:
-            aco_config.read_string('[ACO]' + f.read())
-        logger.debug("ACO Config: {0}".format(aco_config.items('ACO')))
-        aco_parameters = aco_config.items('ACO')
-    if pfile:
-        logger.warning("Using custom PFILE File: {}.".format(pfile))
-        if aco_parameters:
-            logger.debug("ACO Parameters: {0}".format(aco_parameters))
-            for config in aco_parameters:
-                if config[0].upper() != 'ORACLE_HOME' and config[0].upper() != 'SPFILE_LOCATION':
-                    rubrik.delete_session()
-                    raise RubrikOracleDBCloneError("When using a custom PFILE the only parameters allowed in the ACO "
-                                                   "file are ORACLE_HOME and SPFILE_LOCATION.")
+    try:
+        aco_parameters = read_aco_parameters(aco_file_path, pfile)
+    except (ValueError, OSError, ConfigParserError) as err:
+        rubrik.delete_session()
+        raise RubrikOracleDBCloneError(str(err))
     if new_name:
         logger.debug("Using new_name: {0}".format(new_name))
         target_name = new_name
@@ -119,6 +131,89 @@ def cli(source_host_db, host_target, time_restore, new_name, pfile, aco_file_pat
         return db_clone_info
 
 
+def read_aco_parameters(aco_file_path, pfile):
+    """
+    Reads the ACO file parameters and checks that they can be used with a custom pfile.
+
+    Returns:
+        aco_parameters (list): The ACO parameters or None if there is no ACO file.
+    Raises:
+        ValueError: The ACO file has parameters that can not be used with a custom pfile. The caller reports it, as
+            the script errors exit on creation and would end a manifest run.
+    """
+    logger = logging.getLogger(__name__)
+    aco_parameters = None
+    if aco_file_path:
+        logger.warning("Using ACO File: {}".format(aco_file_path))
+        aco_config = ConfigParser()
+        with open(aco_file_path) as f:
+            aco_config.read_string('[ACO]\n' + f.read())
+        logger.debug("ACO Config: {0}".format(aco_config.items('ACO')))
+        aco_parameters = aco_config.items('ACO')
+    if pfile:
+        logger.warning("Using custom PFILE File: {}.".format(pfile))
+        if aco_parameters:
+            logger.debug("ACO Parameters: {0}".format(aco_parameters))
+            for config in aco_parameters:
+                if config[0].upper() != 'ORACLE_HOME' and config[0].upper() != 'SPFILE_LOCATION':
+                    raise ValueError("When using a custom PFILE the only parameters allowed in the ACO "
+                                     "file are ORACLE_HOME and SPFILE_LOCATION.")
+    return aco_parameters
+
+
+def fan_out_clone(rubrik, database, oracle_db_info, time_ms, manifest, max_concurrent, wait_time):
+    """
+    Clones one recovery point to every target in the manifest and waits on all the clones together.
+
+    Returns:
+        results (dict): Manifest section to the result of the clone request.
+    """
+    logger = logging.getLogger(__name__)
+    manifest_config = ConfigParser()
+    with open(manifest) as f:
+        manifest_config.read_file(f)
+    results = {}
+    targets = {}
+    clone_names = {}
+    for section in manifest_config.sections():
+        target = dict(manifest_config.items(section))
+        try:
+            if not target.get('host_target'):
+                raise ValueError("host_target is required.")
+            target['aco_parameters'] = read_aco_parameters(target.get('aco_file_path'), target.get('pfile'))
+        except (ValueError, OSError, ConfigParserError) as err:
+            results[section] = {'status': 'INVALID', 'error': str(err)}
+            continue
+        clone_name = (target['host_target'], (target.get('new_name') or database.database_name).upper())
+        if clone_name in clone_names:
+            results[section] = {'status': 'INVALID', 'error': "Same host and name as {}".format(clone_names[clone_name])}
+            continue
+        clone_names[clone_name] = section
+        targets[section] = target
+    # If source DB is RAC then the targets for the clone must be RAC clusters
+    fleet = rbs_oracle_common.RubrikRbsOracleFleet(rubrik)
+    target_ids, target_failures = fleet.resolve_targets(
+        list(dict.fromkeys(target['host_target'] for target in targets.values())), bool(oracle_db_info.get('racName')))
+    queue = rbs_oracle_common.RubrikRbsOracleAsyncQueue(rubrik, max_concurrent)
+    for section, target in targets.items():
+        if target['host_target'] in target_failures:
+            results[section] = {'status': 'NOT_FOUND', 'error': target_failures[target['host_target']]}
+            continue
+        logger.warning("Queuing Clone of {0} to {1} on {2}".format(database.database_name, target.get('new_name') or database.database_name, target['host_target']))
+        # Post the export directly, as db_clone deletes the session on an error and would end the other clones
+        payload = database.db_clone_payload(target_ids[target['host_target']], time_ms, new_name=target.get('new_name'),
+                                            pfile=target.get('pfile'), aco_parameters=target['aco_parameters'],
+                                            oracle_home=target.get('oracle_home'))
+        queue.add(section, functools.partial(rubrik.connection.post, 'internal', '/oracle/db/{}/export'.format(database.oracle_id),
+                                             payload, timeout=queue.cdm_timeout))
+    queue.wait(wait_time / 60)
+    results.update(queue.results)
+    rows = queue.summary()
+    rows.extend([[section, result['status'], '', '', result['error']] for section, result in results.items() if section not in queue.results])
+    print(tabulate(rows, headers=["Target", "Status", "Seconds", "Request ID", "Error"]))
+    return results
+
+
 class RubrikOracleDBCloneError(rbs_oracle_common.NoTraceBackWithLineNumber):
     """
         Renames object so error is named with calling script
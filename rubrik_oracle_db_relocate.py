@@ -0,0 +1,282 @@
+import rbs_oracle_common
+import click
+import logging
+import sys
+import os
+import platform
+import shutil
+import time
+from datetime import datetime
+from tabulate import tabulate
+
+
+@click.command()
+@click.option('--source_host_db', '-s', type=str, required=True,  help='The source <host or RAC cluster>:<database> of the live mount')
+@click.option('--oracle_sid', '-n', type=str, required=True, help='The ORACLE_SID of the live mounted database on this host')
+@click.option('--data_path', '-p', type=str, required=True, help='Local directory for the datafiles, control files, redo logs and temp files')
+@click.option('--oracle_home', '-o', type=str, help='ORACLE_HOME path for the live mounted database if different than the source database ORACLE_HOME')
+@click.option('--parallelism', type=int, default=4, help='The number of RMAN channels copying the datafiles (default 4)')
+@click.option('--section_size', type=int, default=0, help='Copy datafiles larger than this many GB in sections so one large datafile is spread over the channels. Default is whole files')
+@click.option('--offline', is_flag=True, help='Copy the datafiles with the database mounted. Required if the database is in NOARCHIVELOG mode')
+@click.option('--live_mount_id', type=str, help='The id of the live mount to remove if there is more than one live mount of the source database on this host')
+@click.option('--no_unmount', is_flag=True, help='Leave the Rubrik live mount in place after the database has been relocated')
+@click.option('--progress_interval', type=int, default=60, help='Seconds between RMAN copy progress reports (default 60). 0 turns the reports off')
+@click.option('--progress_file', type=str, help='Also append the RMAN copy progress reports to this file as JSON lines')
+@click.option('--resume', is_flag=True, help='Resume a failed relocation from the step that failed')
+@click.option('--log_path', '-l', type=str, help='Log directory, if not specified no log will be created')
+@click.option('--keyfile', '-k', type=str, required=False,  help='The connection keyfile path')
+@click.option('--insecure', is_flag=True,  help='Flag to use insecure connection')
+@click.option('--debug_level', '-d', type=str, default='WARNING', help='Logging level: DEBUG, INFO, WARNING or CRITICAL.')
+def cli(source_host_db, oracle_sid, data_path, oracle_home, parallelism, section_size, offline, live_mount_id, no_unmount,
+        progress_interval, progress_file, resume, log_path, keyfile, insecure, debug_level):
+    """
+    This will relocate a live mounted database from the Rubrik cluster onto local storage and remove the live mount.
+
+\b
+    The datafiles are copied to the data path with RMAN backup as copy over parallel channels while the database
+    stays open. The database is then restarted once, mounted on control files copied to the data path, switched to
+    the datafile copies, recovered and opened. The outage is the restart and the recovery of the changes made during
+    the copy, not the copy. The redo logs and temp files are then moved to the data path with the database open and
+    the Rubrik live mount is removed. Throughput is reported during the copy and for each step at the end.
+\b
+    The database must be in ARCHIVELOG mode for the copy to run while it is open. With --offline the database is
+    mounted for the whole copy. Rubrik drops the database when a live mount that still has the source database name
+    is removed, so the live mount must have been renamed, for example by rubrik_oracle_db_mount_clone, unless
+    --no_unmount is used. The relocation state is kept in ~/.rubrik_oracle_tools/db_relocate_<oracle_sid>.json and a
+    failed relocation can be rerun with --resume to skip the completed steps.
+\b
+Example:
+rubrik_oracle_db_relocate -s jz-sourcehost-1:ora1db -n devdb -p /u02/oradata/devdb --parallelism 8 -l /home/oracle/logs
+
+    """
+    numeric_level = getattr(logging, debug_level.upper(), None)
+    if not isinstance(numeric_level, int):
+        raise ValueError('Invalid log level: {}'.format(debug_level))
+    logger = logging.getLogger()
+    logger.setLevel(logging.NOTSET)
+    ch = logging.StreamHandler(sys.stdout)
+    ch.setLevel(numeric_level)
+    console_formatter = logging.Formatter('%(asctime)s: %(message)s')
+    ch.setFormatter(console_formatter)
+    logger.addHandler(ch)
+
+    if log_path:
+        os.makedirs(log_path, exist_ok=True)
+        logfile = os.path.join(log_path, "{}_Relocate_{}.log".format(oracle_sid, datetime.now().strftime("%Y%m%d-%H%M%S")))
+        fh = logging.FileHandler(logfile, mode='a' if resume else 'w')
+        fh.setLevel(logging.DEBUG)
+        file_formatter = logging.Formatter('%(asctime)s:%(name)s:%(levelname)s: %(message)s')
+        fh.setFormatter(file_formatter)
+        logger.addHandler(fh)
+
+    source_host_db = source_host_db.split(":")
+    host_target = platform.uname()[1].split('.')[0]
+    if oracle_sid == source_host_db[1] and not no_unmount:
+        raise RubrikOracleDBRelocateError("The live mount of {} still has the source database name and Rubrik drops it when the live mount is removed. Rename it first or use --no_unmount.".format(oracle_sid))
+    data_path = os.path.abspath(data_path)
+    os.makedirs(data_path, exist_ok=True)
+
+    rubrik = rbs_oracle_common.RubrikConnection(keyfile, insecure)
+    mount = rbs_oracle_common.RubrikRbsOracleMount(rubrik, source_host_db[1], source_host_db[0], host_target)
+    if not oracle_home:
+        oracle_home = mount.get_oracle_db_info()['oracleHome']
+    if not os.path.exists(oracle_home):
+        rubrik.delete_session()
+        raise RubrikOracleDBRelocateError("The ORACLE_HOME: {} does not exist on this host: {}".format(oracle_home, host_target))
+    checkpoint = rbs_oracle_common.RbsOracleCloneCheckpoint('db_relocate', oracle_sid, resume)
+    if resume and not checkpoint.resumed:
+        rubrik.delete_session()
+        raise RubrikOracleDBRelocateError("There is no saved state in {} for a relocation of {} to resume.".format(checkpoint.path, oracle_sid))
+    if checkpoint.resumed:
+        logger.warning("Resuming the relocation of {}. Completed steps: {}.".format(oracle_sid, ", ".join(checkpoint.get('completed_steps'))))
+
+    def is_local(file_name):
+        return os.path.abspath(file_name).startswith(data_path + os.sep)
+
+    sqlplus = rbs_oracle_common.RbsOracleSqlplusSession(oracle_home, oracle_sid)
+    rows, sql_return = sqlplus.query(['log_mode', 'open_mode'], 'v$database')
+    if not rows:
+        rubrik.delete_session()
+        raise RubrikOracleDBRelocateError("Unable to query the database {} on this host: {}".format(oracle_sid, ", ".join(sql_return.errors)))
+    log_mode, open_mode = rows[0]
+    logger.info("Database {} is {} in {} mode.".format(oracle_sid, open_mode.lower(), log_mode))
+
+    if not checkpoint.done('copy'):
+        if log_mode != 'ARCHIVELOG' and not offline:
+            rubrik.delete_session()
+            raise RubrikOracleDBRelocateError("The database {} is in {} mode. The datafiles can only be copied while it is open in ARCHIVELOG mode. Use --offline to copy them with the database mounted.".format(oracle_sid, log_mode))
+        rows, sql_return = sqlplus.query(['file#', 'name', 'bytes'], 'v$datafile')
+        datafiles = [(int(file_number), name, int(file_bytes)) for file_number, name, file_bytes in rows if not is_local(name)]
+        if datafiles:
+            copy_bytes = sum(file_bytes for file_number, name, file_bytes in datafiles)
+            if offline and open_mode != 'MOUNTED':
+                logger.warning("Mounting {} for the offline copy.".format(oracle_sid))
+                sqlplus.run("shutdown immediate;")
+                sqlplus.run("startup mount;")
+            logger.warning("Copying {} datafiles ({:0.1f} GB) to {} over {} channels.".format(len(datafiles), copy_bytes / 1024 ** 3, data_path, parallelism))
+            copy_commands = "run { "
+            copy_commands = copy_commands + "".join("allocate channel cp{} device type disk; ".format(channel + 1) for channel in range(parallelism))
+            copy_commands = copy_commands + "backup as copy "
+            if section_size:
+                copy_commands = copy_commands + "section size {}G ".format(section_size)
+            copy_commands = copy_commands + "datafile {} format '{}'; }}".format(",".join(str(file_number) for file_number, name, file_bytes in datafiles), os.path.join(data_path, '%U'))
+            with rbs_oracle_common.RbsOracleRmanSession(oracle_home, oracle_sid) as rman, \
+                    rbs_oracle_common.RmanProgressMonitor(oracle_home, oracle_sid, progress_interval, progress_file):
+                copy_result = rman.run(copy_commands)
+            if copy_result.rman_failed():
+                rubrik.delete_session()
+                raise RubrikOracleDBRelocateError("The copy of the datafiles of {} failed with {}. Rerun with --resume to copy them again.".format(oracle_sid, ", ".join(copy_result.errors)))
+            logger.warning("Copied {:0.1f} GB in {:0.0f} seconds ({:0.1f} MB/s).".format(
+                copy_bytes / 1024 ** 3, copy_result.seconds, copy_bytes / 1024 ** 2 / copy_result.seconds if copy_result.seconds else 0))
+            checkpoint.complete('copy', datafiles=[file_number for file_number, name, file_bytes in datafiles], copy_bytes=copy_bytes, copy_seconds=copy_result.seconds)
+        else:
+            logger.warning("All the datafiles are already in {}.".format(data_path))
+            checkpoint.complete('copy', datafiles=[], copy_bytes=0, copy_seconds=0)
+
+    if not checkpoint.done('switch'):
+        start = time.time()
+        rows, sql_return = sqlplus.query(['name'], 'v$controlfile')
+        control_files = [row[0] for row in rows]
+        new_control_files = control_files
+        if [name for name in control_files if not is_local(name)]:
+            rows, sql_return = sqlplus.query(['value'], "v$parameter where name = 'spfile'")
+            if rows and rows[0][0]:
+                new_control_files = [os.path.join(data_path, 'control{:02d}.ctl'.format(index + 1)) for index in range(len(control_files))]
+                sqlplus.run("alter system set control_files = {} scope=spfile;".format(",".join("'{}'".format(name) for name in new_control_files)))
+            else:
+                logger.warning("{} was started without an spfile, the control files are left in place.".format(oracle_sid))
+        if checkpoint.get('datafiles') or new_control_files != control_files:
+            logger.warning("Restarting {} to switch to the local files.".format(oracle_sid))
+            if not offline:
+                sqlplus.run("alter system archive log current;")
+            sqlplus.run("shutdown immediate;")
+            # The control files are multiplexed copies so each new control file is copied from the first
+            for new_name in new_control_files:
+                if new_name not in control_files:
+                    logger.info("Copying control file {} to {}.".format(control_files[0], new_name))
+                    shutil.copyfile(control_files[0], new_name)
+            sql_return = sqlplus.run("startup mount;")
+            if 'ORA-00205' in sql_return.errors:
+                rubrik.delete_session()
+                raise RubrikOracleDBRelocateError("{} did not mount on the new control files {}.".format(oracle_sid, ", ".join(new_control_files)))
+            if checkpoint.get('datafiles'):
+                with rbs_oracle_common.RbsOracleRmanSession(oracle_home, oracle_sid) as rman:
+                    switch_result = rman.run("switch datafile {} to copy;".format(",".join(str(file_number) for file_number in checkpoint.get('datafiles'))))
+                    if switch_result.rman_failed():
+                        rubrik.delete_session()
+                        raise RubrikOracleDBRelocateError("The switch of {} to the datafile copies failed with {}. Rerun with --resume to retry it.".format(oracle_sid, ", ".join(switch_result.errors)))
+                    if not offline:
+                        logger.warning("Recovering the changes made during the copy.")
+                        recover_result = rman.run("recover database;")
+                        if recover_result.rman_failed():
+                            rubrik.delete_session()
+                            raise RubrikOracleDBRelocateError("The recovery of {} failed with {}. Rerun with --resume to retry it.".format(oracle_sid, ", ".join(recover_result.errors)))
+            sql_return = sqlplus.run("alter database open;")
+            if sql_return.errors:
+                rubrik.delete_session()
+                raise RubrikOracleDBRelocateError("{} did not open on the local files: {}".format(oracle_sid, ", ".join(sql_return.errors)))
+            logger.warning("{} is open on the local datafiles after a {:0.0f} second restart.".format(oracle_sid, time.time() - start))
+        checkpoint.complete('switch', switch_seconds=time.time() - start)
+
+    if not checkpoint.done('redo'):
+        start = time.time()
+        rows, sql_return = sqlplus.query(['l.group#', 'l.thread#', 'l.bytes', 'f.member'], 'v$log l, v$logfile f where l.group# = f.group#')
+        groups = {}
+        for group, thread, group_bytes, member in rows:
+            groups.setdefault(int(group), {'thread': int(thread), 'bytes': int(group_bytes), 'members': []})['members'].append(member)
+        old_groups = [group for group, log in groups.items() if [member for member in log['members'] if not is_local(member)]]
+        next_group = max(groups.keys() or [0]) + 1
+        if old_groups:
+            logger.warning("Moving {} redo log groups to {}.".format(len(old_groups), data_path))
+        for group in old_groups:
+            new_member = os.path.join(data_path, 'redo{:02d}.log'.format(next_group))
+            sqlplus.run("alter database add logfile thread {} group {} ('{}') size {};".format(groups[group]['thread'], next_group, new_member, groups[group]['bytes']))
+            next_group += 1
+        # A group can only be dropped once it is no longer needed for crash recovery
+        attempts = 0
+        while old_groups and attempts < len(old_groups) * 4 + 10:
+            attempts += 1
+            rows, sql_return = sqlplus.query(['group#', 'status'], 'v$log', quiet=True)
+            status = {int(group): group_status for group, group_status in rows}
+            for group in list(old_groups):
+                if status.get(group) == 'CURRENT':
+                    sqlplus.run("alter system switch logfile;", quiet=True)
+                elif status.get(group) == 'ACTIVE':
+                    sqlplus.run("alter system checkpoint;", quiet=True)
+                else:
+                    sql_return = sqlplus.run("alter database drop logfile group {};".format(group))
+                    if not sql_return.errors:
+                        old_groups.remove(group)
+        if old_groups:
+            rubrik.delete_session()
+            raise RubrikOracleDBRelocateError("The redo log groups {} could not be dropped. Rerun with --resume to retry.".format(", ".join(str(group) for group in old_groups)))
+        checkpoint.complete('redo', redo_seconds=time.time() - start)
+
+    if not checkpoint.done('temp'):
+        start = time.time()
+        rows, sql_return = sqlplus.query(['file_name', 'bytes', 'tablespace_name'], 'dba_temp_files')
+        for index, (file_name, file_bytes, tablespace_name) in enumerate(rows):
+            if is_local(file_name):
+                continue
+            new_file = os.path.join(data_path, '{}_{:02d}.tmp'.format(tablespace_name.lower(), index + 1))
+            logger.warning("Moving temp file {} to {}.".format(file_name, new_file))
+            sqlplus.run("alter tablespace {} add tempfile '{}' size {} autoextend on;".format(tablespace_name, new_file, file_bytes))
+            sqlplus.run("alter database tempfile '{}' offline;".format(file_name))
+            sql_return = sqlplus.run("alter database tempfile '{}' drop including datafiles;".format(file_name))
+            if sql_return.errors:
+                rubrik.delete_session()
+                raise RubrikOracleDBRelocateError("The temp file {} is in use and could not be dropped: {}. Rerun with --resume once the sorts using it complete.".format(file_name, ", ".join(sql_return.errors)))
+        checkpoint.complete('temp', temp_seconds=time.time() - start)
+
+    if not checkpoint.done('unmount') and not no_unmount:
+        start = time.time()
+        remaining = []
+        for columns, source in [(['name'], 'v$datafile'), (['name'], 'v$tempfile'), (['member'], 'v$logfile'), (['name'], 'v$controlfile')]:
+            rows, sql_return = sqlplus.query(columns, source)
+            remaining.extend([row[0] for row in rows if not is_local(row[0])])
+        if remaining:
+            rubrik.delete_session()
+            raise RubrikOracleDBRelocateError("The database still uses files outside {}: {}. The live mount was not removed.".format(data_path, ", ".join(remaining)))
+        if not live_mount_id:
+            live_mount_ids = mount.get_oracle_live_mount_id()
+            if len(live_mount_ids) != 1:
+                rubrik.delete_session()
+                raise RubrikOracleDBRelocateError("Found {} live mounts of {} on {}: {}. Use --live_mount_id to choose the one to remove.".format(
+                    len(live_mount_ids), source_host_db[1], host_target, ", ".join(live_mount_ids)))
+            live_mount_id = live_mount_ids[0]
+        logger.warning("Removing the live mount {}.".format(live_mount_id))
+        delete_request = mount.live_mount_delete(live_mount_id, True)
+        delete_request = mount.async_requests_wait(delete_request['id'], 12)
+        logger.warning("Async request completed with status: {}".format(delete_request['status']))
+        if delete_request['status'] != "SUCCEEDED":
+            rubrik.delete_session()
+            raise RubrikOracleDBRelocateError("Removal of the live mount {} failed with status {}. Rerun with --resume to retry it.".format(live_mount_id, delete_request['status']))
+        with rbs_oracle_common.RbsOracleRmanSession(oracle_home, oracle_sid) as rman:
+            rman.run("crosscheck copy; delete noprompt expired copy;")
+        checkpoint.complete('unmount', unmount_seconds=time.time() - start)
+    sqlplus.close()
+
+    copy_bytes = checkpoint.get('copy_bytes', 0)
+    rows = []
+    for step in ['copy', 'switch', 'redo', 'temp', 'unmount']:
+        seconds = checkpoint.get('{}_seconds'.format(step))
+        if seconds is None:
+            continue
+        throughput = "{:0.1f}".format(copy_bytes / 1024 ** 2 / seconds) if step == 'copy' and seconds else ''
+        rows.append([step, "{:0.0f}".format(seconds), "{:0.1f}".format(copy_bytes / 1024 ** 3) if step == 'copy' else '', throughput])
+    print(tabulate(rows, headers=["Step", "Seconds", "GB", "MB/s"]))
+    checkpoint.finish()
+    logger.warning("Relocation of {} to {} complete.".format(oracle_sid, data_path))
+    rubrik.delete_session()
+    return
+
+
+class RubrikOracleDBRelocateError(rbs_oracle_common.NoTraceBackWithLineNumber):
+    """
+        Renames object so error is named with calling script
+    """
+    pass
+
+
+if __name__ == "__main__":
+    cli()
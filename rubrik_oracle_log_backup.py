@@ -4,18 +4,38 @@ import logging
 import sys
 import datetime
 import pytz
+import time
+import concurrent.futures
+from tabulate import tabulate
 
 
 @click.command()
-@click.option('--source_host_db', '-s', type=str, required=True,  help='The source <host or RAC cluster>:<database>')
+@click.option('--source_host_db', '-s', type=str, multiple=True, help='The source <host or RAC cluster>:<database>. Repeat or separate with commas to schedule more than one')
 @click.option('--wait', is_flag=True, help='Wait for backup to complete.')
+@click.option('--schedule', is_flag=True, help='Run as a scheduler that staggers the log backups of many databases. Runs until interrupted or the run time is reached')
+@click.option('--source_file', type=str, help='Scheduler: schedule the <host or RAC cluster>:<database> pairs in this file, one per line')
+@click.option('--select_sla', type=str, help='Scheduler: schedule all the databases protected by this SLA Domain')
+@click.option('--select_host', type=str, help='Scheduler: schedule all the databases on this host')
+@click.option('--select_rac', type=str, help='Scheduler: schedule all the databases on this RAC cluster')
+@click.option('--max_in_flight', type=int, default=5, help='Scheduler: maximum number of log backups running at one time on the cluster (default 5)')
+@click.option('--window', type=int, help='Scheduler: minutes over which to spread the log backups (default is the shortest log backup frequency)')
+@click.option('--refresh_interval', type=int, default=60, help='Scheduler: minutes between reloading the databases and their log backup frequencies (default 60)')
+@click.option('--run_time', type=int, default=0, help='Scheduler: minutes to run before exiting, 0 runs until interrupted (default 0)')
 @click.option('--keyfile', '-k', type=str, required=False,  help='The connection keyfile path')
 @click.option('--insecure', is_flag=True,  help='Flag to use insecure connection')
 @click.option('--debug_level', '-d', type=str, default='WARNING', help='Logging level: DEBUG, INFO, WARNING, ERROR or CRITICAL.')
-def cli(source_host_db, wait, keyfile, insecure, debug_level):
+def cli(source_host_db, wait, schedule, source_file, select_sla, select_host, select_rac, max_in_flight, window,
+        refresh_interval, run_time, keyfile, insecure, debug_level):
     """
     This will initiate an on demand archive log backup of the database.
 
+\b
+    With --schedule this runs as a long lived log backup scheduler for many databases using one connection. Each
+    database's log backup frequency and last log backup time are read from the Rubrik CDM and the log backups are
+    spread evenly over the window so they do not all start at the same time. A database is skipped when its last
+    log backup from the scheduler is still running and no more than max_in_flight log backups are run at one time.
+    If no databases or selectors are supplied all the databases with a log backup frequency are scheduled.
+
 \b
     Returns:
         log_backup_info (dict): The information about the snapshot returned from the Rubrik CDM.
@@ -31,8 +51,18 @@ def cli(source_host_db, wait, keyfile, insecure, debug_level):
     ch.setFormatter(console_formatter)
     logger.addHandler(ch)
 
+    if schedule:
+        rubrik = rbs_oracle_common.RubrikConnection(keyfile, insecure)
+        try:
+            schedule_log_backups(rubrik, source_host_db, source_file, select_sla, select_host, select_rac,
+                                 max_in_flight, window, refresh_interval, run_time)
+        finally:
+            rubrik.delete_session()
+        return
+    if len(source_host_db) != 1 or ',' in source_host_db[0]:
+        raise RubrikOracleLogBackupError("One source database is required unless the scheduler (--schedule) is used.")
     rubrik = rbs_oracle_common.RubrikConnection(keyfile, insecure)
-    source_host_db = source_host_db.split(":")
+    source_host_db = source_host_db[0].split(":")
     database = rbs_oracle_common.RubrikRbsOracleDatabase(rubrik, source_host_db[1], source_host_db[0])
     oracle_log_backup_info = database.oracle_log_backup()
     logging.debug(oracle_log_backup_info)
@@ -56,6 +86,117 @@ def cli(source_host_db, wait, keyfile, insecure, debug_level):
     return oracle_log_backup_info
 
 
+def schedule_log_backups(rubrik, source_host_db, source_file, select_sla, select_host, select_rac, max_in_flight,
+                         window, refresh_interval, run_time, poll_interval=10):
+    """
+    Runs staggered on demand log backups for many databases until interrupted or the run time is reached.
+    """
+    logger = logging.getLogger(__name__)
+    queue = rbs_oracle_common.RubrikRbsOracleAsyncQueue(rubrik, max_in_flight)
+    schedule = {}
+    counts = {}
+    start_time = time.time()
+    next_refresh = start_time
+    try:
+        while not run_time or time.time() < start_time + (run_time * 60):
+            if time.time() >= next_refresh:
+                refreshed = {name: dict(entry) for name, entry in schedule.items()}
+                _, error = rubrik.run_guarded(load_schedule, rubrik, refreshed, source_host_db, source_file, select_sla,
+                                              select_host, select_rac, window)
+                if error is None:
+                    schedule = refreshed
+                else:
+                    logger.warning("Refresh of the log backup schedule failed, keeping the current schedule until the next refresh: {}".format(error))
+                next_refresh = time.time() + (refresh_interval * 60)
+            now = time.time()
+            queued = [name for name, submit in queue.pending]
+            for name, entry in schedule.items():
+                if entry['next_run'] > now:
+                    continue
+                counts.setdefault(name, {'submitted': 0, 'succeeded': 0, 'failed': 0, 'skipped': 0})
+                if name in queue.in_flight or name in queued:
+                    logger.warning("Log backup of {} is still in flight, skipping this run.".format(name))
+                    counts[name]['skipped'] += 1
+                else:
+                    queue.add(name, entry['database'].oracle_log_backup)
+                    counts[name]['submitted'] += 1
+                while entry['next_run'] <= now:
+                    entry['next_run'] += entry['frequency'] * 60
+            _, error = rubrik.run_guarded(queue.submit_ready)
+            time.sleep(poll_interval)
+            if error is None:
+                _, error = rubrik.run_guarded(queue.poll)
+            if error is not None:
+                logger.warning("Polling the log backups failed, retrying on the next pass: {}".format(error))
+            for name, result in queue.results.items():
+                if result['status'] == 'SUCCEEDED':
+                    counts[name]['succeeded'] += 1
+                    logger.warning("Log backup of {} completed in {:0.0f} seconds.".format(name, result['completed'] - result['submitted']))
+                else:
+                    counts[name]['failed'] += 1
+                    logger.warning("Log backup of {} ended with status {}. {}".format(name, result['status'], result.get('error', '')))
+            queue.results = {}
+    except KeyboardInterrupt:
+        logger.warning("Scheduler interrupted. {} log backups are still in flight.".format(len(queue.in_flight)))
+    print(tabulate([[name, count['submitted'], count['succeeded'], count['failed'], count['skipped']] for name, count in sorted(counts.items())],
+                   headers=["Host:Database", "Submitted", "Succeeded", "Failed", "Skipped"]))
+    return counts
+
+
+def load_schedule(rubrik, schedule, source_host_db, source_file, select_sla, select_host, select_rac, window):
+    """
+    Reads the log backup frequency and last log backup time of each database and gives any new database a start
+    time in the window so the log backups are evenly spread. Databases that are no longer selected are removed.
+    """
+    logger = logging.getLogger(__name__)
+    fleet = rbs_oracle_common.RubrikRbsOracleFleet(rubrik)
+    host_db_list = fleet.read_host_db_list(source_host_db, source_file)
+    if select_sla or select_host or select_rac or not host_db_list:
+        host_db_list.extend(fleet.select(select_sla, select_host, select_rac))
+    databases, failures = fleet.resolve(host_db_list)
+    for name, reason in failures.items():
+        logger.warning("Not scheduling {}: {}".format(name, reason))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+        oracle_db_details = dict(zip(databases.keys(), executor.map(
+            lambda database: rubrik.connection.get(fleet.v6_deprecated, '/oracle/db/{}'.format(database.oracle_id), timeout=fleet.cdm_timeout),
+            databases.values())))
+    for name in list(schedule.keys()):
+        if name not in databases:
+            logger.warning("{} is no longer selected and has been removed from the schedule.".format(name))
+            del schedule[name]
+    new_entries = []
+    for name, database in databases.items():
+        frequency = oracle_db_details[name].get('logBackupFrequencyInMinutes')
+        if not frequency:
+            logger.info("{} has no log backup frequency and will not be scheduled.".format(name))
+            schedule.pop(name, None)
+            continue
+        if 'latestRecoveryPoint' in oracle_db_details[name].keys():
+            last_log_backup = database.epoch_time(oracle_db_details[name]['latestRecoveryPoint'], rubrik.timezone) / 1000
+        else:
+            last_log_backup = 0
+        if name in schedule:
+            schedule[name]['frequency'] = frequency
+        else:
+            schedule[name] = {'database': database, 'frequency': frequency, 'last_log_backup': last_log_backup}
+            new_entries.append(name)
+    if not new_entries:
+        return schedule
+    # Most overdue first, each new database gets its own slot in the window
+    new_entries.sort(key=lambda name: schedule[name]['last_log_backup'] + (schedule[name]['frequency'] * 60))
+    spread = (window or min(schedule[name]['frequency'] for name in schedule)) * 60
+    now = time.time()
+    for slot, name in enumerate(new_entries):
+        entry = schedule[name]
+        entry['next_run'] = now + (slot * spread / len(new_entries))
+        # Skip a cycle if the database had a log backup less than half its frequency before its slot
+        if entry['next_run'] - entry['last_log_backup'] < (entry['frequency'] * 30):
+            entry['next_run'] += entry['frequency'] * 60
+        logger.warning("Scheduled {} every {} minutes, first log backup at {}.".format(
+            name, entry['frequency'], datetime.datetime.fromtimestamp(entry['next_run']).strftime('%Y-%m-%d %H:%M:%S')))
+    return schedule
+
+
 class RubrikOracleLogBackupError(rbs_oracle_common.NoTraceBackWithLineNumber):
     """
         Renames object so error is named with calling script
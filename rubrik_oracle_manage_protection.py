@@ -6,17 +6,25 @@ import sys
 from datetime import datetime
 import pytz
 import operator
+import concurrent.futures
+from tabulate import tabulate
 
 
 @click.command()
-@click.option('--source_host_db', '-s', type=str, required=True,  help='The source <host or RAC cluster>:<database>')
+@click.option('--source_host_db', '-s', type=str, multiple=True, help='The source <host or RAC cluster>:<database>. Repeat or separate with commas for bulk mode')
+@click.option('--source_file', type=str, help='Bulk mode: the <host or RAC cluster>:<database> pairs in this file, one per line')
+@click.option('--select_sla', type=str, help='Bulk mode: all the databases protected by this SLA Domain')
+@click.option('--select_host', type=str, help='Bulk mode: all the databases on this host')
+@click.option('--select_rac', type=str, help='Bulk mode: all the databases on this RAC cluster')
 @click.option('--inherit', '-i', is_flag=True, help='Inherit the SLA from the parent object')
 @click.option('--action', '-a', required=True, type=click.Choice(['pause', 'resume'], case_sensitive=False))
 @click.option('--wait', is_flag=True, help='Wait for backup to complete.')
+@click.option('--timeout', type=int, default=15, help='Bulk mode: minutes to wait for all the SLA Domain changes (default 15)')
 @click.option('--keyfile', '-k', type=str, required=False,  help='The connection keyfile path')
 @click.option('--insecure', is_flag=True,  help='Flag to use insecure connection')
 @click.option('--debug_level', '-d', type=str, default='WARNING', help='Logging level: DEBUG, INFO, WARNING, ERROR or CRITICAL.')
-def cli(source_host_db, inherit, action, wait, keyfile, insecure, debug_level):
+def cli(source_host_db, source_file, select_sla, select_host, select_rac, inherit, action, wait, timeout, keyfile,
+        insecure, debug_level):
     """    This will pause or resume database backups by managing the protection.
 
 \b
@@ -25,6 +33,11 @@ Resume will restore the last SLA Domain Policy applied (at the last snapshot). I
  iherited from the parent object (host/cluster) that can be set using the inherit script parameter (-i) and the
  database will be set to derive it's protection from it's parent. The API Token user must have permissions on the SLA
  Domain Policy to be used. This will only work for Rubrik CDM 7.0 and above.
+\b
+Bulk mode is used when more than one source database is supplied, a file of host:db pairs is supplied or the databases
+ are selected by SLA Domain, host or RAC cluster. The databases are resolved in one pass and grouped by the SLA Domain
+ they are set to, one SLA Domain assignment is made for each group and all the SLA Domain changes are waited on
+ together.
 \b
     """
     numeric_level = getattr(logging, debug_level.upper(), None)
@@ -38,8 +51,18 @@ Resume will restore the last SLA Domain Policy applied (at the last snapshot). I
     ch.setFormatter(console_formatter)
     logger.addHandler(ch)
 
+    if not (source_host_db or source_file or select_sla or select_host or select_rac):
+        raise RubrikOracleManageProtectionError("A source database, a host:db file or a database selector is required.")
     rubrik = rbs_oracle_common.RubrikConnection(keyfile, insecure)
-    source_host_db = source_host_db.split(":")
+    if source_file or select_sla or select_host or select_rac or len(source_host_db) > 1 or ',' in source_host_db[0]:
+        failures = bulk_manage_protection(rubrik, source_host_db, source_file, select_sla, select_host, select_rac,
+                                          inherit, action, wait, timeout)
+        rubrik.delete_session()
+        if failures:
+            raise RubrikOracleManageProtectionError("The protection of {} databases was not changed: {}".format(
+                len(failures), ", ".join(failures.keys())))
+        return
+    source_host_db = source_host_db[0].split(":")
     database = rbs_oracle_common.RubrikRbsOracleDatabase(rubrik, source_host_db[1], source_host_db[0])
     oracle_db_info = database.get_oracle_db_info()
 
@@ -91,6 +114,81 @@ Resume will restore the last SLA Domain Policy applied (at the last snapshot). I
     return
 
 
+def bulk_manage_protection(rubrik, source_host_db, source_file, select_sla, select_host, select_rac, inherit, action,
+                           wait, timeout):
+    """
+    Pauses or resumes the protection of many databases with one SLA Domain assignment for each target SLA Domain.
+
+    Returns:
+        failures (dict): host:db to the reason the protection was not changed.
+    """
+    logger = logging.getLogger(__name__)
+    fleet = rbs_oracle_common.RubrikRbsOracleFleet(rubrik)
+    host_db_list = fleet.read_host_db_list(source_host_db, source_file)
+    if select_sla or select_host or select_rac:
+        host_db_list.extend(fleet.select(select_sla, select_host, select_rac))
+    databases, failures = fleet.resolve(host_db_list)
+    if not databases:
+        rubrik.delete_session()
+        raise RubrikOracleManageProtectionError("No databases were found. {}".format(failures))
+    # Group the databases by the SLA Domain they will be set to
+    sla_groups = {}
+    if action == 'pause':
+        sla_groups['UNPROTECTED'] = ('Unprotected', list(databases.keys()))
+    elif inherit:
+        sla_groups['INHERIT'] = ('inherit', list(databases.keys()))
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+            latest_snaps = dict(zip(databases.keys(), executor.map(latest_policy_snapshot, databases.values())))
+        for name, latest_snap in latest_snaps.items():
+            if not latest_snap:
+                failures[name] = "No SLA Domain Policy snapshot found to resume from"
+                continue
+            logger.debug("{} latest snapshot -> Backup Date: {}   Snapshot ID: {}   SLA: {}".format(
+                name, latest_snap['date'], latest_snap['id'], latest_snap['slaName']))
+            sla_groups.setdefault(latest_snap['slaId'], (latest_snap['slaName'], []))[1].append(name)
+    pending_slas = {}
+    for sla_id, (sla_name, names) in sla_groups.items():
+        logger.warning("Setting {} databases to {}.".format(len(names), sla_name))
+        try:
+            sla_assign_info = fleet.assign_sla(sla_id, [databases[name] for name in names])
+        except Exception as err:
+            for name in names:
+                failures[name] = "SLA Domain assignment to {} failed: {}".format(sla_name, err)
+            continue
+        logger.debug("SLA Domain assign result: {}".format(sla_assign_info))
+        for name in names:
+            pending_slas[name] = (databases[name], sla_name)
+    status = 'Pending'
+    if wait and pending_slas:
+        status = 'Set'
+        changed, not_changed = fleet.async_sla_changes_wait(pending_slas, timeout)
+        for name in not_changed.keys():
+            failures[name] = "Timeout: the effective SLA Domain did not change to {}".format(pending_slas[name][1])
+    summary = [[name, sla_name, status, ''] for name, (database, sla_name) in pending_slas.items() if name not in failures]
+    summary.extend([[name, '', 'Failed', reason] for name, reason in failures.items()])
+    print(tabulate(summary, headers=["Host:Database", "SLA Domain", "Status", "Error"]))
+    return failures
+
+
+def latest_policy_snapshot(database):
+    """
+    Gets the most recent snapshot taken by an SLA Domain Policy (not on demand) for a database.
+
+    Returns:
+        latest_snap (dict): The snapshot or None if there are no SLA Domain Policy snapshots.
+    """
+    try:
+        oracle_snapshot_info = database.rubrik.connection.get('internal', '/oracle/db/{}/snapshot'.format(database.oracle_id), timeout=database.cdm_timeout)
+    except Exception as err:
+        logging.getLogger(__name__).warning("Unable to get the snapshots of {}: {}".format(database.database_name, err))
+        return None
+    oracle_snapshots = [snap for snap in oracle_snapshot_info['data'] if not snap['isOnDemandSnapshot']]
+    if not oracle_snapshots:
+        return None
+    return max(oracle_snapshots, key=lambda x: (datetime.strptime(x['date'].split('.')[0], '%Y-%m-%dT%H:%M:%S')))
+
+
 class RubrikOracleManageProtectionError(rbs_oracle_common.NoTraceBackWithLineNumber):
     """
         Renames object so error is named with calling script
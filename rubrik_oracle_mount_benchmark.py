@@ -0,0 +1,143 @@
+import rbs_oracle_common
+import click
+import logging
+import sys
+import os
+import platform
+import datetime
+from tabulate import tabulate
+
+
+@click.command()
+@click.option('--source_host_db', '-s', type=str, help='The source <host or RAC cluster>:<database> of the backup set to mount')
+@click.option('--mount_path', '-m', type=str, help='The path used to mount the backup files')
+@click.option('--time_restore', '-t', type=str, help='Point in time of the backup set to mount, format is YY:MM:DDTHH:MM:SS example 2019-01-01T20:30:15')
+@click.option('--backup_path', '-b', type=str, help='Read an existing files only mount at this path instead of mounting a backup set')
+@click.option('--max_readers', type=int, default=16, help='The most concurrent readers to measure. Levels are 1, 2, 4 ... up to this (default 16)')
+@click.option('--block_size', type=int, default=8, help='Read size in MB (default 8)')
+@click.option('--direct', is_flag=True, help='Read with O_DIRECT, bypassing the page cache. Default is buffered reads with the pages dropped after each piece')
+@click.option('--level_seconds', type=int, default=20, help='Seconds to read at each level (default 20)')
+@click.option('--sample_files', type=int, default=32, help='The number of backup pieces to read, largest first (default 32)')
+@click.option('--knee_gain', type=int, default=10, help='The knee is the last level that adding readers improves by at least this percent (default 10)')
+@click.option('--unmount', is_flag=True, help='Unmount the backup set when the benchmark is complete')
+@click.option('--no_save', is_flag=True, help='Do not save the result as the mount throughput for the clone tools')
+@click.option('--keyfile', '-k', type=str, required=False,  help='The connection keyfile path')
+@click.option('--insecure', is_flag=True,  help='Flag to use insecure connection')
+@click.option('--debug_level', '-d', type=str, default='WARNING', help='Logging level: DEBUG, INFO, WARNING, ERROR or CRITICAL.')
+def cli(source_host_db, mount_path, time_restore, backup_path, max_readers, block_size, direct, level_seconds, sample_files,
+        knee_gain, unmount, no_save, keyfile, insecure, debug_level):
+    """
+    This will measure the read throughput of a files only mount of a Rubrik Oracle backup set on this host.
+
+\b
+    The backup set of the source database is mounted on the mount path, or an existing mount is read from the backup
+    path. The largest backup pieces are read in large blocks with 1, 2, 4 ... up to max_readers concurrent readers
+    for level_seconds at each level. The MB/s of each level and the knee of the curve, the level after which more
+    readers gain less than knee_gain percent, are reported. Each level reads pieces the previous levels did not.
+\b
+    The result is saved in ~/.rubrik_oracle_tools/mount_throughput.json for this host and mount path. The clone
+    scripts use the saved peak throughput as the mount throughput limit when --parallelism auto is used. Run this as
+    the user that runs the clones.
+\b
+    Returns:
+        result (dict): The result of each level and the knee.
+    """
+    numeric_level = getattr(logging, debug_level.upper(), None)
+    if not isinstance(numeric_level, int):
+        raise ValueError('Invalid log level: {}'.format(debug_level))
+    logger = logging.getLogger()
+    logger.setLevel(logging.NOTSET)
+    ch = logging.StreamHandler(sys.stdout)
+    ch.setLevel(numeric_level)
+    console_formatter = logging.Formatter('%(asctime)s: %(message)s')
+    ch.setFormatter(console_formatter)
+    logger.addHandler(ch)
+
+    host_target = platform.uname()[1].split('.')[0]
+    rubrik = None
+    live_mount_id = None
+    if backup_path:
+        if not os.path.isdir(backup_path):
+            raise RubrikOracleMountBenchmarkError("The backup path {} does not exist on this host.".format(backup_path))
+        mount_path = mount_path or os.path.dirname(os.path.abspath(backup_path))
+        if unmount:
+            logger.warning("The existing mount at {} is not unmounted.".format(backup_path))
+            unmount = False
+    else:
+        if not (source_host_db and mount_path):
+            raise RubrikOracleMountBenchmarkError("A source database and a mount path, or the backup path of an existing mount, are required.")
+        source_host_db = source_host_db.split(":")
+        rubrik = rbs_oracle_common.RubrikConnection(keyfile, insecure)
+        database = rbs_oracle_common.RubrikRbsOracleDatabase(rubrik, source_host_db[1], source_host_db[0])
+        oracle_db_info = database.get_oracle_db_info()
+        host_id = database.get_target_id(rubrik.cluster_id, host_target)
+        if time_restore:
+            time_ms = database.epoch_time(time_restore, rubrik.timezone)
+        else:
+            time_ms = database.epoch_time(oracle_db_info['latestRecoveryPoint'], rubrik.timezone)
+        logger.warning("Mounting the {} backup set on {} for the benchmark.".format(source_host_db[1], mount_path))
+        with rbs_oracle_common.RbsOracleMountPathLock(mount_path):
+            live_mount_info = database.live_mount(host_id, time_ms, files_only=True, mount_path=mount_path)
+            live_mount_info = database.async_requests_wait(live_mount_info['id'], 20)
+            if live_mount_info['status'] != "SUCCEEDED":
+                rubrik.delete_session()
+                raise RubrikOracleMountBenchmarkError("Mount of backup files did not complete successfully. Mount ended with status {}".format(live_mount_info['status']))
+            live_mount_id, backup_path = database.get_files_only_mount(live_mount_info, mount_path)
+        logger.warning("Backup files mounted at {}.".format(backup_path))
+
+    def release_mount():
+        if unmount:
+            mount = rbs_oracle_common.RubrikRbsOracleMount(rubrik, source_host_db[1], source_host_db[0], host_target)
+            logger.warning("Unmounting backups.")
+            delete_request = mount.live_mount_delete(live_mount_id)
+            delete_request = mount.async_requests_wait(delete_request['id'], 12)
+            logger.info("Async request completed with status: {}".format(delete_request['status']))
+            if delete_request['status'] != "SUCCEEDED":
+                logger.warning("Unmount of backup files failed with status: {}, live mount id {}.".format(delete_request['status'], live_mount_id))
+            else:
+                logger.warning("Backups unmounted")
+        elif live_mount_id:
+            logger.warning("The backup files remain mounted at {}, live mount id {}.".format(backup_path, live_mount_id))
+
+    manifest = rbs_oracle_common.RbsOracleBackupManifest.scan(backup_path)
+    pieces = sorted([backup_file for backup_file in manifest.files if backup_file['size'] > 0], key=lambda x: (x['kind'] != 'datafile', -x['size']))
+    pieces = pieces[:sample_files]
+    if not pieces:
+        release_mount()
+        if rubrik:
+            rubrik.delete_session()
+        raise RubrikOracleMountBenchmarkError("No backup pieces were found in {}.".format(backup_path))
+    sample_bytes = sum(piece['size'] for piece in pieces)
+    logger.warning("Reading {} backup pieces ({:0.1f} GB) with up to {} readers, {} seconds per level, {} MB {} reads.".format(
+        len(pieces), sample_bytes / 1024 ** 3, max_readers, level_seconds, block_size, "O_DIRECT" if direct else "buffered"))
+    benchmark = rbs_oracle_common.RbsOracleMountBenchmark([piece['path'] for piece in pieces], block_size, direct, level_seconds)
+    levels = benchmark.run(max_readers)
+    knee = benchmark.knee(levels, knee_gain / 100)
+    peak = max(levels, key=lambda x: x['mb_per_second'])
+    rows = [[level['readers'], level['mb_per_second'], "{:0.1f}".format(level['bytes'] / 1024 ** 3), level['seconds'],
+             'knee' if level is knee else ''] for level in levels]
+    print(tabulate(rows, headers=["Readers", "MB/s", "GB Read", "Seconds", ""]))
+    print("Knee: {} readers at {} MB/s. Peak: {} MB/s with {} readers.".format(knee['readers'], knee['mb_per_second'], peak['mb_per_second'], peak['readers']))
+    result = {'measured': datetime.datetime.now().isoformat(timespec='seconds'), 'backup_path': backup_path,
+              'direct': benchmark.direct, 'block_size_mb': block_size, 'levels': levels,
+              'knee_readers': knee['readers'], 'knee_mb_per_second': knee['mb_per_second'],
+              'mb_per_second': peak['mb_per_second']}
+    if not no_save:
+        store_path = rbs_oracle_common.RbsOracleMountBenchmark.save(host_target, mount_path, result)
+        logger.warning("Saved the mount throughput of {} MB/s for {} on {} in {}.".format(peak['mb_per_second'], mount_path, host_target, store_path))
+
+    release_mount()
+    if rubrik:
+        rubrik.delete_session()
+    return result
+
+
+class RubrikOracleMountBenchmarkError(rbs_oracle_common.NoTraceBackWithLineNumber):
+    """
+        Renames object so error is named with calling script
+    """
+    pass
+
+
+if __name__ == "__main__":
+    cli()
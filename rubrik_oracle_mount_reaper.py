@@ -0,0 +1,200 @@
+import rbs_oracle_common
+import click
+import logging
+import sys
+import time
+import fnmatch
+from tabulate import tabulate
+
+
+@click.command()
+@click.option('--min_age_hours', type=int, default=24, help='Only reap mounts created at least this many hours ago (default 24)')
+@click.option('--owner', type=str, multiple=True, help='Only reap mounts owned by these users. Repeat or separate with commas. Wildcards are allowed')
+@click.option('--exclude_owner', type=str, multiple=True, help='Never reap mounts owned by these users. Repeat or separate with commas. Wildcards are allowed')
+@click.option('--host', type=str, multiple=True, help='Only reap mounts on these hosts or RAC clusters. Repeat or separate with commas. Wildcards are allowed')
+@click.option('--exclude_host', type=str, multiple=True, help='Never reap mounts on these hosts or RAC clusters. Repeat or separate with commas. Wildcards are allowed')
+@click.option('--database', type=str, multiple=True, help='Only reap mounts of these source databases. Repeat or separate with commas. Wildcards are allowed')
+@click.option('--exclude_database', type=str, multiple=True, help='Never reap mounts of these source databases. Repeat or separate with commas. Wildcards are allowed')
+@click.option('--all', 'all_mounts', is_flag=True, help='Select the mounts of every owner, host and database. Required when no --owner, --host or --database is given')
+@click.option('--mount_type', type=click.Choice(['files_only', 'database', 'all']), default='files_only', help='Reap files only mounts of backup sets, live mounted databases or both. Live mounted databases may have been renamed and must then be dropped with rubrik_oracle_clone_unmount (default files_only)')
+@click.option('--include_pool', is_flag=True, help='Also reap the mounts held by rubrik_oracle_clone_pool. By default they are left to the pool')
+@click.option('--pool_state_file', type=str, help='Clone pool state file (default ~/.rubrik_oracle_tools/clone_pool.json)')
+@click.option('--execute', is_flag=True, help='Unmount the selected mounts. Without it the mounts that would be reaped are only listed')
+@click.option('--force', is_flag=True, help='Force the unmounts')
+@click.option('--max_concurrent', type=int, default=10, help='Maximum number of unmounts running on the cluster at one time (default 10)')
+@click.option('--timeout', type=int, default=60, help='Minutes to wait for all the unmounts to complete (default 60)')
+@click.option('--state_file', type=str, help='Record of the reaped mounts (default ~/.rubrik_oracle_tools/mount_reaper.json)')
+@click.option('--keyfile', '-k', type=str, required=False,  help='The connection keyfile path')
+@click.option('--insecure', is_flag=True,  help='Flag to use insecure connection')
+@click.option('--debug_level', '-d', type=str, default='WARNING', help='Logging level: DEBUG, INFO, WARNING, ERROR or CRITICAL.')
+def cli(min_age_hours, owner, exclude_owner, host, exclude_host, database, exclude_database, all_mounts, mount_type,
+        include_pool, pool_state_file, execute, force, max_concurrent, timeout, state_file, keyfile, insecure, debug_level):
+    """
+    This will unmount the Rubrik Oracle live mounts and files only mounts that have been left mounted.
+
+\b
+    All the Oracle mounts on the Rubrik cluster are listed and the mounts older than min_age_hours are selected. The
+    selection must be limited to owners, hosts or RAC clusters or source databases, or --all must be given, and any
+    of them can be excluded. Only files only mounts are selected unless another mount type is given, as a live
+    mounted database may have been renamed and must then be dropped on its host with rubrik_oracle_clone_unmount.
+    The mounts held by rubrik_oracle_clone_pool and the mounts already being unmounted are skipped.
+\b
+    The selected mounts are listed. With --execute they are unmounted, max_concurrent at a time, and waited on
+    together. Each reaped mount is recorded in ~/.rubrik_oracle_tools/mount_reaper.json.
+\b
+    Returns:
+        results (dict): Mount id to the result of each unmount.
+    """
+    numeric_level = getattr(logging, debug_level.upper(), None)
+    if not isinstance(numeric_level, int):
+        raise ValueError('Invalid log level: {}'.format(debug_level))
+    logger = logging.getLogger()
+    logger.setLevel(logging.NOTSET)
+    ch = logging.StreamHandler(sys.stdout)
+    ch.setLevel(numeric_level)
+    console_formatter = logging.Formatter('%(asctime)s: %(message)s')
+    ch.setFormatter(console_formatter)
+    logger.addHandler(ch)
+
+    if max_concurrent < 1:
+        raise RubrikOracleMountReaperError("The max_concurrent must be at least 1.")
+    if not (owner or host or database or all_mounts):
+        raise RubrikOracleMountReaperError("Select the mounts to reap with --owner, --host or --database, or use --all to select every mount.")
+    read_list = rbs_oracle_common.RubrikRbsOracleFleet.read_host_db_list
+    filters = {'owner': (read_list(owner), read_list(exclude_owner)),
+               'host': (read_list(host), read_list(exclude_host)),
+               'database': (read_list(database), read_list(exclude_database))}
+    rubrik = rbs_oracle_common.RubrikConnection(keyfile, insecure)
+    fleet = rbs_oracle_common.RubrikRbsOracleFleet(rubrik)
+    live_mounts = fleet.get_all_pages('internal', '/oracle/db/mount')
+    logger.info("Found {} Oracle mounts on the Rubrik cluster.".format(len(live_mounts)))
+    pool_mount_ids = []
+    if not include_pool:
+        pool_store = rbs_oracle_common.RbsOracleStateStore('clone_pool.json', pool_state_file)
+        pool_mount_ids = [entry.get('mount_id') for entries in pool_store.data.values() for entry in entries if entry.get('mount_id')]
+    selected = []
+    skipped = 0
+    for live_mount in live_mounts:
+        reason = skip_reason(live_mount, rubrik.timezone, min_age_hours, filters, mount_type, pool_mount_ids)
+        if reason:
+            logger.debug("Skipping mount {}: {}".format(live_mount['id'], reason))
+            skipped += 1
+            continue
+        selected.append(live_mount)
+    selected.sort(key=lambda x: -mount_age_hours(x, rubrik.timezone))
+    logger.warning("{} mounts selected to reap, {} skipped.".format(len(selected), skipped))
+    if not execute or not selected:
+        rows = [mount_row(live_mount, rubrik.timezone) + ['SELECTED', '', ''] for live_mount in selected]
+        print(tabulate(rows, headers=["Mount ID", "Source DB", "Mounted Host", "Owner", "Files Only", "Age Hours", "Status", "Seconds", "Error"]))
+        if selected:
+            print("Rerun with --execute to unmount the {} selected mounts.".format(len(selected)))
+        rubrik.delete_session()
+        return {}
+    queue = rbs_oracle_common.RubrikRbsOracleAsyncQueue(rubrik, max_concurrent)
+    for live_mount in selected:
+        queue.add(live_mount['id'], lambda live_mount_id=live_mount['id']: rubrik.connection.delete(
+            'internal', '/oracle/db/mount/{}?force={}'.format(live_mount_id, force), timeout=queue.cdm_timeout))
+    logger.warning("Unmounting {} mounts, {} at a time.".format(len(selected), max_concurrent))
+    results = queue.wait(timeout)
+    store = rbs_oracle_common.RbsOracleStateStore('mount_reaper.json', state_file)
+    with rbs_oracle_common.RbsOracleStateLock(store):
+        reaped = store.data.setdefault('reaped', [])
+        for live_mount in selected:
+            result = results[live_mount['id']]
+            reaped.append({'mount_id': live_mount['id'], 'source_database': live_mount.get('sourceDatabaseName'),
+                           'host': live_mount.get('targetHostname'), 'owner': live_mount.get('ownerName'),
+                           'files_only': live_mount.get('isFilesOnlyMount'), 'created': live_mount.get('creationDate'),
+                           'reaped': int(time.time()), 'status': result['status'], 'error': result.get('error') or ''})
+        # Keep the most recent records so the file does not grow without bound
+        store.data['reaped'] = reaped[-5000:]
+        store.save()
+    rows = []
+    summary = dict((row[0], row) for row in queue.summary())
+    for live_mount in selected:
+        row = summary[live_mount['id']]
+        rows.append(mount_row(live_mount, rubrik.timezone) + [row[1], row[2], row[4]])
+    print(tabulate(rows, headers=["Mount ID", "Source DB", "Mounted Host", "Owner", "Files Only", "Age Hours", "Status", "Seconds", "Error"]))
+    failures = queue.failures()
+    if failures:
+        logger.warning("{} of {} unmounts did not succeed.".format(len(failures), len(selected)))
+    rubrik.delete_session()
+    return results
+
+
+def mount_age_hours(live_mount, timezone):
+    """
+    Returns the hours since a mount was created, or None if the creation date can not be read.
+    """
+    try:
+        created = rbs_oracle_common.RubrikRbsOracleDatabase.epoch_time(live_mount['creationDate'], timezone) / 1000
+    except (KeyError, ValueError, TypeError):
+        return None
+    return (time.time() - created) / 3600
+
+
+def matches(value, patterns):
+    """
+    Checks a value against a list of wildcard patterns, ignoring case.
+    """
+    return any(fnmatch.fnmatch((value or '').lower(), pattern.lower()) for pattern in patterns)
+
+
+def host_matches(hostname, patterns):
+    """
+    Checks a host name against a list of host patterns. A pattern without wildcards matches short names to FQDNs.
+    """
+    for pattern in patterns:
+        if any(character in pattern for character in '*?['):
+            if matches(hostname, [pattern]):
+                return True
+        elif hostname and rbs_oracle_common.RubrikRbsOracleDatabase.match_hostname(hostname.lower(), pattern.lower()):
+            return True
+    return False
+
+
+def skip_reason(live_mount, timezone, min_age_hours, filters, mount_type, pool_mount_ids):
+    """
+    Checks a mount against the selection.
+
+    Returns:
+        reason (str): Why the mount is not reaped, or None if it is selected.
+    """
+    age = mount_age_hours(live_mount, timezone)
+    if age is None:
+        return "the creation date {} can not be read".format(live_mount.get('creationDate'))
+    if age < min_age_hours:
+        return "created {:0.1f} hours ago".format(age)
+    if 'unmount' in str(live_mount.get('status', '')).lower():
+        return "status is {}".format(live_mount['status'])
+    if live_mount['id'] in pool_mount_ids:
+        return "held by the clone pool"
+    files_only = bool(live_mount.get('isFilesOnlyMount'))
+    if (mount_type == 'files_only' and not files_only) or (mount_type == 'database' and files_only):
+        return "not a {} mount".format(mount_type)
+    values = {'owner': live_mount.get('ownerName'), 'host': live_mount.get('targetHostname'),
+              'database': live_mount.get('sourceDatabaseName')}
+    for name, (allow, deny) in filters.items():
+        check = host_matches if name == 'host' else matches
+        if allow and not check(values[name], allow):
+            return "{} {} is not selected".format(name, values[name])
+        if deny and check(values[name], deny):
+            return "{} {} is excluded".format(name, values[name])
+    return None
+
+
+def mount_row(live_mount, timezone):
+    age = mount_age_hours(live_mount, timezone)
+    return [live_mount['id'], live_mount.get('sourceDatabaseName', 'NA'), live_mount.get('targetHostname', 'NA'),
+            live_mount.get('ownerName', 'NA'), live_mount.get('isFilesOnlyMount', 'NA'),
+            "{:0.1f}".format(age) if age is not None else '']
+
+
+class RubrikOracleMountReaperError(rbs_oracle_common.NoTraceBackWithLineNumber):
+    """
+        Renames object so error is named with calling script
+    """
+    pass
+
+
+if __name__ == "__main__":
+    cli()
@@ -4,24 +4,43 @@ import logging
 import sys
 import datetime
 import pytz
+import time
+import concurrent.futures
+from tabulate import tabulate
 
 
 @click.command()
-@click.option('--source_host_db', '-s', type=str, required=True,  help='The source <host or RAC cluster>:<database>')
-@click.option('--no_wait', is_flag=True, help='Queue database refresh and exit. This option is always set for now.')
+@click.option('--source_host_db', '-s', type=str, multiple=True, help='The source <host or RAC cluster>:<database> or <host> to refresh the host. Repeat or separate with commas to refresh many targets')
+@click.option('--source_file', type=str, help='Refresh the targets in this file, one <host or RAC cluster>:<database> or <host> per line')
+@click.option('--no_wait', is_flag=True, help='Queue database refresh and exit. This option is always set for now when refreshing a single target.')
+@click.option('--max_concurrent', type=int, default=8, help='Many targets: maximum number of refreshes running at one time (default 8)')
+@click.option('--timeout', type=int, default=30, help='Many targets: minutes to wait for the database refreshes to complete (default 30)')
 @click.option('--keyfile', '-k', type=str, required=False,  help='The connection keyfile path')
 @click.option('--insecure', is_flag=True,  help='Flag to use insecure connection')
 @click.option('--debug_level', '-d', type=str, default='WARNING', help='Logging level: DEBUG, INFO, WARNING, ERROR or CRITICAL.')
-def cli(source_host_db, no_wait, keyfile, insecure, debug_level):
+def cli(source_host_db, source_file, no_wait, max_concurrent, timeout, keyfile, insecure, debug_level):
     """
-    This will initiate an on demand archive log backup of the database.
+    This will refresh the database or the host in the Rubrik CDM.
+
+\b
+    Many targets can be refreshed in one run by repeating the source, separating the sources with commas or using a
+    file of sources. The targets are resolved in one pass, the refreshes run concurrently with no more than
+    max_concurrent running at one time and the database refreshes are waited on together. With --no_wait the run
+    ends when the last database refresh has been submitted.
+    A table with the time taken for each target is printed at the end.
 
 \b
     Returns:
-        log_backup_info (dict): The information about the snapshot returned from the Rubrik CDM.
+        refresh_info (dict): The information about the refresh returned from the Rubrik CDM.
     """
-    # set no_wait until response api is fixed
-    no_wait = True
+    if not (source_host_db or source_file):
+        raise RubrikOracleRBSRefreshError("A source host or database, or a file of sources is required.")
+    if source_file or len(source_host_db) > 1 or ',' in source_host_db[0]:
+        bulk = True
+    else:
+        bulk = False
+        # set no_wait until response api is fixed
+        no_wait = True
     numeric_level = getattr(logging, debug_level.upper(), None)
     if not isinstance(numeric_level, int):
         raise ValueError('Invalid log level: {}'.format(debug_level))
@@ -34,12 +53,21 @@ def cli(source_host_db, no_wait, keyfile, insecure, debug_level):
     logger.addHandler(ch)
 
     rubrik = rbs_oracle_common.RubrikConnection(keyfile, insecure)
-    source_host_db = source_host_db.split(":")
+    if bulk:
+        targets = rbs_oracle_common.RubrikRbsOracleFleet.read_host_db_list(source_host_db, source_file)
+        results = bulk_refresh(rubrik, targets, no_wait, max_concurrent, timeout)
+        rubrik.delete_session()
+        failures = [target for target, result in results.items() if result[1] not in ['SUCCEEDED', 'SUBMITTED']]
+        if failures:
+            raise RubrikOracleRBSRefreshError("{} of {} refreshes did not complete successfully: {}".format(
+                len(failures), len(results), ", ".join(failures)))
+        return results
+    source_host_db = source_host_db[0].split(":")
     logger.debug(source_host_db)
     if len(source_host_db) > 1:
         if source_host_db[1]:
             # refresh db check for v6+
-            if (int(rubrik.version.split("-")[0].split(".")[0]) >= 7) or (int(rubrik.version.split("-")[0].split(".")[0]) == 6 and int(rubrik.version.split("-")[0].split(".")[2]) >= 2):
+            if database_refresh_supported(rubrik):
                 logger.debug("Rubrik version is greater than 6.0.2, database refresh is supported.")
                 logger.warning("Refreshing database: {0}".format(source_host_db[1]))
                 database = rbs_oracle_common.RubrikRbsOracleDatabase(rubrik, source_host_db[1], source_host_db[0])
@@ -98,6 +126,77 @@ def cli(source_host_db, no_wait, keyfile, insecure, debug_level):
     return refresh_response
 
 
+def database_refresh_supported(rubrik):
+    """
+    Database refresh is supported on CDM 6.0.2 and above.
+    """
+    cdm_version = rubrik.version.split("-")[0].split(".")
+    return int(cdm_version[0]) >= 7 or (int(cdm_version[0]) == 6 and int(cdm_version[2]) >= 2)
+
+
+def bulk_refresh(rubrik, targets, no_wait, max_concurrent, timeout):
+    """
+    Refreshes many hosts and databases concurrently and waits on all the database refreshes together.
+
+    Returns:
+        results (dict): Target to [type, status, seconds, error].
+    """
+    logger = logging.getLogger(__name__)
+    fleet = rbs_oracle_common.RubrikRbsOracleFleet(rubrik)
+    db_targets = [target for target in targets if len(target.split(":")) > 1 and target.split(":")[1]]
+    host_names = [target.split(":")[0] for target in targets if target not in db_targets]
+    if db_targets and not database_refresh_supported(rubrik):
+        logger.warning("CDM version is pre v6.0.2. Database refresh is not supported. Refreshing the database hosts instead.")
+        host_names.extend([target.split(":")[0] for target in db_targets])
+        db_targets = []
+    databases, db_failures = fleet.resolve(db_targets)
+    hosts, host_failures = fleet.resolve_hosts(list(dict.fromkeys(host_names)))
+    results = {}
+    for target, reason in db_failures.items():
+        results[target] = ['database', 'NOT_FOUND', '', reason]
+    for target, reason in host_failures.items():
+        results[target] = ['host', 'NOT_FOUND', '', reason]
+    logger.warning("Refreshing {} hosts and {} databases, {} at a time.".format(len(hosts), len(databases), max_concurrent))
+    queue = rbs_oracle_common.RubrikRbsOracleAsyncQueue(rubrik, max_concurrent)
+    for target, database in databases.items():
+        queue.add(target, database.refresh)
+    # Host refreshes are synchronous so they run in threads while the database refreshes are submitted and polled
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrent) as executor:
+        host_futures = {target: executor.submit(timed_host_refresh, host) for target, host in hosts.items()}
+        if no_wait:
+            # Only wait until the last refresh has been submitted, keeping max_concurrent on the cluster
+            for target, request in queue.submit_all(timeout).items():
+                results[target] = ['database', 'SUBMITTED', '', '']
+        else:
+            queue.wait(timeout)
+        for target, result in queue.results.items():
+            if result.get('submitted') and result.get('completed'):
+                seconds = "{:0.0f}".format(result['completed'] - result['submitted'])
+            else:
+                seconds = ''
+            results[target] = ['database', result['status'], seconds, result.get('error') or '']
+        for target, future in host_futures.items():
+            results[target] = ['host'] + future.result()
+    print(tabulate([[target] + result for target, result in sorted(results.items())],
+                   headers=["Target", "Type", "Status", "Seconds", "Error"]))
+    return results
+
+
+def timed_host_refresh(host):
+    """
+    Refreshes a host and times the refresh.
+
+    Returns:
+        result (list): [status, seconds, error]
+    """
+    start = time.time()
+    refresh_response, error = host.rubrik.run_guarded(host.refresh)
+    if error is not None:
+        return ['FAILED', "{:0.0f}".format(time.time() - start), error]
+    logging.getLogger(__name__).debug("Host Refresh complete: {0}".format(refresh_response))
+    return ['SUCCEEDED', "{:0.0f}".format(time.time() - start), '']
+
+
 class RubrikOracleRBSRefreshError(rbs_oracle_common.NoTraceBackWithLineNumber):
     """
         Renames object so error is named with calling script
@@ -4,17 +4,24 @@ import logging
 import sys
 import datetime
 import pytz
+from tabulate import tabulate
 
 
 @click.command()
-@click.option('--source_host_db', '-s', type=str, required=True,  help='The source <host or RAC cluster>:<database>')
+@click.option('--source_host_db', '-s', type=str, multiple=True, help='The source <host or RAC cluster>:<database>. Repeat or separate with commas for a bulk snapshot')
+@click.option('--source_file', type=str, help='Bulk snapshot of the <host or RAC cluster>:<database> pairs in this file, one per line')
+@click.option('--select_sla', type=str, help='Bulk snapshot of all the databases protected by this SLA Domain')
+@click.option('--select_host', type=str, help='Bulk snapshot of all the databases on this host')
+@click.option('--select_rac', type=str, help='Bulk snapshot of all the databases on this RAC cluster')
 @click.option('--force', '-f', is_flag=True, help='Force a new full database image level 0 backup')
 @click.option('--sla', type=str, help='Rubrik SLA Domain to use if different than the assigned SLA')
 @click.option('--wait', is_flag=True, help='Wait for backup to complete.')
+@click.option('--max_in_flight', type=int, default=10, help='Bulk snapshots: maximum number of snapshots running at one time (default 10)')
+@click.option('--timeout', type=int, default=240, help='Bulk snapshots: minutes to wait for all the snapshots to complete (default 240)')
 @click.option('--keyfile', '-k', type=str, required=False,  help='The connection keyfile path')
 @click.option('--insecure', is_flag=True,  help='Flag to use insecure connection')
 @click.option('--debug_level', '-d', type=str, default='WARNING', help='Logging level: DEBUG, INFO, WARNING, ERROR or CRITICAL.')
-def cli(source_host_db, force, sla, wait, keyfile, insecure, debug_level):
+def cli(source_host_db, source_file, select_sla, select_host, select_rac, force, sla, wait, max_in_flight, timeout, keyfile, insecure, debug_level):
     """
     This will initiate an on demand snapshot (backup) of the database.
 
@@ -23,6 +30,12 @@ def cli(source_host_db, force, sla, wait, keyfile, insecure, debug_level):
     image backup of the database set force to True. If you would like to use a different SLA for this snapshot you
     can specify that here also. Note if no SLA is supplied the current sla for this database will be used.
 
+\b
+    A bulk snapshot is run when more than one source database is supplied, a file of host:db pairs is supplied or
+    the databases are selected by SLA Domain, host or RAC cluster. All the databases are resolved in one pass, no more
+    than max_in_flight snapshots are run at one time and the script waits for all of them to complete. A summary of
+    the duration and status of each snapshot is printed at the end.
+
 \b
     Returns:
         snapshot_info (dict): The information about the snapshot returned from the Rubrik CDM.
@@ -38,8 +51,19 @@ def cli(source_host_db, force, sla, wait, keyfile, insecure, debug_level):
     ch.setFormatter(console_formatter)
     logger.addHandler(ch)
 
+    if not (source_host_db or source_file or select_sla or select_host or select_rac):
+        raise RubrikOracleSnapshotError("A source database, a host:db file or a database selector is required.")
     rubrik = rbs_oracle_common.RubrikConnection(keyfile, insecure)
-    source_host_db = source_host_db.split(":")
+    if source_file or select_sla or select_host or select_rac or len(source_host_db) > 1 or ',' in source_host_db[0]:
+        results = bulk_snapshot(rubrik, source_host_db, source_file, select_sla, select_host, select_rac, force, sla,
+                                max_in_flight, timeout)
+        rubrik.delete_session()
+        failures = [name for name, result in results.items() if result['status'] != 'SUCCEEDED']
+        if failures:
+            raise RubrikOracleSnapshotError("{} of {} database backups (snapshots) did not complete successfully: {}".format(
+                len(failures), len(results), ", ".join(failures)))
+        return results
+    source_host_db = source_host_db[0].split(":")
     database = rbs_oracle_common.RubrikRbsOracleDatabase(rubrik, source_host_db[1], source_host_db[0])
     if sla:
         oracle_db_sla_id = database.get_sla_id(sla)
@@ -68,6 +92,37 @@ def cli(source_host_db, force, sla, wait, keyfile, insecure, debug_level):
     return oracle_snapshot_info
 
 
+def bulk_snapshot(rubrik, source_host_db, source_file, select_sla, select_host, select_rac, force, sla, max_in_flight, timeout):
+    """
+    Snapshots many databases with a cap on the number of snapshots in flight and one wait for all of them.
+
+    Returns:
+        results (dict): host:db to the result of the snapshot request.
+    """
+    logger = logging.getLogger(__name__)
+    fleet = rbs_oracle_common.RubrikRbsOracleFleet(rubrik)
+    host_db_list = fleet.read_host_db_list(source_host_db, source_file)
+    if select_sla or select_host or select_rac:
+        host_db_list.extend(fleet.select(select_sla, select_host, select_rac))
+    databases, failures = fleet.resolve(host_db_list)
+    if not databases:
+        rubrik.delete_session()
+        raise RubrikOracleSnapshotError("No databases were found to snapshot. {}".format(failures))
+    logger.warning("Starting backup (snapshot) of {} databases, {} at a time.".format(len(databases), max_in_flight))
+    oracle_db_sla_id = None
+    if sla:
+        oracle_db_sla_id = next(iter(databases.values())).get_sla_id(sla)
+    queue = rbs_oracle_common.RubrikRbsOracleAsyncQueue(rubrik, max_in_flight)
+    for name, database in databases.items():
+        snapshot_sla_id = oracle_db_sla_id or fleet.effective_sla(fleet.records[database.oracle_id])[0]
+        queue.add(name, lambda database=database, snapshot_sla_id=snapshot_sla_id: database.oracle_db_snapshot(snapshot_sla_id, force))
+    results = queue.wait(timeout)
+    for name, reason in failures.items():
+        results[name] = {'id': None, 'status': 'NOT_FOUND', 'submitted': None, 'completed': None, 'error': reason}
+    print(tabulate(queue.summary(), headers=["Host:Database", "Status", "Seconds", "Request ID", "Error"]))
+    return results
+
+
 class RubrikOracleSnapshotError(rbs_oracle_common.NoTraceBackWithLineNumber):
     """
         Renames object so error is named with calling script
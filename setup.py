@@ -8,7 +8,9 @@ setup(
                 'rubrik_oracle_log_backup', 'rubrik_oracle_db_mount_clone', 'rubrik_oracle_clone_unmount',
                 'rubrik_oracle_backup_mount_clone', 'rubrik_oracle_mount_info', 'rubrik_oracle_backup_clone',
                 'rubrik_oracle_backup_validate', 'rubrik_oracle_db_clone', 'rubrik_oracle_rbs_refresh',
-                'rubrik_oracle_manage_protection', 'rubrik_oracle_backup_report', 'rubrik_oracle_backup_rac_clone'],
+                'rubrik_oracle_manage_protection', 'rubrik_oracle_backup_report', 'rubrik_oracle_backup_rac_clone',
+                'rubrik_oracle_clone_pool', 'rubrik_oracle_db_relocate',
+                'rubrik_oracle_mount_benchmark', 'rubrik_oracle_mount_reaper'],
     install_requires=[
         'requests >= 2.18.4, != 2.22.0',
         'rubrik_cdm',
@@ -38,5 +40,9 @@ setup(
         rubrik_oracle_manage_protection=rubrik_oracle_manage_protection:cli
         rubrik_oracle_backup_report=rubrik_oracle_backup_report:cli
         rubrik_oracle_backup_rac_clone=rubrik_oracle_backup_rac_clone:cli
+        rubrik_oracle_clone_pool=rubrik_oracle_clone_pool:cli
+        rubrik_oracle_db_relocate=rubrik_oracle_db_relocate:cli
+        rubrik_oracle_mount_benchmark=rubrik_oracle_mount_benchmark:cli
+        rubrik_oracle_mount_reaper=rubrik_oracle_mount_reaper:cli
     '''
 )
\ No newline at end of file